@@ -28,6 +28,10 @@ if not "%_TMP%"=="%ARGS%" set DISABLE_LINE=1
 set _TMP=%ARGS:--no-notify=%
 if not "%_TMP%"=="%ARGS%" set DISABLE_LINE=1
 if defined FORCE_LINE set DISABLE_LINE=
+REM --force-notify: 通知台帳(送信済み記録)を無視して再通知
+set NOTIFY_ARGS=
+set _TMP=%ARGS:--force-notify=%
+if not "%_TMP%"=="%ARGS%" set NOTIFY_ARGS=--force
 
 echo === OKUYAMI PIPELINE START ===
 echo RUN_ID: %RUN_ID%   TS: %RUN_TS%
@@ -107,7 +111,7 @@ for /f "usebackq delims=" %%L in (`python -c "import configparser,os;cfg=configp
 if not defined LINE_TOKEN goto SKIP_LINE
 if not defined LINE_TO goto SKIP_LINE
 echo [4] LINE notify (entries=%ENTRY_COUNT%) -> sending...
-python send_line_stats.py >"logs\\line_%RUN_TS%.log" 2>&1
+python send_line_stats.py %NOTIFY_ARGS% >"logs\\line_%RUN_TS%.log" 2>&1
 if errorlevel 1 (
 	echo WARN: LINE notify failed (non-fatal)
 ) else (
@@ -127,7 +131,7 @@ set LINE_TOKEN=
 for /f "usebackq delims=" %%L in (`python -c "import configparser,os;cfg=configparser.ConfigParser();p='config.ini';print((cfg.read(p,encoding='utf-8') and cfg.get('line_messaging','channel_access_token',fallback='').strip()) if os.path.exists(p) else '')"`) do set LINE_TOKEN=%%L
 if not defined LINE_TOKEN goto END_NO_DATA
 echo LINE notify (no data)
-python send_line_stats.py --notify-no-data >"logs\line_%RUN_TS%_nodata.log" 2>&1
+python send_line_stats.py --notify-no-data %NOTIFY_ARGS% >"logs\line_%RUN_TS%_nodata.log" 2>&1
 if errorlevel 1 echo WARN: LINE no-data notify failed
 goto END_NO_DATA
 
@@ -5,53 +5,32 @@
 - 本日ポストURL生成
 - 優先度計算
 - 休刊日/掲載なし判定
+- 全角英数字 → 半角変換
 - フロントマター生成
 - ロガー取得
+- Discord通知 (notifications.DiscordWebhookChannel の簡易ラッパ)
+- 重い依存 (pandas / requests / selenium 等) の遅延 import (lazy_module)
 他スクリプト (parse_and_format_obituary.py, send_line_stats.py, upload_to_github_pages.py など) から利用。
 """
 from __future__ import annotations
 from datetime import datetime
+import importlib
 import os
-import re
+import sys
 from typing import Any
 import logging
 
 __all__ = [
     'get_site_url', 'get_today_post_url', 'compute_priority',
-    'detect_holiday', 'build_front_matter', 'get_jp_date', 'get_logger'
+    'detect_holiday', 'fw_alnum_to_hw', 'build_front_matter', 'get_jp_date', 'get_logger', 'send_discord_alert',
+    'lazy_module'
 ]
 
-_DEF_SITE = 'https://MiMicroAG.github.io/okuyami-info'
-
 
 def get_site_url() -> str:
-    env_url = os.getenv('OKUYAMI_SITE_URL')
-    if env_url and env_url.strip():
-        return env_url.strip().rstrip('/')
-    cfg_path = os.path.join(os.path.dirname(__file__), 'okuyami-info', '_config.yml')
-    site = _DEF_SITE
-    try:
-        if os.path.exists(cfg_path):
-            url_val, baseurl_val = '', ''
-            with open(cfg_path, 'r', encoding='utf-8') as yf:
-                for line in yf:
-                    m = re.match(r"\s*url:\s*\"?([^\"\n#]+)\"?", line)
-                    if m:
-                        url_val = m.group(1).strip()
-                    m2 = re.match(r"\s*baseurl:\s*\"?([^\"\n#]+)\"?", line)
-                    if m2:
-                        baseurl_val = m2.group(1).strip()
-            if url_val:
-                if baseurl_val:
-                    if baseurl_val.startswith('/'):
-                        site = f"{url_val}{baseurl_val}"
-                    else:
-                        site = f"{url_val}/{baseurl_val}"
-                else:
-                    site = url_val
-    except Exception:
-        pass
-    return site.rstrip('/')
+    # OKUYAMI_SITE_URL > Pages リポジトリの _config.yml (url + baseurl)。解析結果は settings でキャッシュ
+    from settings import get_settings
+    return get_settings().site_url
 
 
 def get_today_post_url(dt: datetime | None = None) -> str:
@@ -62,21 +41,12 @@ def get_today_post_url(dt: datetime | None = None) -> str:
 
 
 # DataFrame 行 (Series) または dict を受け取って優先度を返す
-# 1: NEC/ＮＥＣ を含む, 2: 中央市, 3: その他
+# 規則は config.ini [priority] (priority_rules)。既定: 1: NEC/ＮＥＣ を含む, 2: 中央市, 3: その他
+# DataFrame 全体は priority_rules.get_priority_engine().score_frame(df) の方が高速
 
 def compute_priority(row: Any) -> int:
-    try:
-        get = row.get if hasattr(row, 'get') else (lambda k, d=None: row[k] if k in row else d)
-        text_fields = [str(get('氏名', '')), str(get('職歴・属性', '')), str(get('関係者', '')), str(get('喪主', ''))]
-        full_text = ' '.join(text_fields)
-        if 'ＮＥＣ' in full_text or 'NEC' in full_text:
-            return 1
-        city = str(get('市町村', ''))
-        if city == '中央市':
-            return 2
-        return 3
-    except Exception:
-        return 99
+    from priority_rules import get_priority_engine
+    return get_priority_engine().score_record(row)
 
 
 # 休刊日 / 掲載なし判定
@@ -94,6 +64,20 @@ def detect_holiday(text: str) -> bool:
     return False
 
 
+# 全角英数字 → 半角 (０-９, Ａ-Ｚ, ａ-ｚ)
+_FW_ALNUM_TABLE = {
+    code: code - 0xFEE0
+    for lo, hi in (('０', '９'), ('Ａ', 'Ｚ'), ('ａ', 'ｚ'))
+    for code in range(ord(lo), ord(hi) + 1)
+}
+
+
+def fw_alnum_to_hw(s: str) -> str:
+    if not s:
+        return s
+    return s.translate(_FW_ALNUM_TABLE)
+
+
 def get_jp_date(dt: datetime | None = None) -> str:
     if dt is None:
         dt = datetime.now()
@@ -138,3 +122,70 @@ def get_logger(name: str = 'okuyami') -> logging.Logger:
         logger.setLevel(level)
         logger.propagate = False
     return logger
+
+
+def send_discord_alert(message: str, webhook_url: str | None = None) -> bool:
+    """Discord Webhook へ通知。URL 未指定時は DISCORD_WEBHOOK_URL / config.ini [discord] webhook_url。
+    未設定なら送信せず False。
+    """
+    from notifications import DiscordWebhookChannel
+    channel = DiscordWebhookChannel(webhook_url)
+    if not channel.enabled():
+        return False
+    return channel.send(message)
+
+
+class _LazyModule:
+    """属性への初回アクセス時に import するモジュール代理
+    optional=True の場合、未導入なら bool() が False になり（従来の `requests = None` 相当）、
+    属性アクセスで ImportError を送出する。
+    """
+
+    def __init__(self, name: str, optional: bool = False):
+        self.__dict__['_name'] = name
+        self.__dict__['_optional'] = optional
+        self.__dict__['_module'] = None
+        self.__dict__['_error'] = None
+
+    def _load(self) -> Any:
+        mod = self.__dict__['_module']
+        if mod is None:
+            err = self.__dict__['_error']
+            if err is not None:
+                raise ImportError(f"{self._name} が利用できません: {err}") from err
+            try:
+                mod = importlib.import_module(self._name)
+            except Exception as exc:
+                if not self._optional:
+                    raise
+                self.__dict__['_error'] = exc
+                raise ImportError(f"{self._name} が利用できません: {exc}") from exc
+            self.__dict__['_module'] = mod
+        return mod
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr: str, value: Any) -> None:
+        setattr(self._load(), attr, value)
+
+    def __bool__(self) -> bool:
+        try:
+            self._load()
+        except ImportError:
+            if self._optional:
+                return False
+            raise
+        return True
+
+    def __repr__(self) -> str:
+        state = 'loaded' if self.__dict__['_module'] is not None else 'not loaded'
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_module(name: str, optional: bool = False) -> Any:
+    """遅延 import。既に読み込み済みならモジュールそのものを返す"""
+    mod = sys.modules.get(name)
+    if mod is not None:
+        return mod
+    return _LazyModule(name, optional)
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""日をまたいだ重複（再掲・訂正）の検出
+過去 N 日分（既定30日、当日を除く）の掲載をハッシュ索引に載せ、当日の各レコードを照合する。
+
+- 再掲: (市町村, 氏名, ふりがな, 住所, 年齢) を正規化したキーが一致
+- 訂正: 市町村が同じで氏名かふりがなが一致し、両方に年齢があって差が1以内、かつ住所の編集距離が
+  短い方の住所長の1/4以内（最低1）か関係者の編集距離が小さい
+- 索引はキーのハッシュ → 掲載、(市町村, 氏名)/(市町村, ふりがな) → 掲載の小さなバケツ。1件あたりの照合は定数時間
+- 過去分は履歴ストア (history_store) から読む。pyarrow が無い/履歴が無い日は解析済みCSVから補う
+- 結果はレコードの『重複』(再掲/訂正) と『重複元』(最初の掲載日 YYYY-MM-DD) に書き込む
+
+設定: OKUYAMI_DEDUP_WINDOW / config.ini [dedup] window_days（0で無効）
+
+単体実行:
+  python dedup.py okuyami_output/okuyami_20250808_parsed_20250808_070000.csv --date 2025-08-08
+"""
+from __future__ import annotations
+import csv
+import glob
+import hashlib
+import os
+import re
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+from common_utils import fw_alnum_to_hw
+from history_store import HistoryStore
+from settings import get_settings
+
+__all__ = ['DedupIndex', 'Match', 'mark_duplicates', 'load_recent', 'is_duplicate', 'DUP_COLUMN', 'DUP_SOURCE_COLUMN',
+           'REPEAT', 'CORRECTION']
+
+DUP_COLUMN = '重複'
+DUP_SOURCE_COLUMN = '重複元'
+REPEAT = '再掲'
+CORRECTION = '訂正'
+# 同じ氏名/ふりがなのバケツに保持する件数の上限（同姓同名が多くても照合を定数時間に保つ）
+_BUCKET_LIMIT = 8
+_SPACES = re.compile(r'[\s・･]+')
+_CSV_NAME = re.compile(r'okuyami_(\d{8})_parsed_(\d{8}_\d{6})')
+
+
+class Entry(NamedTuple):
+    day: date
+    city: str
+    name: str
+    kana: str
+    address: str
+    age: Optional[int]
+    relatives: str
+    key: bytes
+
+
+class Match(NamedTuple):
+    kind: str  # REPEAT / CORRECTION
+    entry: Entry
+
+
+def _norm(v: Any) -> str:
+    if v is None or (isinstance(v, float) and v != v):
+        return ''
+    return _SPACES.sub('', fw_alnum_to_hw(str(v)))
+
+
+def _age(v: Any) -> Optional[int]:
+    m = re.search(r'\d+', _norm(v))
+    return int(m.group()) if m else None
+
+
+def _address(addr: Any, city: Any) -> str:
+    # CSV では甲府市の住所に市名が付くため、市町村名の接頭辞は外して比べる
+    a, c = _norm(addr), _norm(city)
+    return a[len(c):] if c and a.startswith(c) else a
+
+
+def _entry(day: date, name: Any, kana: Any, addr: Any, city: Any, age: Any, relatives: Any) -> Entry:
+    c, n, k, a, g = _norm(city), _norm(name), _norm(kana), _address(addr, city), _age(age)
+    key = hashlib.blake2b(f'{c}\x00{n}\x00{k}\x00{a}\x00{g}'.encode('utf-8'), digest_size=8).digest()
+    return Entry(day, c, n, k, a, g, _norm(relatives), key)
+
+
+def _address_limit(a: str, b: str) -> int:
+    # 短い住所（番地のみ等）で別人を拾わないよう、許す編集距離は短い方の長さの1/4
+    return max(1, min(len(a), len(b)) // 4)
+
+
+def _levenshtein(a: str, b: str, limit: int) -> int:
+    """編集距離（limit を超えたら limit+1 で打ち切り）"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    if len(a) < len(b):
+        a, b = b, a
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        best = i
+        for j, cb in enumerate(b, 1):
+            v = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb))
+            cur.append(v)
+            best = min(best, v)
+        if best > limit:
+            return limit + 1
+        prev = cur
+    return prev[-1]
+
+
+def _similar(a: str, b: str, limit: int) -> bool:
+    return bool(a) and bool(b) and _levenshtein(a, b, limit) <= limit
+
+
+class DedupIndex:
+    def __init__(self) -> None:
+        self.exact: Dict[bytes, Entry] = {}
+        # キーは (市町村, 氏名) / (市町村, ふりがな)。別の市町村の同姓同名は候補にしない
+        self.by_name: Dict[Tuple[str, str], List[Entry]] = {}
+        self.by_kana: Dict[Tuple[str, str], List[Entry]] = {}
+
+    def __len__(self) -> int:
+        return len(self.exact)
+
+    def add(self, entry: Entry) -> None:
+        # 同じキーは最初の掲載日を残す
+        self.exact.setdefault(entry.key, entry)
+        for bucket, k in ((self.by_name, entry.name), (self.by_kana, entry.kana)):
+            if not k:
+                continue
+            items = bucket.setdefault((entry.city, k), [])
+            if len(items) < _BUCKET_LIMIT:
+                items.append(entry)
+
+    def add_record(self, rec: Dict[str, Any], day: date) -> None:
+        self.add(_entry(day, rec.get('氏名'), rec.get('ふりがな'), rec.get('住所'), rec.get('市町村'),
+                        rec.get('年齢'), rec.get('関係者')))
+
+    def check(self, rec: Dict[str, Any], day: date) -> Optional[Match]:
+        e = _entry(day, rec.get('氏名'), rec.get('ふりがな'), rec.get('住所'), rec.get('市町村'),
+                   rec.get('年齢'), rec.get('関係者'))
+        if not e.name:
+            return None
+        hit = self.exact.get(e.key)
+        if hit is not None:
+            return Match(REPEAT, hit)
+        seen = set()
+        for cand in self.by_name.get((e.city, e.name), []) + self.by_kana.get((e.city, e.kana), []):
+            if cand.key in seen or cand.city != e.city:
+                continue
+            seen.add(cand.key)
+            # 年齢の無い掲載は訂正と判断する根拠にしない
+            if e.age is None or cand.age is None or abs(e.age - cand.age) > 1:
+                continue
+            if _similar(e.address, cand.address, _address_limit(e.address, cand.address)) or \
+                    _similar(e.relatives, cand.relatives, max(3, len(e.relatives) // 5)):
+                return Match(CORRECTION, cand)
+        return None
+
+
+def _csv_days(csv_dir: str, since: date, until: date) -> Dict[date, str]:
+    """解析済みCSVを日付ごとに最新の1本（期間内のみ）"""
+    latest: Dict[str, Tuple[str, str]] = {}
+    for path in glob.glob(os.path.join(csv_dir, 'okuyami_*_parsed_*.csv')):
+        m = _CSV_NAME.search(os.path.basename(path))
+        if m and (m.group(1) not in latest or m.group(2) > latest[m.group(1)][0]):
+            latest[m.group(1)] = (m.group(2), path)
+    out = {}
+    for day_s, (_, path) in latest.items():
+        day = datetime.strptime(day_s, '%Y%m%d').date()
+        if since <= day <= until:
+            out[day] = path
+    return out
+
+
+def load_recent(day: date, window_days: Optional[int] = None, csv_dir: str = './okuyami_output') -> DedupIndex:
+    """day より前の window_days 日分の索引"""
+    window = get_settings().dedup_window_days if window_days is None else window_days
+    index = DedupIndex()
+    if window <= 0:
+        return index
+    since, until = day - timedelta(days=window), day - timedelta(days=1)
+    loaded = set()
+    store = HistoryStore(get_settings().history_path(csv_dir))
+    if store.available() and os.path.isdir(store.root):
+        try:
+            cols = ['publish_date', 'name', 'kana', 'address', 'city', 'age', 'relatives']
+            for r in store.read_table(cols, since, until).to_pylist():
+                index.add(_entry(r['publish_date'], r['name'], r['kana'], r['address'], r['city'],
+                                 r['age'], r['relatives']))
+                loaded.add(r['publish_date'])
+        except Exception as e:
+            print(f'履歴からの重複索引の読み込みに失敗（CSVで補います）: {e}')
+    for d, path in sorted(_csv_days(csv_dir, since, until).items()):
+        if d in loaded:
+            continue
+        with open(path, 'r', encoding='utf-8-sig', newline='') as rf:
+            for rec in csv.DictReader(rf):
+                index.add_record(rec, d)
+    return index
+
+
+def mark_duplicates(records: Sequence[Dict[str, Any]], day: Any, *, index: Optional[DedupIndex] = None,
+                    csv_dir: str = './okuyami_output') -> int:
+    """records に『重複』『重複元』を書き込み、該当件数を返す（日付不明・無効設定なら 0）"""
+    if isinstance(day, str):
+        try:
+            day = datetime.strptime(day, '%Y-%m-%d').date()
+        except ValueError:
+            return 0
+    if not isinstance(day, date):
+        return 0
+    if index is None:
+        if get_settings().dedup_window_days <= 0:
+            return 0
+        index = load_recent(day, csv_dir=csv_dir)
+    found = 0
+    for rec in records:
+        m = index.check(rec, day)
+        rec[DUP_COLUMN] = m.kind if m else ''
+        rec[DUP_SOURCE_COLUMN] = m.entry.day.isoformat() if m else ''
+        if m:
+            found += 1
+            print(f'{m.kind}: {rec.get("氏名")} (初出 {m.entry.day:%Y-%m-%d})')
+    return found
+
+
+def is_duplicate(rec: Dict[str, Any]) -> bool:
+    v = rec.get(DUP_COLUMN)
+    return isinstance(v, str) and v in (REPEAT, CORRECTION)
+
+
+if __name__ == '__main__':
+    import argparse
+    ap = argparse.ArgumentParser(description='解析済みCSVを過去分と照合し再掲・訂正を表示')
+    ap.add_argument('csv', help='解析済みCSV')
+    ap.add_argument('--date', help='掲載日 YYYY-MM-DD (既定: ファイル名から)')
+    ap.add_argument('--window', type=int, help='照合する日数 (既定: settings)')
+    ap.add_argument('--csv-dir', default='./okuyami_output', help='過去の解析済みCSVの場所')
+    cli = ap.parse_args()
+    m = _CSV_NAME.search(os.path.basename(cli.csv))
+    day_s = cli.date or (datetime.strptime(m.group(1), '%Y%m%d').strftime('%Y-%m-%d') if m else '')
+    if not day_s:
+        print('掲載日を --date で指定してください')
+        raise SystemExit(1)
+    target = datetime.strptime(day_s, '%Y-%m-%d').date()
+    with open(cli.csv, 'r', encoding='utf-8-sig', newline='') as rf:
+        rows = list(csv.DictReader(rf))
+    idx = load_recent(target, cli.window, cli.csv_dir)
+    n = mark_duplicates(rows, target, index=idx)
+    print(f'{len(rows)}件中 {n}件が重複 (索引 {len(idx)}件)')
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""死亡日・通夜・告別式の日時正規化
+紙面の『１２日』『７月３１日』『１８日午後６時』『１９日正午』『祭１０日午後６時』などを
+掲載日を基準に完全な日付/日時へ変換する。
+
+- 死亡日: 掲載日以前の直近の日付（日だけなら前月、月日が掲載日より後なら前年）
+- 通夜/告別式: 掲載日に最も近い日付（前月・当月・翌月 / 前年・当年・翌年から選ぶ。同距離なら後の方）
+- 時刻: 午前/午後N時(M分|半)、正午。時刻なしは 0:00
+- 全角数字・空白を吸収。断片の解析結果は lru_cache で共有（同じ文字列が毎日大量に出るため）
+"""
+from __future__ import annotations
+import re
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Optional, Tuple
+from common_utils import fw_alnum_to_hw
+
+__all__ = ['TYPED_COLUMNS', 'parse_fragment', 'resolve_death_date', 'resolve_event_datetime',
+           'normalize_record', 'add_typed_columns']
+
+# 解析レコードに追加する型付き列（CSV では ISO 形式）
+TYPED_COLUMNS = ('死亡年月日', '通夜日時', '告別式日時')
+
+_SPACES = re.compile(r'\s+')
+_FRAGMENT = re.compile(
+    r'(?:(?P<month>\d{1,2})月)?(?P<day>\d{1,2})日'
+    r'(?:(?P<ampm>午前|午後)(?P<hour>\d{1,2})時(?:(?P<minute>\d{1,2})分|(?P<half>半))?|(?P<noon>正午))?'
+)
+
+Fragment = Tuple[Optional[int], int, Optional[int], int]
+
+
+@lru_cache(maxsize=1024)
+def _parse_cached(text: str) -> Optional[Fragment]:
+    m = _FRAGMENT.search(_SPACES.sub('', fw_alnum_to_hw(text)))
+    if not m:
+        return None
+    month = int(m.group('month')) if m.group('month') else None
+    day = int(m.group('day'))
+    if not 1 <= day <= 31 or (month is not None and not 1 <= month <= 12):
+        return None
+    hour: Optional[int] = None
+    minute = 0
+    if m.group('noon'):
+        hour = 12
+    elif m.group('ampm'):
+        hour = int(m.group('hour')) % 12 + (12 if m.group('ampm') == '午後' else 0)
+        minute = 30 if m.group('half') else int(m.group('minute') or 0)
+        if minute > 59:
+            return None
+    return month, day, hour, minute
+
+
+def parse_fragment(text: Any) -> Optional[Fragment]:
+    """断片を (月 or None, 日, 時 or None, 分) に。解釈できなければ None"""
+    if text is None or (isinstance(text, float) and text != text):
+        return None
+    s = str(text).strip()
+    return _parse_cached(s) if s else None
+
+
+def _date(year: int, month: int, day: int) -> Optional[date]:
+    while month < 1:
+        month += 12
+        year -= 1
+    while month > 12:
+        month -= 12
+        year += 1
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def resolve_death_date(text: Any, publish: date) -> Optional[date]:
+    """『３日』『７月３１日』を掲載日以前の直近の日付に"""
+    frag = parse_fragment(text)
+    if not frag:
+        return None
+    month, day = frag[0], frag[1]
+    if month is None:
+        return _date(publish.year, publish.month - (1 if day > publish.day else 0), day)
+    return _date(publish.year - (1 if (month, day) > (publish.month, publish.day) else 0), month, day)
+
+
+def resolve_event_datetime(text: Any, publish: date) -> Optional[datetime]:
+    """通夜/告別式の断片を掲載日に最も近い日時に（時刻なしは 0:00）"""
+    frag = parse_fragment(text)
+    if not frag:
+        return None
+    month, day, hour, minute = frag
+    if month is None:
+        candidates = (_date(publish.year, publish.month + k, day) for k in (-1, 0, 1))
+    else:
+        candidates = (_date(publish.year + k, month, day) for k in (-1, 0, 1))
+    best = min((d for d in candidates if d), key=lambda d: (abs((d - publish).days), d < publish), default=None)
+    if best is None:
+        return None
+    return datetime(best.year, best.month, best.day) + timedelta(hours=hour or 0, minutes=minute)
+
+
+def normalize_record(rec: Dict[str, Any], publish: date) -> Dict[str, Any]:
+    return {
+        '死亡年月日': resolve_death_date(rec.get('死亡日'), publish),
+        '通夜日時': resolve_event_datetime(rec.get('通夜'), publish),
+        '告別式日時': resolve_event_datetime(rec.get('告別式'), publish),
+    }
+
+
+def add_typed_columns(records: Iterable[Dict[str, Any]], publish: Any) -> None:
+    """解析レコードに TYPED_COLUMNS を追加（publish は date または 'YYYY-MM-DD'。不明なら何もしない）"""
+    if isinstance(publish, str):
+        try:
+            publish = datetime.strptime(publish, '%Y-%m-%d').date()
+        except ValueError:
+            return
+    if not isinstance(publish, date):
+        return
+    for rec in records:
+        rec.update(normalize_record(rec, publish))
+
+
+if __name__ == '__main__':
+    import sys
+    base = datetime.strptime(sys.argv[1], '%Y-%m-%d').date() if len(sys.argv) > 1 else date.today()
+    for frag in sys.argv[2:] or ['３日', '７月３１日', '１８日午後６時', '１９日正午', '祭１０日午後０時３０分']:
+        print(f'{frag}: 死亡日={resolve_death_date(frag, base)} 行事={resolve_event_datetime(frag, base)}')
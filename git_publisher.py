@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Pages リポジトリ向けプラミング公開バックエンド
+git add / diff / commit / rev-list を個別に起動する代わりに、
+- 変更判定: .git/index の stat 情報（サイズ・更新時刻）と一致するファイルは未変更（プロセス起動なし。
+  git と同じく index より新しい更新時刻は信用しない）。残りは git hash-object -w --stdin-paths 1プロセスで
+  blob を作成し index の blob ID と比較（autocrlf・.gitattributes の eol/clean フィルタは git 側で適用）
+- コミット作成: git fast-import 1プロセスで、上で作成した blob を参照して tree/commit 作成と refs/heads/<branch> 更新
+- インデックス同期: git update-index 1プロセス
+- 反映: git push（唯一のネットワーク処理）。未プッシュ判定は refs を直接読む
+で公開する。変更なしの再実行はプロセス起動0回（porcelain は add/diff/rev-list の3回）、
+変更ありは push 込み4回（porcelain と同数）。Windows/OneDrive 上でのプロセス起動コストを削減するのが目的。
+upload_to_github_pages.py --git-backend plumbing (または OKUYAMI_GIT_BACKEND=plumbing) で使用。
+計測は tools/bench_publish.py。
+"""
+from __future__ import annotations
+import os
+import re
+import struct
+import subprocess
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
+
+__all__ = ['PlumbingPublisher', 'IndexEntry', 'read_index']
+
+
+class IndexEntry(NamedTuple):
+    sha: str
+    mtime_s: int
+    mtime_ns: int
+    size: int  # 作業ツリー上のサイズ（フィルタ適用前）
+
+
+def read_index(git_dir: str) -> Optional[Dict[str, IndexEntry]]:
+    """.git/index (version 2/3) から {パス: IndexEntry} を読む。読めない場合は None"""
+    try:
+        with open(os.path.join(git_dir, 'index'), 'rb') as rf:
+            data = rf.read()
+    except OSError:
+        return None
+    if len(data) < 12 or data[:4] != b'DIRC':
+        return None
+    version, count = struct.unpack('>II', data[4:12])
+    if version not in (2, 3):
+        return None
+    entries: Dict[str, IndexEntry] = {}
+    pos = 12
+    try:
+        for _ in range(count):
+            start = pos
+            # ctime(8) mtime(8) dev ino mode uid gid size(各4) sha(20) flags(2)
+            mtime_s, mtime_ns = struct.unpack('>II', data[pos + 8:pos + 16])
+            size = struct.unpack('>I', data[pos + 36:pos + 40])[0]
+            sha = data[pos + 40:pos + 60].hex()
+            flags = struct.unpack('>H', data[pos + 60:pos + 62])[0]
+            pos += 62
+            if version == 3 and flags & 0x4000:
+                pos += 2
+            end = data.index(b'\0', pos)
+            path = data[pos:end].decode('utf-8', errors='surrogateescape')
+            # エントリは NUL 込みで 8 バイト境界にパディング
+            entry_len = end - start + 1
+            pos = start + ((entry_len + 7) // 8) * 8
+            entries[path] = IndexEntry(sha, mtime_s, mtime_ns, size)
+    except (ValueError, struct.error):
+        return None
+    return entries
+
+
+def _read_user_ident(git_dir: str) -> Optional[str]:
+    """user.name / user.email を環境変数・設定ファイルから取得 (git プロセスを起動しない)"""
+    name = os.getenv('GIT_COMMITTER_NAME') or ''
+    email = os.getenv('GIT_COMMITTER_EMAIL') or ''
+    if name and email:
+        return f'{name} <{email}>'
+    home = os.path.expanduser('~')
+    xdg = os.getenv('XDG_CONFIG_HOME') or os.path.join(home, '.config')
+    # 優先度の低い順に読み、後勝ち
+    for path in (os.path.join(xdg, 'git', 'config'), os.path.join(home, '.gitconfig'), os.path.join(git_dir, 'config')):
+        try:
+            with open(path, 'r', encoding='utf-8') as rf:
+                section = ''
+                for line in rf:
+                    s = line.strip()
+                    if not s or s[0] in '#;':
+                        continue
+                    m = re.match(r'\[\s*([^\]\s"]+)', s)
+                    if m:
+                        section = m.group(1).lower()
+                        continue
+                    if section != 'user':
+                        continue
+                    kv = re.match(r'(\w+)\s*=\s*(.*)$', s)
+                    if not kv:
+                        continue
+                    key, val = kv.group(1).lower(), kv.group(2).strip().strip('"')
+                    if key == 'name' and not os.getenv('GIT_COMMITTER_NAME'):
+                        name = val
+                    elif key == 'email' and not os.getenv('GIT_COMMITTER_EMAIL'):
+                        email = val
+        except OSError:
+            continue
+    if name and email:
+        return f'{name} <{email}>'
+    return None
+
+
+class PlumbingPublisher:
+    def __init__(self, repo_path: str, branch: str = 'main'):
+        self.repo_path = repo_path
+        self.branch = branch
+        self.git_dir = os.path.join(repo_path, '.git')
+        self.process_count = 0  # 計測用: 起動した git プロセス数
+        # changed_paths で作成した blob（相対パス → ID）。commit はこれを参照する
+        self.blobs: Dict[str, str] = {}
+
+    def _git(self, args: List[str], stdin: Optional[bytes] = None) -> subprocess.CompletedProcess:
+        self.process_count += 1
+        return subprocess.run(['git', *args], cwd=self.repo_path, input=stdin, capture_output=True)
+
+    def supported(self) -> bool:
+        """HEAD が対象ブランチを指す通常のリポジトリのみ対応 (worktree/サブモジュールの .git ファイルは非対応)"""
+        try:
+            with open(os.path.join(self.git_dir, 'HEAD'), 'r', encoding='utf-8') as rf:
+                head = rf.read().strip()
+        except OSError:
+            return False
+        return head == f'ref: refs/heads/{self.branch}'
+
+    def _rel(self, path: str) -> str:
+        return os.path.relpath(path, self.repo_path).replace('\\', '/')
+
+    def _read_ref(self, ref: str) -> Optional[str]:
+        """loose ref → packed-refs の順に参照 (プロセス起動なし)"""
+        try:
+            with open(os.path.join(self.git_dir, *ref.split('/')), 'r', encoding='utf-8') as rf:
+                return rf.read().strip() or None
+        except OSError:
+            pass
+        try:
+            with open(os.path.join(self.git_dir, 'packed-refs'), 'r', encoding='utf-8') as rf:
+                for line in rf:
+                    parts = line.strip().split(' ', 1)
+                    if len(parts) == 2 and parts[1] == ref:
+                        return parts[0]
+        except OSError:
+            pass
+        return None
+
+    def has_unpushed(self) -> Optional[bool]:
+        """ローカルブランチが origin/<branch> と異なるか。判定不能時は None"""
+        local = self._read_ref(f'refs/heads/{self.branch}')
+        remote = self._read_ref(f'refs/remotes/origin/{self.branch}')
+        if not local or not remote:
+            return None
+        return local != remote
+
+    def _stat_clean(self, entry: Optional[IndexEntry], path: str, racy_ns: int) -> bool:
+        """index の stat 情報と一致し、かつ index 書き込みより前に更新されたファイルなら未変更とみなす"""
+        if entry is None:
+            return False
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        if st.st_size != entry.size or st.st_mtime_ns >= racy_ns:
+            return False
+        sec, nsec = divmod(st.st_mtime_ns, 1_000_000_000)
+        # ナノ秒を記録しない環境 (0) は秒のみ比較
+        return sec == entry.mtime_s and (entry.mtime_ns == 0 or nsec == entry.mtime_ns)
+
+    def changed_paths(self, paths: List[str]) -> List[str]:
+        """インデックスと内容が異なるファイルのみ返す（self.blobs に作成した blob ID を記録）"""
+        index = read_index(self.git_dir)
+        try:
+            racy_ns = os.stat(os.path.join(self.git_dir, 'index')).st_mtime_ns
+        except OSError:
+            racy_ns = 0
+        candidates = [p for p in paths if not self._stat_clean((index or {}).get(self._rel(p)), p, racy_ns)]
+        if not candidates:
+            return []
+        # フィルタ・改行変換は git に任せる（パスは作業ツリー基準の相対パスで渡し .gitattributes を効かせる）
+        rels = [self._rel(p) for p in candidates]
+        res = self._git(['hash-object', '-w', '--stdin-paths'], stdin=''.join(f'{r}\n' for r in rels).encode('utf-8'))
+        ids = res.stdout.decode('ascii', errors='replace').split()
+        if res.returncode != 0 or len(ids) != len(rels):
+            print(f"Gitエラー(hash-object): {res.stderr.decode('utf-8', errors='replace').strip()}")
+            return candidates
+        changed = []
+        for p, rel, blob in zip(candidates, rels, ids):
+            self.blobs[rel] = blob
+            entry = (index or {}).get(rel)
+            if entry is None or entry.sha != blob:
+                changed.append(p)
+        return changed
+
+    def _committer(self) -> Optional[str]:
+        ident = _read_user_ident(self.git_dir)
+        if ident:
+            now = datetime.now().astimezone()
+            return f'{ident} {int(now.timestamp())} {now.strftime("%z")}'
+        res = self._git(['var', 'GIT_COMMITTER_IDENT'])
+        if res.returncode == 0:
+            return res.stdout.decode('utf-8', errors='replace').strip()
+        return None
+
+    def commit(self, paths: List[str], message: str) -> bool:
+        """fast-import でコミットを作成しブランチを進め、インデックスを同期する (push はしない)"""
+        rels = [self._rel(p) for p in paths]
+        if any('\n' in r or r.startswith('"') for r in rels):
+            print('Gitエラー: fast-import で扱えないパスが含まれます')
+            return False
+        if any(r not in self.blobs for r in rels):
+            # changed_paths を経ていない（または hash-object に失敗した）パス
+            print('Gitエラー: blob が未作成のパスがあります (changed_paths を先に呼んでください)')
+            return False
+        committer = self._committer()
+        if not committer:
+            print('Gitエラー: user.name / user.email が未設定です')
+            return False
+        msg = message.encode('utf-8')
+        stream = [
+            f'commit refs/heads/{self.branch}\n'.encode('utf-8'),
+            f'committer {committer}\n'.encode('utf-8'),
+            b'data %d\n' % len(msg), msg, b'\n',
+            f'from refs/heads/{self.branch}^0\n'.encode('utf-8'),
+        ]
+        for rel in rels:
+            # hash-object -w 済みの blob を参照（フィルタ適用後の内容）。行末までがパス (空白可)
+            stream.append(f'M 100644 {self.blobs[rel]} {rel}\n'.encode('utf-8'))
+        stream.append(b'done\n')
+        res = self._git(['fast-import', '--quiet', '--done'], stdin=b''.join(stream))
+        if res.returncode != 0:
+            print(f"Gitエラー(fast-import): {res.stderr.decode('utf-8', errors='replace').strip()}")
+            return False
+        # 作業ツリーは既に新内容。インデックスを新 HEAD に合わせる
+        res = self._git(['update-index', '--add', '--', *rels])
+        if res.returncode != 0:
+            print(f"Gitエラー(update-index): {res.stderr.decode('utf-8', errors='replace').strip()}")
+            return False
+        return True
+
+    def push(self) -> bool:
+        res = self._git(['push', 'origin', self.branch])
+        if res.returncode != 0:
+            print(f"Gitエラー(push): {res.stderr.decode('utf-8', errors='replace').strip()}")
+            return False
+        return True
+
+    def publish(self, paths: List[str], message: str) -> Optional[bool]:
+        """変更分をコミットしてプッシュ。変更なしなら None、成功 True、失敗 False"""
+        changed = self.changed_paths([p for p in paths if p])
+        if not changed:
+            return None
+        if not self.commit(changed, message):
+            return False
+        return self.push()
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""解析履歴の列指向ストア (Parquet / Arrow IPC(Feather))
+日次の解析結果を年/月パーティション (hive 形式) の1日1ファイルとして保存し、
+複数年の集計では必要な列・パーティションだけを読む。
+
+  <history_dir>/year=YYYY/month=MM/okuyami_YYYYMMDD.parquet (feather 時は .arrow)
+
+- 型: publish_date/death_date は date、wake_at/funeral_at は日時 (event_dates で正規化)、age は int16、region/city は辞書型（カテゴリ）、他は文字列
+- 同じ日を再解析した場合はその日のファイルだけを置き換える（追記・冪等）
+- 既存CSV（ファイル名の時刻がまちまち）は日付ごとに最新の1本を取り込む (--backfill)
+- pyarrow が無い環境では何もしない（警告のみ）
+
+設定: OKUYAMI_HISTORY(0で無効) / OKUYAMI_HISTORY_DIR / OKUYAMI_HISTORY_FORMAT (parquet|feather)
+      config.ini [history] enabled, dir, format
+
+単体実行:
+  python history_store.py --backfill "okuyami_output/okuyami_*_parsed_*.csv"
+  python history_store.py --query --columns city,age --since 2024-01-01
+  python history_store.py --events funeral --since 2025-08-04 --venue セレモニー
+"""
+from __future__ import annotations
+import csv
+import glob
+import os
+import re
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from common_utils import fw_alnum_to_hw, lazy_module
+from event_dates import resolve_death_date, resolve_event_datetime
+from settings import get_settings
+
+__all__ = ['HistoryStore', 'append_history', 'FIELD_MAP', 'EVENT_COLUMNS']
+
+pa = lazy_module('pyarrow', optional=True)
+
+# 解析レコードの列 → 履歴の列
+FIELD_MAP: Dict[str, str] = {
+    '地域': 'region',
+    '市町村': 'city',
+    '氏名': 'name',
+    'ふりがな': 'kana',
+    '住所': 'address',
+    '死亡日': 'death_text',
+    '年齢': 'age',
+    '職歴・属性': 'occupation',
+    '喪主': 'chief_mourner',
+    '関係者': 'relatives',
+    '通夜': 'wake',
+    '告別式': 'funeral',
+    '会場': 'venue',
+}
+# 通夜/告別式の日時列
+EVENT_COLUMNS = {'wake': 'wake_at', 'funeral': 'funeral_at'}
+_FORMATS = {'parquet': '.parquet', 'feather': '.arrow'}
+_EVENT_WINDOW_DAYS = 31
+_CSV_NAME = re.compile(r'okuyami_(\d{8})_parsed_(\d{8}_\d{6})')
+
+
+def _schema() -> Any:
+    cat = pa.dictionary(pa.int16(), pa.string())
+    fields = [
+        ('publish_date', pa.date32()),
+        ('seq', pa.int16()),
+        ('region', cat),
+        ('city', cat),
+        ('name', pa.string()),
+        ('kana', pa.string()),
+        ('address', pa.string()),
+        ('death_date', pa.date32()),
+        ('death_text', pa.string()),
+        ('age', pa.int16()),
+        ('occupation', pa.string()),
+        ('chief_mourner', pa.string()),
+        ('relatives', pa.string()),
+        ('wake', pa.string()),
+        ('wake_at', pa.timestamp('s')),
+        ('funeral', pa.string()),
+        ('funeral_at', pa.timestamp('s')),
+        ('venue', pa.string()),
+        # 再掲/訂正 (dedup) と初出の掲載日
+        ('dup_kind', pa.string()),
+        ('dup_of', pa.date32()),
+    ]
+    return pa.schema(fields)
+
+
+def _text(v: Any) -> Optional[str]:
+    # None / 空文字 / NaN は欠損
+    if v is None or (isinstance(v, float) and v != v):
+        return None
+    s = str(v).strip()
+    return s or None
+
+
+def _age(v: Any) -> Optional[int]:
+    s = _text(v)
+    if not s:
+        return None
+    m = re.search(r'\d+', fw_alnum_to_hw(s))
+    return int(m.group()) if m else None
+
+
+class HistoryStore:
+    def __init__(self, root: Optional[str] = None, fmt: Optional[str] = None):
+        settings = get_settings()
+        self.root = root or settings.history_path()
+        self.fmt = (fmt or settings.history_format).lower()
+        if self.fmt not in _FORMATS:
+            print(f'警告: 未知の履歴形式 {self.fmt} のため parquet を使用します')
+            self.fmt = 'parquet'
+
+    @staticmethod
+    def available() -> bool:
+        return bool(pa)
+
+    def day_path(self, day: date) -> str:
+        return os.path.join(self.root, f'year={day.year:04d}', f'month={day.month:02d}',
+                            f'okuyami_{day:%Y%m%d}{_FORMATS[self.fmt]}')
+
+    def has_day(self, day: date) -> bool:
+        return os.path.exists(self.day_path(day))
+
+    def _table(self, day: date, records: Sequence[Dict[str, Any]]) -> Any:
+        cols: Dict[str, List[Any]] = {name: [] for name in _schema().names}
+        for i, rec in enumerate(records):
+            cols['publish_date'].append(day)
+            cols['seq'].append(i)
+            for src, dst in FIELD_MAP.items():
+                v = rec.get(src)
+                if dst == 'age':
+                    cols['age'].append(_age(v))
+                else:
+                    cols[dst].append(_text(v))
+            cols['death_date'].append(resolve_death_date(rec.get('死亡日'), day))
+            cols['wake_at'].append(resolve_event_datetime(rec.get('通夜'), day))
+            cols['funeral_at'].append(resolve_event_datetime(rec.get('告別式'), day))
+            cols['dup_kind'].append(_text(rec.get('重複')))
+            dup_of = _text(rec.get('重複元'))
+            cols['dup_of'].append(datetime.strptime(dup_of, '%Y-%m-%d').date() if dup_of else None)
+        return pa.Table.from_pydict(cols, schema=_schema())
+
+    def append_day(self, day: date, records: Sequence[Dict[str, Any]]) -> Optional[str]:
+        """その日の全レコードを書き込む（既存の同日ファイルは置き換え）"""
+        if not self.available():
+            print('pyarrow が見つからないため履歴を保存しません')
+            return None
+        table = self._table(day, records)
+        path = self.day_path(day)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.tmp'
+        if self.fmt == 'parquet':
+            import pyarrow.parquet as pq
+            pq.write_table(table, tmp, compression='zstd')
+        else:
+            import pyarrow.feather as feather
+            feather.write_feather(table, tmp, compression='zstd')
+        os.replace(tmp, path)
+        return path
+
+    def _dataset(self) -> Any:
+        import pyarrow.dataset as ds
+        parts = pa.schema([('year', pa.int16()), ('month', pa.int8())])
+        # 列追加前に書いたファイルも読めるよう現行スキーマを明示（無い列は null）
+        schema = pa.unify_schemas([_schema(), parts])
+        return ds.dataset(self.root, schema=schema, format='parquet' if self.fmt == 'parquet' else 'ipc',
+                          partitioning=ds.partitioning(parts, flavor='hive'), exclude_invalid_files=True)
+
+    def read_table(self, columns: Optional[List[str]] = None, since: Optional[date] = None,
+                   until: Optional[date] = None, where: Any = None) -> Any:
+        """必要な列・期間のみ読む（期間は年/月パーティションで絞ってから日付で絞る。where は追加の条件式）"""
+        import pyarrow.dataset as ds
+        year, month, pub = ds.field('year'), ds.field('month'), ds.field('publish_date')
+        flt = where
+
+        def _and(a, b):
+            return b if a is None else a & b
+
+        if since:
+            flt = _and(flt, (year > since.year) | ((year == since.year) & (month >= since.month)))
+            flt = _and(flt, pub >= pa.scalar(since, pa.date32()))
+        if until:
+            flt = _and(flt, (year < until.year) | ((year == until.year) & (month <= until.month)))
+            flt = _and(flt, pub <= pa.scalar(until, pa.date32()))
+        return self._dataset().to_table(columns=columns, filter=flt)
+
+    def events(self, kind: str = 'funeral', since: Optional[datetime] = None, until: Optional[datetime] = None,
+               venue: Optional[str] = None, columns: Optional[List[str]] = None) -> Any:
+        """期間内の通夜/告別式 (kind=wake|funeral。既定は今日から7日間)。venue は会場の部分一致。日時順"""
+        import pyarrow.compute as pc
+        import pyarrow.dataset as ds
+        col = EVENT_COLUMNS[kind]
+        since = since or datetime.combine(date.today(), datetime.min.time())
+        until = until or since + timedelta(days=7)
+        at = ds.field(col)
+        flt = (at >= pa.scalar(since, pa.timestamp('s'))) & (at < pa.scalar(until, pa.timestamp('s')))
+        if venue:
+            flt = flt & pc.match_substring(ds.field('venue'), venue)
+        # 行事は掲載日の前後に収まるので掲載日（パーティション）で先に絞る
+        window = timedelta(days=_EVENT_WINDOW_DAYS)
+        table = self.read_table(columns, (since - window).date(), (until + window).date(), where=flt)
+        return table.sort_by(col) if col in table.column_names else table
+
+    def read(self, columns: Optional[List[str]] = None, since: Optional[date] = None,
+             until: Optional[date] = None) -> Any:
+        """pandas.DataFrame で返す（region/city は category 型）"""
+        return self.read_table(columns, since, until).to_pandas()
+
+    def days(self) -> List[date]:
+        found = []
+        for path in glob.glob(os.path.join(self.root, 'year=*', 'month=*', 'okuyami_*' + _FORMATS[self.fmt])):
+            m = re.search(r'okuyami_(\d{8})', os.path.basename(path))
+            if m:
+                found.append(datetime.strptime(m.group(1), '%Y%m%d').date())
+        return sorted(found)
+
+    def backfill(self, csv_paths: Iterable[str], force: bool = False) -> int:
+        """解析済みCSVを日付ごとに最新の1本だけ取り込む。既存の日は CSV の方が新しい場合のみ更新"""
+        latest: Dict[str, Tuple[str, str]] = {}
+        for path in csv_paths:
+            m = _CSV_NAME.search(os.path.basename(path))
+            if not m:
+                continue
+            day, stamp = m.group(1), m.group(2)
+            if day not in latest or stamp > latest[day][0]:
+                latest[day] = (stamp, path)
+        written = 0
+        for day_s, (_, path) in sorted(latest.items()):
+            day = datetime.strptime(day_s, '%Y%m%d').date()
+            target = self.day_path(day)
+            if not force and os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(path):
+                continue
+            with open(path, 'r', encoding='utf-8-sig', newline='') as rf:
+                records = list(csv.DictReader(rf))
+            if self.append_day(day, records):
+                written += 1
+        return written
+
+
+def append_history(day: Optional[str], records: Sequence[Dict[str, Any]],
+                   output_dir: Optional[str] = None) -> Optional[str]:
+    """日次解析の後に呼ぶ。無効設定・pyarrow 未導入・日付不明なら何もしない（例外も投げない）"""
+    settings = get_settings()
+    if not settings.history_enabled or not day:
+        return None
+    store = HistoryStore(settings.history_path(output_dir))
+    if not store.available():
+        return None
+    try:
+        path = store.append_day(datetime.strptime(day, '%Y-%m-%d').date(), records)
+        if path:
+            print(f'履歴を更新しました: {path} ({len(records)}件)')
+        return path
+    except Exception as e:
+        print(f'履歴の保存に失敗(無視): {e}')
+        return None
+
+
+if __name__ == '__main__':
+    import argparse
+    ap = argparse.ArgumentParser(description='解析履歴 (Parquet/Feather) の取り込み・参照')
+    ap.add_argument('--backfill', metavar='GLOB', help='解析済みCSVを取り込む (例: "okuyami_output/okuyami_*_parsed_*.csv")')
+    ap.add_argument('--force', action='store_true', help='--backfill で既存の日も上書き')
+    ap.add_argument('--query', action='store_true', help='履歴を読み込んで概要を表示')
+    ap.add_argument('--columns', help='--query で読む列 (カンマ区切り)')
+    ap.add_argument('--events', choices=sorted(EVENT_COLUMNS), help='期間内の通夜/告別式を日時順に表示 (既定: 今日から7日間)')
+    ap.add_argument('--venue', help='--events で会場を部分一致で絞る')
+    ap.add_argument('--since', help='YYYY-MM-DD')
+    ap.add_argument('--until', help='YYYY-MM-DD')
+    ap.add_argument('--dir', help='履歴ディレクトリ (既定: settings)')
+    ap.add_argument('--format', choices=sorted(_FORMATS), help='保存形式 (既定: settings)')
+    cli = ap.parse_args()
+    store = HistoryStore(cli.dir, cli.format)
+    if not store.available():
+        print('pyarrow が必要です (pip install pyarrow)')
+        raise SystemExit(1)
+    if cli.backfill:
+        n = store.backfill(sorted(glob.glob(cli.backfill)), cli.force)
+        print(f'取り込み: {n}日分 (保存先: {store.root})')
+    if cli.query:
+        cols = [c.strip() for c in cli.columns.split(',')] if cli.columns else None
+        since = datetime.strptime(cli.since, '%Y-%m-%d').date() if cli.since else None
+        until = datetime.strptime(cli.until, '%Y-%m-%d').date() if cli.until else None
+        table = store.read_table(cols, since, until)
+        print(f'{table.num_rows}行 x {table.num_columns}列')
+        print(table.schema)
+        print(table.slice(0, 5).to_pandas())
+    if cli.events:
+        since = datetime.strptime(cli.since, '%Y-%m-%d') if cli.since else None
+        until = datetime.strptime(cli.until, '%Y-%m-%d') if cli.until else None
+        col = EVENT_COLUMNS[cli.events]
+        table = store.events(cli.events, since, until, cli.venue, ['publish_date', col, 'city', 'name', 'venue'])
+        print(f'{table.num_rows}件')
+        for row in table.to_pylist():
+            print(f"  {row[col]:%m/%d %H:%M} {row['venue'] or '(会場不明)'} {row['city']} {row['name']}")
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""LINE Messaging API 送信モジュール
+- 設定取得 (settings: 環境変数 > config.ini [line_messaging])
+- ユーザーID(U...)は multicast エンドポイントで最大500件ずつまとめて送信
+- グループ/ルームID(G.../R...)は push を並列送信
+- セッション(コネクション)を再利用し、トークン検証 (/v2/bot/info) はプロセス内で1回だけ
+- 429/5xx はバックオフ付きで再試行 (Retry-After 優先, X-Line-Retry-Key で重複送信防止)
+API のベースURLは環境変数 LINE_API_BASE で差し替え可能 (tools/stub_line_server.py で検証)。
+send_line_stats.py / parse_and_format_obituary.py の _send_line_messaging から利用。
+"""
+from __future__ import annotations
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from common_utils import lazy_module
+from settings import get_settings, load_settings
+requests = lazy_module('requests', optional=True)  # optional。初回の HTTP 送信時に読み込む
+
+__all__ = ['LineNotifier', 'LineSendResult', 'load_line_config', 'get_line_notifier', 'MULTICAST_LIMIT']
+
+_DEF_API_BASE = 'https://api.line.me'
+MULTICAST_LIMIT = 500  # multicast 1リクエストあたりの宛先上限
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+_ID_PATTERN = re.compile(r'[UGR][0-9a-fA-F]{32}')
+
+# トークン検証結果キャッシュ (プロセス存続中有効) token -> valid
+_TOKEN_CACHE: Dict[str, bool] = {}
+_TOKEN_LOCK = threading.Lock()
+
+
+def load_line_config(config_path: Optional[str] = None) -> Tuple[bool, str, List[str]]:
+    """(enabled, token, recipients) を返す。
+    env: LINE_MESSAGING_CHANNEL_ACCESS_TOKEN, LINE_MESSAGING_TO(カンマ区切り)
+    config.ini: [line_messaging] enabled, channel_access_token, to
+    config_path 省略時は settings のキャッシュを使う
+    """
+    settings = load_settings(config_path) if config_path else get_settings()
+    return settings.line_enabled, settings.line_token, list(settings.line_recipients)
+
+
+@dataclass
+class LineSendResult:
+    sent: List[str] = field(default_factory=list)
+    failed: List[str] = field(default_factory=list)
+    requests: int = 0
+
+    @property
+    def ok(self) -> bool:
+        # 一部の宛先だけ失敗した場合も失敗扱い（失敗分は送信箱で宛先を絞って再送する）
+        return bool(self.sent) and not self.failed
+
+
+class _RateLimiter:
+    """リクエスト開始間隔を 1/rate 秒以上に保つ簡易レートリミッタ (スレッド安全)"""
+
+    def __init__(self, rate_per_sec: float):
+        self.interval = 1.0 / rate_per_sec if rate_per_sec > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        if self.interval <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        delay = start - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class LineNotifier:
+    def __init__(self, token: str, *, api_base: Optional[str] = None, max_workers: int = 4,
+                 rate_per_sec: float = 10.0, max_retries: int = 3, backoff_base: float = 1.0,
+                 timeout: float = 10.0):
+        self.token = token
+        self.api_base = (api_base or os.getenv('LINE_API_BASE') or _DEF_API_BASE).rstrip('/')
+        self.max_workers = max(1, max_workers)
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.timeout = timeout
+        self._limiter = _RateLimiter(rate_per_sec)
+        self._session = None
+        if requests:
+            self._session = requests.Session()
+            try:
+                adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+                self._session.mount('https://', adapter)
+                self._session.mount('http://', adapter)
+            except Exception:
+                pass
+        self._headers = {
+            'Authorization': f'Bearer {token}',
+            'Content-Type': 'application/json',
+        }
+
+    # --- HTTP ---
+    def _request(self, method: str, path: str, payload: Optional[dict] = None,
+                 extra_headers: Optional[Dict[str, str]] = None) -> Tuple[int, str, Dict[str, str]]:
+        url = f"{self.api_base}{path}"
+        headers = dict(self._headers)
+        if extra_headers:
+            headers.update(extra_headers)
+        data = json.dumps(payload).encode('utf-8') if payload is not None else None
+        if self._session is not None:
+            resp = self._session.request(method, url, headers=headers, data=data, timeout=self.timeout)
+            return resp.status_code, resp.text or '', dict(resp.headers)
+        import urllib.request
+        import urllib.error
+        req = urllib.request.Request(url, data=data, method=method, headers=headers)
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:  # type: ignore[arg-type]
+                return resp.status, resp.read().decode('utf-8', errors='replace'), dict(resp.headers)
+        except urllib.error.HTTPError as he:  # type: ignore[attr-defined]
+            body = he.read().decode('utf-8', errors='replace') if hasattr(he, 'read') else ''
+            return he.code, body, dict(he.headers or {})
+
+    def _post_with_retry(self, path: str, payload: dict) -> Tuple[int, str]:
+        # 同一リクエストの再試行は同じ Retry-Key を使い LINE 側で重複配信を防ぐ
+        retry_key = {'X-Line-Retry-Key': str(uuid.uuid4())}
+        status, body = 0, ''
+        for attempt in range(self.max_retries + 1):
+            self._limiter.wait()
+            headers: Dict[str, str] = {}
+            try:
+                status, body, headers = self._request('POST', path, payload, retry_key)
+            except Exception as exc:
+                status, body = 0, f'{type(exc).__name__}: {exc}'
+            if status == 409 and attempt > 0:
+                # Retry-Key 重複 = 前回試行で受理済み
+                return 200, body
+            if status != 0 and status not in _RETRY_STATUSES:
+                return status, body
+            if attempt >= self.max_retries:
+                break
+            wait = self.backoff_base * (2 ** attempt) + random.uniform(0, self.backoff_base / 2)
+            retry_after = headers.get('Retry-After') or headers.get('retry-after')
+            if retry_after:
+                try:
+                    wait = max(wait, float(retry_after))
+                except ValueError:
+                    pass
+            print(f'LINE送信再試行: status={status or "error"} {wait:.1f}s後 ({attempt + 1}/{self.max_retries})')
+            time.sleep(wait)
+        return status, body
+
+    # --- token ---
+    def validate_token(self) -> bool:
+        """/v2/bot/info でトークンを検証。結果はプロセス内でキャッシュ (ネットワーク不通時は有効扱い・非キャッシュ)"""
+        with _TOKEN_LOCK:
+            cached = _TOKEN_CACHE.get(self.token)
+        if cached is not None:
+            return cached
+        try:
+            status, _, _ = self._request('GET', '/v2/bot/info')
+        except Exception:
+            return True
+        if status >= 500 or status == 429:
+            return True
+        valid = status != 401
+        with _TOKEN_LOCK:
+            _TOKEN_CACHE[self.token] = valid
+        return valid
+
+    # --- send ---
+    def send_text(self, message: str, recipients: List[str]) -> LineSendResult:
+        result = LineSendResult()
+        if not recipients:
+            return result
+        invalid_ids = [rid for rid in recipients if not _ID_PATTERN.fullmatch(rid)]
+        if invalid_ids:
+            print(f"LINE Messaging設定警告: 宛先IDの形式が不正: {', '.join(invalid_ids)}")
+            print("例: ユーザーIDは U で始まる 33 文字。表示名では送れません。")
+        if not self.validate_token():
+            print('LINE Messagingトークン無効: チャネルアクセストークンを再発行（Messaging APIの長期トークン）してください。')
+            result.failed.extend(recipients)
+            return result
+        messages = [{'type': 'text', 'text': message}]
+        # multicast はユーザーIDのみ対応。グループ/ルーム/形式不明は push
+        users = list(dict.fromkeys(r for r in recipients if r.startswith('U') and r not in invalid_ids))
+        others = list(dict.fromkeys(r for r in recipients if r not in users))
+        jobs: List[Tuple[str, dict, List[str]]] = []
+        for i in range(0, len(users), MULTICAST_LIMIT):
+            batch = users[i:i + MULTICAST_LIMIT]
+            if len(batch) == 1:
+                jobs.append(('/v2/bot/message/push', {'to': batch[0], 'messages': messages}, batch))
+            else:
+                jobs.append(('/v2/bot/message/multicast', {'to': batch, 'messages': messages}, batch))
+        for rid in others:
+            jobs.append(('/v2/bot/message/push', {'to': rid, 'messages': messages}, [rid]))
+
+        def _run(job: Tuple[str, dict, List[str]]) -> Tuple[int, str, List[str]]:
+            path, payload, targets = job
+            status, body = self._post_with_retry(path, payload)
+            return status, body, targets
+
+        workers = min(self.max_workers, len(jobs))
+        if workers <= 1:
+            outcomes = [_run(j) for j in jobs]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                outcomes = list(pool.map(_run, jobs))
+        result.requests = len(jobs)
+        for status, body, targets in outcomes:
+            if status == 200:
+                result.sent.extend(targets)
+                continue
+            result.failed.extend(targets)
+            if status == 401:
+                with _TOKEN_LOCK:
+                    _TOKEN_CACHE[self.token] = False
+                print('LINE Messaging送信失敗(401): 認証エラー。以下を確認してください:')
+                print(' - Messaging APIのチャネルアクセストークン（長期）を使用しているか')
+                print(' - トークンのチャネルが正しいか（別チャネルのトークンでは不可）')
+                print(' - 宛先IDが U/G/R で始まる正しいIDか（表示名不可）')
+                print(' - 受信者がBotを友だち追加/グループへ招待済みか（Push許可）')
+            else:
+                print(f'LINE Messaging送信失敗: {status or "error"} {body[:200]}')
+        return result
+
+
+_NOTIFIERS: Dict[Tuple[str, str], LineNotifier] = {}
+
+
+def get_line_notifier(token: str) -> LineNotifier:
+    """トークン/APIベースごとに LineNotifier を共有 (セッション再利用)"""
+    api_base = (os.getenv('LINE_API_BASE') or _DEF_API_BASE).rstrip('/')
+    key = (token, api_base)
+    notifier = _NOTIFIERS.get(key)
+    if notifier is None:
+        notifier = LineNotifier(
+            token,
+            api_base=api_base,
+            max_workers=int(os.getenv('OKUYAMI_LINE_WORKERS', '4')),
+            rate_per_sec=float(os.getenv('OKUYAMI_LINE_RATE', '10')),
+            max_retries=int(os.getenv('OKUYAMI_LINE_RETRIES', '3')),
+        )
+        _NOTIFIERS[key] = notifier
+    return notifier
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""通知サブシステム
+- チャネル共通インタフェース NotificationChannel (enabled / send)
+- LINE (multicast/push, line_notifier), Discord Webhook, 汎用 Webhook
+- 有効な全チャネルへ asyncio で並行送信
+- 送信失敗分は送信箱 (outbox, JSON) に保存し、次回実行時に文面をそのまま再送
+  （LINE で一部の宛先だけ失敗した場合は、失敗した宛先だけを記録して再送）
+
+設定 (settings.get_settings: 環境変数 > config.ini):
+  LINE    : [line_messaging] (line_notifier.load_line_config 参照)
+  Discord : DISCORD_WEBHOOK_URL / [discord] webhook_url, enabled
+  Webhook : OKUYAMI_WEBHOOK_URL / [webhook] url, enabled
+  対象チャネル: OKUYAMI_NOTIFY_CHANNELS (例: "line,discord")。未指定は設定済みの全チャネル
+  送信箱  : OKUYAMI_OUTBOX (既定 ./okuyami_output/notify_outbox.json)
+"""
+from __future__ import annotations
+import json
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+from line_notifier import LineSendResult, load_line_config, get_line_notifier
+from settings import get_settings
+from common_utils import lazy_module
+requests = lazy_module('requests', optional=True)  # optional。初回の HTTP 送信時に読み込む
+asyncio = lazy_module('asyncio')  # 送信時のみ使用（起動時間短縮）
+
+__all__ = [
+    'NotificationChannel', 'LineChannel', 'DiscordWebhookChannel', 'WebhookChannel',
+    'Outbox', 'load_channels', 'send_all_async', 'notify', 'flush_outbox'
+]
+
+_DEF_OUTBOX = os.path.join('.', 'okuyami_output', 'notify_outbox.json')
+_OUTBOX_MAX_ATTEMPTS = 10
+
+
+def _post_json(url: str, payload: dict, timeout: float = 10.0) -> Tuple[int, str, Dict[str, str]]:
+    headers = {'Content-Type': 'application/json', 'User-Agent': 'okuyami-bot/1.0 (+https://github.com/MiMicroAG/okuyami)'}
+    data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    if requests:
+        resp = requests.post(url, data=data, headers=headers, timeout=timeout)
+        return resp.status_code, resp.text or '', dict(resp.headers)
+    import urllib.request
+    import urllib.error
+    req = urllib.request.Request(url, data=data, method='POST', headers=headers)
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:  # type: ignore[arg-type]
+            return resp.status, resp.read().decode('utf-8', errors='replace'), dict(resp.headers)
+    except urllib.error.HTTPError as he:  # type: ignore[attr-defined]
+        body = he.read().decode('utf-8', errors='replace') if hasattr(he, 'read') else ''
+        return he.code, body, dict(he.headers or {})
+
+
+class NotificationChannel:
+    """通知チャネルの基底クラス。send() は成功で True"""
+    name = 'base'
+    # 直前の send() で失敗した宛先（宛先を持つチャネルのみ。送信箱に記録して絞って再送）
+    failed_recipients: List[str] = []
+
+    def enabled(self) -> bool:
+        return False
+
+    def send(self, message: str) -> bool:
+        raise NotImplementedError
+
+
+class LineChannel(NotificationChannel):
+    name = 'line'
+
+    def __init__(self):
+        self._enabled, self.token, self.recipients = load_line_config()
+
+    def enabled(self) -> bool:
+        return bool(self._enabled and self.token and self.recipients)
+
+    def send_to(self, message: str, recipients: List[str]) -> LineSendResult:
+        result = get_line_notifier(self.token).send_text(message, recipients)
+        if result.sent:
+            print(f'LINE Messaging APIで通知を送信しました ({len(result.sent)}/{len(recipients)}件, {result.requests}リクエスト)')
+        if result.sent and result.failed:
+            print(f'LINE 一部の宛先へ送信失敗: {len(result.failed)}件')
+        return result
+
+    def send(self, message: str) -> bool:
+        self.failed_recipients = []  # 例外時は全宛先を再送対象に
+        result = self.send_to(message, self.recipients)
+        self.failed_recipients = list(result.failed)
+        return result.ok
+
+
+class _WebhookBase(NotificationChannel):
+    url = ''
+    max_retries = 2
+
+    def enabled(self) -> bool:
+        return bool(self.url)
+
+    def _payload(self, message: str) -> dict:
+        raise NotImplementedError
+
+    def send(self, message: str) -> bool:
+        payload = self._payload(message)
+        for attempt in range(self.max_retries + 1):
+            try:
+                status, body, headers = _post_json(self.url, payload)
+            except Exception as exc:
+                status, body, headers = 0, f'{type(exc).__name__}: {exc}', {}
+            if 200 <= status < 300:
+                print(f'{self.name} 通知を送信しました')
+                return True
+            if status not in (0, 429) and status < 500:
+                break
+            if attempt < self.max_retries:
+                wait = 2.0 ** attempt
+                try:
+                    wait = max(wait, float(headers.get('Retry-After') or headers.get('retry-after') or 0))
+                except ValueError:
+                    pass
+                time.sleep(wait)
+        print(f'{self.name} 通知失敗: {status or "error"} {body[:200]}')
+        return False
+
+
+class DiscordWebhookChannel(_WebhookBase):
+    name = 'discord'
+
+    def __init__(self, url: Optional[str] = None):
+        settings = get_settings()
+        self.url = (url or settings.discord_webhook_url).strip().strip('"')
+        if not settings.discord_enabled and url is None:
+            self.url = ''
+
+    def _payload(self, message: str) -> dict:
+        # Discord の content 上限は 2000 文字
+        return {'content': message[:2000], 'username': 'お悔やみ情報bot'}
+
+
+class WebhookChannel(_WebhookBase):
+    name = 'webhook'
+
+    def __init__(self, url: Optional[str] = None):
+        settings = get_settings()
+        self.url = (url or settings.webhook_url).strip().strip('"')
+        if not settings.webhook_enabled and url is None:
+            self.url = ''
+
+    def _payload(self, message: str) -> dict:
+        return {'text': message, 'source': 'okuyami', 'sent_at': datetime.now().isoformat(timespec='seconds')}
+
+
+_CHANNEL_TYPES = {
+    'line': LineChannel,
+    'discord': DiscordWebhookChannel,
+    'webhook': WebhookChannel,
+}
+
+
+def load_channels(names: Optional[List[str]] = None) -> List[NotificationChannel]:
+    """有効なチャネルを返す。names 未指定時は OKUYAMI_NOTIFY_CHANNELS、それも無ければ全種類"""
+    if names is None:
+        env = os.getenv('OKUYAMI_NOTIFY_CHANNELS', '')
+        names = [n.strip().lower() for n in env.split(',') if n.strip()] or list(_CHANNEL_TYPES)
+    channels: List[NotificationChannel] = []
+    for name in names:
+        factory = _CHANNEL_TYPES.get(name)
+        if factory is None:
+            print(f'警告: 未知の通知チャネルを無視します: {name}')
+            continue
+        try:
+            ch = factory()
+        except Exception as exc:
+            print(f'通知チャネル {name} の初期化失敗: {exc}')
+            continue
+        if ch.enabled():
+            channels.append(ch)
+    return channels
+
+
+class Outbox:
+    """送信失敗した通知の永続キュー (JSON)。entry: id, channel, message, tag, created, attempts, last_error
+    (+ recipients: 失敗した宛先だけを再送する場合)"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv('OKUYAMI_OUTBOX') or _DEF_OUTBOX
+        self.entries: List[dict] = []
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as rf:
+                    data = json.load(rf)
+                if isinstance(data, list):
+                    self.entries = [e for e in data if isinstance(e, dict)]
+        except Exception as exc:
+            print(f'送信箱の読込失敗(無視): {exc}')
+            self.entries = []
+
+    def save(self) -> None:
+        if not self.entries and not os.path.exists(self.path):
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as wf:
+            json.dump(self.entries, wf, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.path)
+
+    def add(self, channel: str, message: str, tag: str = '', error: str = '',
+            recipients: Optional[List[str]] = None) -> None:
+        for e in self.entries:
+            if e.get('channel') == channel and e.get('tag') == tag and e.get('message') == message:
+                if recipients and e.get('recipients'):
+                    e['recipients'] = list(dict.fromkeys([*e['recipients'], *recipients]))
+                elif not recipients:
+                    e.pop('recipients', None)  # 全宛先への再送に広げる
+                return
+        entry = {
+            'id': uuid.uuid4().hex,
+            'channel': channel,
+            'message': message,
+            'tag': tag,
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'attempts': 1,
+            'last_error': error,
+        }
+        if recipients:
+            entry['recipients'] = list(recipients)
+        self.entries.append(entry)
+
+    def pending(self, tag: Optional[str] = None) -> List[dict]:
+        return [e for e in self.entries if tag is None or e.get('tag') == tag]
+
+
+async def send_all_async(message: str, channels: List[NotificationChannel]) -> Dict[str, bool]:
+    """全チャネルへ並行送信。各 send はブロッキングI/Oのためスレッドで実行"""
+    loop = asyncio.get_running_loop()
+
+    async def _one(ch: NotificationChannel) -> Tuple[str, bool]:
+        try:
+            ok = await loop.run_in_executor(None, ch.send, message)
+        except Exception as exc:
+            print(f'{ch.name} 送信例外: {exc}')
+            ok = False
+        return ch.name, bool(ok)
+
+    results = await asyncio.gather(*(_one(ch) for ch in channels))
+    return dict(results)
+
+
+def _run(coro):
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    # 既にイベントループ内 (pipeline 等) から同期呼出しされた場合は別スレッドで実行
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, coro).result()
+
+
+def notify(message: str, channels: Optional[List[NotificationChannel]] = None, *,
+           tag: str = '', outbox: Optional[Outbox] = None) -> Dict[str, bool]:
+    """message を全チャネルへ送信し {channel: 成功} を返す。失敗分は送信箱へ保存"""
+    if channels is None:
+        channels = load_channels()
+    if not message or not channels:
+        return {}
+    results = _run(send_all_async(message, channels))
+    failed = [name for name, ok in results.items() if not ok]
+    if failed:
+        box = outbox or Outbox()
+        by_name = {ch.name: ch for ch in channels}
+        for name in failed:
+            box.add(name, message, tag, 'send failed', recipients=by_name[name].failed_recipients or None)
+        box.save()
+        print(f'送信失敗を送信箱に保存しました: {", ".join(failed)} -> {box.path}')
+    return results
+
+
+def flush_outbox(outbox: Optional[Outbox] = None, channels: Optional[List[NotificationChannel]] = None,
+                 on_sent: Optional[Callable[[dict], None]] = None) -> Tuple[int, int]:
+    """送信箱の未送信分を再送。(送信成功数, 残件数) を返す。on_sent は再送成功した entry ごとに呼ばれる"""
+    box = outbox or Outbox()
+    if not box.entries:
+        return 0, 0
+    if channels is None:
+        channels = load_channels(sorted({str(e.get('channel')) for e in box.entries}))
+    by_name = {ch.name: ch for ch in channels}
+
+    async def _flush() -> List[Tuple[dict, bool]]:
+        loop = asyncio.get_running_loop()
+
+        async def _one(entry: dict) -> Tuple[dict, bool]:
+            ch = by_name.get(str(entry.get('channel')))
+            if ch is None:
+                return entry, False
+            message = str(entry.get('message', ''))
+            recipients = entry.get('recipients')
+            try:
+                if recipients and isinstance(ch, LineChannel):
+                    # 前回失敗した宛先だけへ再送（成功済みの宛先へ二重に送らない）
+                    result = await loop.run_in_executor(None, ch.send_to, message, list(recipients))
+                    if result.failed:
+                        entry['recipients'] = list(result.failed)
+                    ok = result.ok
+                else:
+                    ok = await loop.run_in_executor(None, ch.send, message)
+            except Exception as exc:
+                entry['last_error'] = str(exc)
+                ok = False
+            return entry, bool(ok)
+
+        return list(await asyncio.gather(*(_one(e) for e in box.entries)))
+
+    print(f'送信箱の未送信通知を再送します: {len(box.entries)}件')
+    outcomes = _run(_flush())
+    remaining: List[dict] = []
+    sent = 0
+    for entry, ok in outcomes:
+        if ok:
+            sent += 1
+            if on_sent is not None:
+                on_sent(entry)
+            continue
+        entry['attempts'] = int(entry.get('attempts', 1)) + 1
+        if entry['attempts'] > _OUTBOX_MAX_ATTEMPTS:
+            print(f"送信箱: 再送上限に達したため破棄します ({entry.get('channel')}, tag={entry.get('tag')})")
+            continue
+        remaining.append(entry)
+    box.entries = remaining
+    box.save()
+    return sent, len(remaining)
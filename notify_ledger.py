@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""通知の冪等性台帳
+(日付, 文面ハッシュ, チャネル) をキーに「公開確認済み(published)」「送信済み(sent)」を記録する。
+auto_upload.bat を再実行しても、同じ内容なら公開待ちを省略し二重通知しない。
+内容が変わった場合（訂正・再解析）はハッシュが変わるため改めて確認・通知する。
+保存先: OKUYAMI_NOTIFY_LEDGER (既定 ./okuyami_output/notify_ledger.json)
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+__all__ = ['NotifyLedger', 'content_hash', 'PAGES_CHANNEL']
+
+_DEF_LEDGER = os.path.join('.', 'okuyami_output', 'notify_ledger.json')
+_KEEP_DAYS = 400
+# 公開確認は擬似チャネル 'pages' として記録
+PAGES_CHANNEL = 'pages'
+
+
+def content_hash(message: str) -> str:
+    return hashlib.sha256(message.encode('utf-8')).hexdigest()[:16]
+
+
+class NotifyLedger:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv('OKUYAMI_NOTIFY_LEDGER') or _DEF_LEDGER
+        self.entries: Dict[str, dict] = {}
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as rf:
+                    data = json.load(rf)
+                if isinstance(data, dict):
+                    self.entries = {k: v for k, v in data.get('entries', {}).items() if isinstance(v, dict)}
+        except Exception as exc:
+            print(f'通知台帳の読込失敗(空として継続): {exc}')
+            self.entries = {}
+
+    @staticmethod
+    def _key(date: str, digest: str, channel: str) -> str:
+        return f'{date}|{digest}|{channel}'
+
+    def _get(self, date: str, digest: str, channel: str) -> Optional[dict]:
+        return self.entries.get(self._key(date, digest, channel))
+
+    def is_published(self, date: str, digest: str) -> bool:
+        return self._get(date, digest, PAGES_CHANNEL) is not None
+
+    def is_sent(self, date: str, digest: str, channel: str) -> bool:
+        entry = self._get(date, digest, channel)
+        return bool(entry and entry.get('state') == 'sent')
+
+    def _mark(self, date: str, digest: str, channel: str, state: str) -> None:
+        self.entries[self._key(date, digest, channel)] = {
+            'state': state,
+            'at': datetime.now().isoformat(timespec='seconds'),
+        }
+        self.save()
+
+    def mark_published(self, date: str, digest: str) -> None:
+        self._mark(date, digest, PAGES_CHANNEL, 'published')
+
+    def mark_sent(self, date: str, digest: str, channel: str) -> None:
+        self._mark(date, digest, channel, 'sent')
+
+    def save(self) -> None:
+        cutoff = (datetime.now() - timedelta(days=_KEEP_DAYS)).strftime('%Y-%m-%d')
+        self.entries = {k: v for k, v in self.entries.items() if k.split('|', 1)[0] >= cutoff}
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as wf:
+            json.dump({'entries': self.entries}, wf, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
@@ -9,15 +9,23 @@ import re
 import csv
 import os
 from datetime import datetime
-import pandas as pd
-from common_utils import compute_priority, detect_holiday, get_jp_date, build_front_matter
-from urllib.parse import quote_plus
-import configparser
-from typing import Optional
-try:
-    import requests  # optional
-except Exception:
-    requests = None  # type: ignore
+from common_utils import detect_holiday, fw_alnum_to_hw, get_jp_date, build_front_matter, get_site_url, get_today_post_url, lazy_module
+from priority_rules import get_priority_engine
+from notifications import LineChannel
+from post_renderer import iter_rows, render_post, write_post
+from settings import get_settings
+from history_store import append_history
+from event_dates import TYPED_COLUMNS, add_typed_columns
+from dedup import DUP_COLUMN, DUP_SOURCE_COLUMN, mark_duplicates
+from trend_stats import build_stats_message, update_trends
+from parse_check import count_markers, run_check
+
+_VENUE_SPLIT = re.compile(r'[、。]')
+_VENUE_KEYWORDS = ('ホール', '会館', 'セレモニー')
+
+# pandas は DataFrame を作る時点で読み込む（休刊日プレースホルダ等では不要）
+pd = lazy_module('pandas')
+
 
 class OkuyamiParser:
     def __init__(self):
@@ -26,6 +34,17 @@ class OkuyamiParser:
         self.current_region = ""
         self.current_city = ""
         self.is_holiday = False  # 休刊日/掲載なし検知フラグ
+        # 件数検査 (parse_check) 用: 本文の『さん（』の数と、目印があるのに解析できなかった行
+        self.marker_count = 0
+        self.unparsed = []
+        # 行単位トレース (parse_trace.ParseTracer)。None なら何も記録しない
+        self.tracer = None
+        # 直近の _parse_person_info が None を返した理由（トレース時のみ記録）
+        self._last_reject = ''
+        # Markdown出力形式: inline=従来のインラインstyle, compact=共通CSS(assets/css/okuyami.css)+class属性
+        settings = get_settings()
+        self.render_mode = settings.render_mode
+        self.minify_html = settings.minify_html
         # 市町村 -> 地域グループマッピング（紙面分類）
         self.city_region_map = {
             # 甲 府
@@ -51,58 +70,16 @@ class OkuyamiParser:
         return s
 
     def _fw_alnum_to_hw(self, s: str) -> str:
-        if not s:
-            return s
-        tbl = {}
-        for code in range(ord('０'), ord('９') + 1):
-            tbl[code] = code - 0xFEE0
-        for code in range(ord('Ａ'), ord('Ｚ') + 1):
-            tbl[code] = code - 0xFEE0
-        for code in range(ord('ａ'), ord('ｚ') + 1):
-            tbl[code] = code - 0xFEE0
-        return s.translate(tbl)
+        return fw_alnum_to_hw(s)
 
     def _get_site_url(self) -> str:
-        """Jekyllの_config.yml から公開サイトURLを組み立てる。失敗時は既定値。
-        優先: 環境変数 OKUYAMI_SITE_URL
-        次点: okuyami-info/_config.yml の url + baseurl
-        既定: https://MiMicroAG.github.io/okuyami-info
-        """
-        env_url = os.getenv('OKUYAMI_SITE_URL')
-        if env_url and env_url.strip():
-            return env_url.strip()
-        cfg_path = os.path.join(os.path.dirname(__file__), 'okuyami-info', '_config.yml')
-        site = 'https://MiMicroAG.github.io/okuyami-info'
-        try:
-            if os.path.exists(cfg_path):
-                url_val, baseurl_val = '', ''
-                import re as _re
-                with open(cfg_path, 'r', encoding='utf-8') as yf:
-                    for line in yf:
-                        m = _re.match(r"\s*url:\s*\"?([^\"\n#]+)\"?", line)
-                        if m:
-                            url_val = m.group(1).strip()
-                        m2 = _re.match(r"\s*baseurl:\s*\"?([^\"\n#]+)\"?", line)
-                        if m2:
-                            baseurl_val = m2.group(1).strip()
-                if url_val:
-                    if baseurl_val:
-                        if baseurl_val.startswith('/'):
-                            site = f"{url_val}{baseurl_val}"
-                        else:
-                            site = f"{url_val}/{baseurl_val}"
-                    else:
-                        site = url_val
-        except Exception:
-            pass
-        return site
+        """公開サイトURL（settings: OKUYAMI_SITE_URL > Pages リポジトリの _config.yml > 既定値）"""
+        return get_site_url()
 
     def _get_today_post_url(self) -> str:
         """当日の投稿URLを生成（Jekyllのpermalink設定に基づく）"""
-        site = self._get_site_url().rstrip('/')
-        today = datetime.now()
         # _config.yml の collections.posts.permalink に合わせて /posts/YYYY/MM/DD/okuyami-info/
-        return f"{site}/posts/{today.strftime('%Y/%m/%d')}/okuyami-info/"
+        return get_today_post_url()
 
     def _normalize_municipality(self, name: str) -> str:
         """市町村名の空白（半角/全角）を正規化して除去する。
@@ -134,8 +111,11 @@ class OkuyamiParser:
             # 休刊日/掲載なし検知
             if any(k in content for k in ['休刊日', '掲載はありません', '掲載なし']):
                 self.is_holiday = True
+                if self.tracer is not None:
+                    self.tracer.event('holiday', file=filepath)
                 # 休刊日の場合はデータ解析せず空配列で戻す
                 return []
+            self.marker_count = count_markers(content)
             # --- 前処理: 1行に詰め込まれているケースに対応するため、区切り記号前に改行を挿入 ---
             # 既に改行の直後にある場合は挿入しない (先読み否定)
             import re as _re_pre
@@ -172,32 +152,39 @@ class OkuyamiParser:
                     break
             
             # 本文部分を解析
-            self._parse_content(lines[start_index:])
+            self._parse_content(lines[start_index:], start_index)
             
             return self.data
             
         except Exception as e:
             print(f"ファイル解析エラー: {e}")
+            if self.tracer is not None:
+                self.tracer.error(e)
             return []
     
-    def _parse_content(self, lines):
+    def _parse_content(self, lines, line_offset=0):
         """
         お悔やみ情報の本文を解析
         
         Args:
             lines (list): テキストファイルの行リスト
+            line_offset (int): トレースの行番号に加える先頭行の位置
         """
+        tr = self.tracer
         i = 0
         while i < len(lines):
             line = lines[i].strip()
             
             # 空行をスキップ
             if not line:
+                if tr is not None:
+                    tr.line(line_offset + i + 1, 'other', 'blank', '')
                 i += 1
                 continue
             
             # 地域セクションの検出（改行挿入処理で『■ 甲 府 』『■』に割れてしまったケースへ対応）
             region_match = re.match(r'■\s*(.*?)\s*■', line)
+            region_branch = 'region'
             if not region_match and line.startswith('■') and '■' not in line[1:] and not line.endswith('■'):
                 # 次行が単独 '■' の場合は結合して地域扱い
                 if i + 1 < len(lines) and lines[i+1].strip() == '■':
@@ -206,11 +193,14 @@ class OkuyamiParser:
                     if region_match:
                         # 次行スキップ用に消費
                         i += 1
+                        region_branch = 'region_merged'
             if region_match:
                 self.current_region = region_match.group(1).strip()
                 # スペースバリエーション正規化（全角/半角混在→半角スペース1つ）
                 self.current_region = re.sub(r'\s+', ' ', self.current_region)
                 self.current_city = ""  # 地域が変わったら市町村をリセット
+                if tr is not None:
+                    tr.line(line_offset + i + 1, 'region', region_branch, line, region=self.current_region)
                 i += 1
                 continue
             # フォールバック: 誤って "■ 甲　府　" と単独行になり次行が人物開始("■姓名さん(")の場合
@@ -227,6 +217,8 @@ class OkuyamiParser:
                             self.current_city = ""
                         # 次行側の先頭 '■' を除去
                         lines[i+1] = re.sub(r'^\s*■', '', lines[i+1])
+                        if tr is not None:
+                            tr.line(line_offset + i + 1, 'region', 'region_fallback', line, region=self.current_region)
                         i += 1
                         continue
             
@@ -261,6 +253,10 @@ class OkuyamiParser:
                                 if addr and not addr.startswith('甲府市'):
                                     person_info['住所'] = '甲府市' + addr
                         self.data.append(person_info)
+                    else:
+                        self.unparsed.append(line)
+                    if tr is not None:
+                        self._trace_person(tr, line_offset + i + 1, 'city', 'city_known', line, person_info)
                     i += 1
                     continue
                 # フォールバック: 'さん（' の直前までで最も自然な区切りを探す（末尾の市/町/村/区 ただしその後 2～4 文字で 'さん（' を含む人名が続く候補を選択）
@@ -285,10 +281,16 @@ class OkuyamiParser:
                             city_val = self.current_city if self.current_city else self.current_region
                             person_info['市町村'] = self._normalize_municipality(city_val)
                             self.data.append(person_info)
+                        else:
+                            self.unparsed.append(line)
+                        if tr is not None:
+                            self._trace_person(tr, line_offset + i + 1, 'city', 'city_split', line, person_info)
                         i += 1
                         continue
                 # 上記いずれも失敗した場合は従来通り市町村行として扱う
                 self.current_city = self._normalize_municipality(rest)
+                if tr is not None:
+                    tr.line(line_offset + i + 1, 'city', 'city', line, region=self.current_region, city=self.current_city)
                 i += 1
                 continue
             
@@ -322,24 +324,48 @@ class OkuyamiParser:
                         if addr and not addr.startswith('甲府市'):
                             person_info['住所'] = '甲府市' + addr
                 self.data.append(person_info)
+            elif 'さん（' in line:
+                self.unparsed.append(line)
+            if tr is not None:
+                if person_info or 'さん（' in line:
+                    self._trace_person(tr, line_offset + i + 1, 'person', 'person', line, person_info)
+                else:
+                    tr.line(line_offset + i + 1, 'other', 'ignored', line, region=self.current_region,
+                            city=self.current_city, reason='目印なし')
             
             i += 1
     
+    def _trace_person(self, tr, n, tok, branch, line, person_info):
+        """人物行のトレース（結果のレコード、または直前の _parse_person_info が記録した棄却理由）"""
+        if person_info:
+            tr.line(n, tok, branch, line, region=person_info.get('地域', ''), city=person_info.get('市町村', ''),
+                    record=person_info)
+        else:
+            tr.line(n, tok, branch, line, region=self.current_region, city=self.current_city,
+                    reason=self._last_reject or '不明')
+    
+    def _reject(self, reason):
+        """_parse_person_info の失敗。トレース時のみ理由を記録して None を返す"""
+        if self.tracer is not None:
+            self._last_reject = reason
+        return None
+    
     def _parse_person_info(self, line):
-        """1行（人物情報）を解析し dict を返す。失敗時 None。"""
+        """1行（人物情報）を解析し dict を返す。失敗時 None（トレース時は理由を self._last_reject に記録）。"""
+        self._last_reject = ''
         if not line or 'さん（' not in line:
-            return None
+            return self._reject('目印なし')
         cleaned = re.sub(r'☆（.*?）', '', line)
         m = re.match(r'(.+?)さん（(.+?)）\s*(.+)', cleaned)
         if not m:
-            return None
+            return self._reject('氏名さん（ふりがな） の形式ではない')
         name = m.group(1).strip()
         furigana = m.group(2).strip()
         rest = m.group(3).strip()
 
         parts = rest.split('。')
         if len(parts) < 4:
-            return None
+            return self._reject(f'句点区切りが不足 ({len(parts)} < 4)')
         age_idx = -1
         age = 0
         for i, part in enumerate(parts):
@@ -349,7 +375,7 @@ class OkuyamiParser:
                 age_idx = i
                 break
         if age_idx == -1:
-            return None
+            return self._reject('年齢 (N歳) なし')
         if age_idx >= 3:
             occupation_raw = parts[0].strip() if age_idx > 2 else ''
             address = parts[age_idx - 2].strip()
@@ -453,22 +479,13 @@ class OkuyamiParser:
         """
         会場情報を抽出
         """
-        # 「○○ホール」「○○会館」などの会場名
-        venue_patterns = [
-            r'([^、。]*?ホール[^、。]*)',
-            r'([^、。]*?会館[^、。]*)',
-            r'([^、。]*?セレモニー[^、。]*)',
-            r'([^、。]*?シティホール[^、。]*)'
-        ]
-        
-        for pattern in venue_patterns:
-            match = re.search(pattern, text)
-            if match:
-                venue = match.group(1).strip()
-                # 不要な部分を除去
-                venue = re.sub(r'\(斎場の地図はこちら\)', '', venue).strip()
-                return venue
-        
+        # 「○○ホール」「○○会館」などの会場名。読点/句点で区切った断片を1回だけ走査し、
+        # ホール > 会館 > セレモニー の優先順で最初に含む断片を採用
+        segments = _VENUE_SPLIT.split(text)
+        for keyword in _VENUE_KEYWORDS:
+            for seg in segments:
+                if keyword in seg:
+                    return seg.replace('(斎場の地図はこちら)', '').strip()
         return ""
     
     def _extract_relatives(self, text):
@@ -548,23 +565,19 @@ class OkuyamiParser:
             # 列の順序を指定
             columns_order = [
                 '地域', '市町村', '氏名', 'ふりがな', '住所', '死亡日', '年齢',
-                '職歴・属性', '喪主', '関係者', '通夜', '告別式', '会場'
+                '職歴・属性', '喪主', '関係者', '通夜', '告別式', '会場', *TYPED_COLUMNS, DUP_COLUMN, DUP_SOURCE_COLUMN
             ]
             
             # 存在する列のみを選択
             existing_columns = [col for col in columns_order if col in df.columns]
             df = df[existing_columns]
             
-            # 優先度に基づいてソート
-            def get_priority(row):
-                return compute_priority(row)
-            
             # 元の順序を保持するためのインデックスを追加
             df = df.reset_index(drop=True)
             df['_original_order'] = df.index
             
-            # 優先度を計算してソート
-            df['_priority'] = df.apply(get_priority, axis=1)
+            # 優先度を計算してソート（config.ini [priority] の規則で列単位に一括判定）
+            df['_priority'] = get_priority_engine().score_frame(df)
             df_sorted = df.sort_values(['_priority', '_original_order'])  # 優先度、元の順序でソート
             df_sorted = df_sorted.drop(columns=['_priority', '_original_order'])  # 作業用列を削除
 
@@ -644,23 +657,19 @@ class OkuyamiParser:
             # 列の順序を指定
             columns_order = [
                 '地域', '市町村', '氏名', 'ふりがな', '住所', '死亡日', '年齢',
-                '職歴・属性', '喪主', '関係者', '通夜', '告別式', '会場'
+                '職歴・属性', '喪主', '関係者', '通夜', '告別式', '会場', *TYPED_COLUMNS, DUP_COLUMN, DUP_SOURCE_COLUMN
             ]
             
             # 存在する列のみを選択
             existing_columns = [col for col in columns_order if col in df.columns]
             df = df[existing_columns]
             
-            # 優先度に基づいてソート
-            def get_priority(row):
-                return compute_priority(row)
-            
             # 元の順序を保持するためのインデックスを追加
             df = df.reset_index(drop=True)
             df['_original_order'] = df.index
             
-            # 優先度を計算してソート
-            df['_priority'] = df.apply(get_priority, axis=1)
+            # 優先度を計算してソート（config.ini [priority] の規則で列単位に一括判定）
+            df['_priority'] = get_priority_engine().score_frame(df)
             df_sorted = df.sort_values(['_priority', '_original_order'])  # 優先度、元の順序でソート
             df_sorted = df_sorted.drop(columns=['_priority', '_original_order'])  # 作業用列を削除
             
@@ -705,56 +714,40 @@ class OkuyamiParser:
             # 列の順序を指定
             columns_order = [
                 '地域', '市町村', '氏名', 'ふりがな', '住所', '死亡日', '年齢',
-                '職歴・属性', '喪主', '関係者', '通夜', '告別式', '会場'
+                '職歴・属性', '喪主', '関係者', '通夜', '告別式', '会場', *TYPED_COLUMNS, DUP_COLUMN, DUP_SOURCE_COLUMN
             ]
             
             # 存在する列のみを選択
             existing_columns = [col for col in columns_order if col in df.columns]
             df = df[existing_columns]
             
-            # 優先度に基づいてソート
-            def get_priority(row):
-                return compute_priority(row)
-            
             # 元の順序を保持するためのインデックスを追加
             df = df.reset_index(drop=True)
             df['_original_order'] = df.index
             
-            # 優先度を計算してソート
-            df['_priority'] = df.apply(get_priority, axis=1)
+            # 優先度を計算してソート（config.ini [priority] の規則で列単位に一括判定）
+            df['_priority'] = get_priority_engine().score_frame(df)
             df_sorted = df.sort_values(['_priority', '_original_order'])  # 優先度、元の順序でソート
             df_sorted = df_sorted.drop(columns=['_priority', '_original_order'])  # 作業用列を削除
 
             # LINE通知はGitHub Pagesへの公開後（約2分後）に送信するため、ここでは送信しない
             
-            # Markdownファイルとして保存
-            with open(output_path, 'w', encoding='utf-8') as f:
-                fm = build_front_matter(f'お悔やみ情報 ({get_jp_date()})', datetime.now(), layout='default')
-                f.write(fm)
-                
-                # CSSスタイルを追加（モバイル最適化）
-                f.write('<style>\n')
-                f.write('@media (max-width: 768px) {\n')
-                f.write('  .compact-table { font-size: 12px; }\n')
-                f.write('  .compact-table th, .compact-table td { padding: 4px !important; }\n')
-                f.write('  .responsive-table { overflow-x: auto; -webkit-overflow-scrolling: touch; }\n')
-                f.write('  table { min-width: auto !important; }\n')
-                f.write('}\n')
-                f.write('</style>\n\n')
-                
-                # タイトル
-                f.write(f'# お悔やみ情報 ({get_jp_date()})\n\n')
-                # 統計情報と市町村別人数はWebには掲載しない（LINEに通知済み）
-                
-                # 全体テーブル（簡易版のみ）
-                f.write('## 全体一覧（簡易版）\n\n')
-                self._write_compact_table(f, df_sorted)
-                
-                # 市町村別一覧はWeb掲載しない
-                
-                # フッター
-                f.write('---\n')
-                f.write(f'*最終更新: {datetime.now().strftime("%Y年%m月%d日 %H:%M:%S")}*\n')
+            # Markdownファイルとして保存（テンプレートから行単位で書き出し）
+            records = df_sorted.to_dict(orient='records')
+            layout = 'compact' if self.render_mode == 'compact' else 'inline'
+            # 斎場リンクは出力先の会場辞書（と同梱の初期辞書）で照合
+            rows = iter_rows(records, os.path.dirname(output_path))
+            if layout == 'compact':
+                # 変換前 (inline) のサイズ比較にも使うため、行の準備（住所・斎場リンク等）は1回だけ
+                rows = list(rows)
+                with open(output_path, 'w', encoding='utf-8') as f:
+                    size = write_post(f, self._render_markdown(rows, layout, prepared=True))
+                legacy_size = sum(len(c.encode('utf-8')) for c in self._render_markdown(rows, 'inline', prepared=True))
+                ratio = (1 - size / legacy_size) * 100 if legacy_size else 0.0
+                print(f"ページサイズ: {legacy_size:,} bytes (inline) -> {size:,} bytes (compact{'+minify' if self.minify_html else ''}, -{ratio:.1f}%)")
+            else:
+                with open(output_path, 'w', encoding='utf-8') as f:
+                    write_post(f, self._render_markdown(rows, layout, prepared=True))
             
             print(f"Markdownファイルを保存しました: {output_path}")
             
@@ -764,229 +757,41 @@ class OkuyamiParser:
         except Exception as e:
             print(f"Markdown保存エラー: {e}")
 
+    def _render_markdown(self, records, layout: str, prepared: bool = False):
+        """投稿Markdownをチャンク単位で生成（レイアウトは templates/post_<layout>.md.tmpl）"""
+        # 統計情報と市町村別人数・市町村別一覧はWebには掲載しない（LINEに通知済み）
+        return render_post(
+            records,
+            layout=layout,
+            front_matter=build_front_matter(f'お悔やみ情報 ({get_jp_date()})', datetime.now(), layout='default'),
+            jp_date=get_jp_date(),
+            updated=datetime.now().strftime("%Y年%m月%d日 %H:%M:%S"),
+            minify=self.minify_html,
+            prepared=prepared,
+        )
+
     # LINE Notify は使用しないため削除（Messaging API のみ使用）
 
     def _send_line_messaging(self, message: str) -> bool:
-        """LINE Messaging API でメッセージ送信（Push message）
+        """LINE Messaging API でメッセージ送信（multicast/並列push）
         env:
           LINE_MESSAGING_CHANNEL_ACCESS_TOKEN, LINE_MESSAGING_TO(カンマ区切り)
         config.ini:
           [line_messaging] enabled, channel_access_token, to
         戻り値: 送信を試み送れたら True、未設定や失敗で False
         """
-        enabled: bool = True
-        token: Optional[str] = os.getenv('LINE_MESSAGING_CHANNEL_ACCESS_TOKEN')
-        to_raw: Optional[str] = os.getenv('LINE_MESSAGING_TO')
-        recipients = []
-        if not token or not to_raw:
-            cfg = configparser.ConfigParser()
-            if os.path.exists('config.ini'):
-                try:
-                    cfg.read('config.ini', encoding='utf-8')
-                    enabled = cfg.getboolean('line_messaging', 'enabled', fallback=True)
-                    token = token or cfg.get('line_messaging', 'channel_access_token', fallback='').strip()
-                    to_raw = to_raw or cfg.get('line_messaging', 'to', fallback='').strip()
-                except Exception:
-                    pass
-        if not enabled:
-            return False
-        if not token or not to_raw:
-            return False
-        # ダブルクオートで囲まれている場合は除去
-        if token.startswith('"') and token.endswith('"'):
-            token = token[1:-1]
-        # 宛先のダブルクオート除去
-        if to_raw.startswith('"') and to_raw.endswith('"'):
-            to_raw = to_raw[1:-1]
-        recipients = [r.strip().strip('"') for r in to_raw.split(',') if r.strip()]
-        # 宛先IDの形式を簡易検証（U/G/R + 32桁）
-        import re as _re
-        invalid_ids = [rid for rid in recipients if not _re.fullmatch(r'[UGR][0-9a-fA-F]{32}', rid)]
-        if invalid_ids:
-            print(f"LINE Messaging設定警告: 宛先IDの形式が不正: {', '.join(invalid_ids)}")
-            print("例: ユーザーIDは U で始まる 33 文字。表示名では送れません。")
-        # 送信前にトークンの有効性を軽く検査
-        try:
-            if requests:
-                info_resp = requests.get('https://api.line.me/v2/bot/info', headers={'Authorization': f'Bearer {token}'}, timeout=8)
-                if info_resp.status_code == 401:
-                    print('LINE Messagingトークン無効: チャネルアクセストークンを再発行（Messaging APIの長期トークン）してください。')
-                    return False
-        except Exception:
-            # ネットワーク不通などは続行（本送信で再評価）
-            pass
-        if not recipients:
+        channel = LineChannel()
+        if not channel.enabled():
             return False
-        url = 'https://api.line.me/v2/bot/message/push'
-        headers = {
-            'Authorization': f'Bearer {token}',
-            'Content-Type': 'application/json'
-        }
-        payload_template = {
-            'to': None,
-            'messages': [
-                {
-                    'type': 'text',
-                    'text': message
-                }
-            ]
-        }
         try:
-            import json as _json
-            sent_any = False
-            if requests:
-                for rid in recipients:
-                    payload = dict(payload_template)
-                    payload['to'] = rid
-                    r = requests.post(url, headers=headers, data=_json.dumps(payload), timeout=10)
-                    if r.status_code == 200:
-                        sent_any = True
-                    else:
-                        if r.status_code == 401:
-                            print('LINE Messaging送信失敗(401): 認証エラー。以下を確認してください:')
-                            print(' - Messaging APIのチャネルアクセストークン（長期）を使用しているか')
-                            print(' - トークンのチャネルが正しいか（別チャネルのトークンでは不可）')
-                            print(' - 宛先IDが U/G/R で始まる正しいIDか（表示名不可）')
-                            print(' - 受信者がBotを友だち追加/グループへ招待済みか（Push許可）')
-                        else:
-                            print(f'LINE Messaging送信失敗: {r.status_code} {getattr(r,"text","")[:200]}')
-            else:
-                import urllib.request, urllib.error
-                for rid in recipients:
-                    payload = dict(payload_template)
-                    payload['to'] = rid
-                    data = _json.dumps(payload).encode('utf-8')
-                    req = urllib.request.Request(url, data=data, method='POST', headers=headers)
-                    try:
-                        with urllib.request.urlopen(req, timeout=10) as resp:
-                            if resp.status == 200:
-                                sent_any = True
-                            else:
-                                print(f'LINE Messaging送信失敗: {resp.status}')
-                    except urllib.error.HTTPError as he:
-                        print(f'LINE Messaging送信HTTPエラー: {he.code}')
-                    except Exception as e:
-                        print(f'LINE Messaging送信エラー: {e}')
-            if sent_any:
-                print('LINE Messaging APIで通知を送信しました')
-            return sent_any
+            return channel.send(message)
         except Exception as e:
             print(f'LINE Messaging送信例外: {e}')
             return False
 
-    def _build_stats_message(self, df: pd.DataFrame) -> str:
-        """統計情報のLINE通知文面を生成"""
-        if df.empty:
-            return ''
-        post_url = self._get_today_post_url()
-        # 安全に数値化
-        ages_series = df['年齢'] if '年齢' in df.columns else pd.Series(dtype='float64')
-        ages = pd.to_numeric(ages_series, errors='coerce')
-        total = len(df)
-        mean_age = ages.mean()
-        max_age = ages.max()
-        min_age = ages.min()
-        # 市町村別人数
-        city_counts = df['市町村'].value_counts().sort_index() if '市町村' in df.columns else {}
-        date_str = datetime.now().strftime('%Y-%m-%d')
-        lines = [
-            post_url,
-            '',
-            f'【お悔やみ情報 {date_str}】',
-            '統計情報',
-            f'- 総人数: {total}名',
-            f'- 平均年齢: {mean_age:.1f}歳' if pd.notna(mean_age) else '- 平均年齢: -',
-            f'- 最高年齢: {int(max_age)}歳' if pd.notna(max_age) else '- 最高年齢: -',
-            f'- 最低年齢: {int(min_age)}歳' if pd.notna(min_age) else '- 最低年齢: -',
-            '',
-            '市町村別人数',
-        ]
-        if hasattr(city_counts, 'items'):
-            for city, count in city_counts.items():
-                lines.append(f'- {city}: {count}名')
-        msg = '\n'.join(lines)
-        # LINE Notifyの上限対策（1000文字程度）
-        return msg[:950]
-    
-    def _write_compact_table(self, f, df):
-        """コンパクトなテーブルを書き込む（モバイル最適化）"""
-        f.write('<div class="responsive-table" style="overflow-x: auto; max-width: 100%; margin-bottom: 20px;">\n')
-        f.write('<table class="compact-table" style="width: 100%; border-collapse: collapse; font-size: 14px; min-width: 300px;">\n')
-        
-        # ヘッダー（簡略版）
-        f.write('<thead>\n<tr style="background-color: #f0f0f0; border-bottom: 2px solid #ddd;">\n')
-        # 氏名, 年齢, 住所(=市町村+住所), 関係者
-        compact_headers = ['氏名', '年齢', '住所', '関係者']
-        for header in compact_headers:
-            f.write(f'<th style="padding: 8px; text-align: left; border: 1px solid #ddd; font-weight: bold;">{header}</th>\n')
-        f.write('</tr>\n</thead>\n')
-        
-        # データ行
-        f.write('<tbody>\n')
-        for _, row in df.iterrows():
-            # 関係者セルのみ赤字にする判断は後で行う（ここでは行の基本スタイルのみ）
-            try:
-                rel_check = row['関係者'] if ('関係者' in row and pd.notna(row['関係者'])) else ''
-            except Exception:
-                rel_check = ''
-            f.write('<tr style="border-bottom: 1px solid #eee;">\n')
-            # 氏名（太字・改行禁止）
-            name = row['氏名'] if pd.notna(row['氏名']) else ''
-            f.write(f'<td style="padding: 8px; border: 1px solid #ddd; font-weight: bold; white-space: nowrap;">{name}</td>\n')
-
-            # 年齢
-            age = row['年齢'] if pd.notna(row['年齢']) else ''
-            f.write(f'<td style="padding: 8px; border: 1px solid #ddd; text-align: center; font-size: 12px;">{age}</td>\n')
-            
-            # 住所（= 市町村 + 住所 を連結、重複回避し簡略表示）
-            city = row['市町村'] if ('市町村' in row and pd.notna(row['市町村'])) else ''
-            address_raw = row['住所'] if pd.notna(row['住所']) else ''
-            merged_addr = ''
-            if city and address_raw:
-                addr_str = str(address_raw)
-                city_str = str(city)
-                if addr_str.startswith(city_str):
-                    merged_addr = addr_str
-                else:
-                    merged_addr = f"{city_str}{addr_str}"
-            elif city:
-                merged_addr = str(city)
-            else:
-                merged_addr = str(address_raw)
-            # 簡略表示（モバイル最適化のため）
-            if len(merged_addr) > 15:
-                merged_addr = merged_addr[:15] + '...'
-            # Google Maps へリンク
-            addr_display = merged_addr
-            addr_html = addr_display
-            try:
-                if addr_display and addr_display != '':
-                    q = quote_plus(addr_display)
-                    map_url = f'https://www.google.com/maps/search/?api=1&query={q}'
-                    addr_html = f'<a href="{map_url}" target="_blank" rel="noopener">{addr_display}</a>'
-            except Exception:
-                addr_html = addr_display
-            f.write(f'<td style="padding: 8px; border: 1px solid #ddd; font-size: 12px;">{addr_html}</td>\n')
-            
-            # 関係者（CSV値を元に、読点/カンマで改行表示）
-            relatives = row['関係者'] if ('関係者' in row and pd.notna(row['関係者'])) else ''
-            raw_rel = relatives if isinstance(relatives, str) else ''
-            if raw_rel:
-                # 全角/半角カンマ正規化し分割
-                tmp = raw_rel.replace('，', '、')
-                parts = [p.strip() for p in tmp.split('、') if p.strip()]
-                rel_html = '<br>'.join(parts) if parts else raw_rel
-            else:
-                rel_html = ''
-            # NEC を含む場合はこのセルのみ赤字のインラインスタイルを付与
-            cell_style = 'padding: 8px; border: 1px solid #ddd; font-size: 12px; line-height: 1.3; white-space: normal;'
-            # 日本語文字と連続する場合もあるため単純包含チェックに変更
-            if isinstance(rel_check, str) and re.search(r'NEC', str(rel_check), flags=re.IGNORECASE):
-                cell_style = 'color: red; ' + cell_style
-            f.write(f'<td style="{cell_style}">{rel_html}</td>\n')
-            f.write('</tr>\n')
-        
-        f.write('</tbody>\n</table>\n</div>\n\n')
+    def _build_stats_message(self, df: 'pd.DataFrame') -> str:
+        """統計情報のLINE通知文面を生成（trend_stats.build_stats_message に集約）"""
+        return build_stats_message(df, datetime.now(), self._get_today_post_url())
     
     def _write_markdown_table(self, f, df):
         """
@@ -1042,6 +847,14 @@ class OkuyamiParser:
             print(f"{city}: {count}名")
 
 
+def _apply_render_options(parser_obj, args):
+    """CLI の --render/--minify を環境変数より優先して反映"""
+    if args.render:
+        parser_obj.render_mode = args.render
+    if args.minify:
+        parser_obj.minify_html = True
+
+
 def main():
     """
     メイン関数
@@ -1055,6 +868,9 @@ def main():
     parser.add_argument('--csv', help='入力CSV (解析済)')
     parser.add_argument('--file', help='入力テキストファイル (okuyami_YYYYMMDD.txt)')
     parser.add_argument('--output-dir', type=str, default='./okuyami_output', help='出力ディレクトリ')
+    parser.add_argument('--render', choices=['inline', 'compact'], help='Markdown出力形式 (既定: OKUYAMI_RENDER_MODE または inline)')
+    parser.add_argument('--minify', action='store_true', help='compact 出力の表HTMLを1行に圧縮')
+    parser.add_argument('--trace', metavar='JSONL', help='行ごとの分岐・結果/棄却理由を JSONL に記録 (--file のみ)')
     args = parser.parse_args()
     
     # CSV -> Markdown ルート
@@ -1078,6 +894,7 @@ def main():
         output_dir = args.output_dir
         os.makedirs(output_dir, exist_ok=True)
         parser_obj = OkuyamiParser()
+        _apply_render_options(parser_obj, args)
         # そのまま Markdown 保存
         md_out = os.path.join(output_dir, f"{base_name}_mdfromcsv_{timestamp}.md")
         parser_obj.save_to_markdown(data, md_out)
@@ -1091,7 +908,15 @@ def main():
             print(f"入力テキストが見つかりません: {input_file}")
             sys.exit(1)
         parser_obj = OkuyamiParser()
+        _apply_render_options(parser_obj, args)
+        if args.trace:
+            from parse_trace import ParseTracer
+            parser_obj.tracer = ParseTracer(args.trace)
         data = parser_obj.parse_file(input_file)
+        if parser_obj.tracer is not None:
+            parser_obj.tracer.close()
+            counts = parser_obj.tracer.counts
+            print(f"解析トレース: {args.trace} (" + ', '.join(f'{k}={v}' for k, v in sorted(counts.items())) + ')')
         # 日付抽出 (行に "日付: YYYY-MM-DD" がある前提)
         post_date = None
         try:
@@ -1121,9 +946,10 @@ def main():
                     os.makedirs(output_dir, exist_ok=True)
                     placeholder_csv = os.path.join(output_dir, f"{base_name}_parsed_{timestamp}_holiday.csv")
                     placeholder_md = os.path.join(output_dir, f"{base_name}_parsed_{timestamp}_holiday.md")
-                    import pandas as _pd
-                    cols = ['地域','市町村','氏名','ふりがな','住所','死亡日','年齢','職歴・属性','喪主','関係者','通夜','告別式','会場']
-                    _pd.DataFrame(columns=cols).to_csv(placeholder_csv, index=False, encoding='utf-8-sig')
+                    cols = ['地域','市町村','氏名','ふりがな','住所','死亡日','年齢','職歴・属性','喪主','関係者','通夜','告別式','会場', *TYPED_COLUMNS]
+                    # ヘッダのみの CSV（pandas を読み込まずに済ませる）
+                    with open(placeholder_csv, 'w', encoding='utf-8-sig', newline='') as _pc:
+                        csv.writer(_pc).writerow(cols)
                     # Markdown (簡易メッセージ)
                     jp_date = ''
                     if post_date:
@@ -1141,6 +967,8 @@ def main():
                     print(f"プレースホルダーMD生成: {placeholder_md}")
                 except Exception as _pe:
                     print(f"プレースホルダー生成失敗: {_pe}")
+                append_history(post_date, [], args.output_dir)
+                update_trends(post_date, [], args.output_dir)
                 if post_date:
                     from subprocess import Popen, PIPE
                     cmd = ['python', 'upload_to_github_pages.py', '--repo', repo_path, '--generate-empty', '--reason', 'holiday', '--date', post_date]
@@ -1167,18 +995,36 @@ def main():
                     print('日付抽出に失敗したため空ポスト自動生成をスキップしました。')
                 print('ENTRY_COUNT=0')
                 sys.exit(0)
+            if parser_obj.marker_count:
+                # 本文に人物の目印があるのに0件 = 全件の取りこぼし。掲載なしとして通知・公開しない
+                run_check(post_date, data, parser_obj.marker_count, unparsed=parser_obj.unparsed,
+                          output_dir=args.output_dir, block=True)
+                print(f'解析結果が空です (本文の目印 {parser_obj.marker_count}件、公開を停止)')
+                print('ENTRY_COUNT=0')
+                sys.exit(3)
             print('解析結果が空です')
             sys.exit(2)
         base_name = os.path.splitext(os.path.basename(input_file))[0]
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         output_dir = args.output_dir
         os.makedirs(output_dir, exist_ok=True)
+        # 死亡日・通夜・告別式を掲載日基準の日付/日時に（型付き列: 死亡年月日/通夜日時/告別式日時）
+        add_typed_columns(data, post_date)
+        # 過去の掲載（既定30日）と照合し再掲・訂正に印を付ける（投稿・統計で二重に数えない）
+        mark_duplicates(data, post_date, csv_dir=output_dir)
         csv_out = os.path.join(output_dir, f"{base_name}_parsed_{timestamp}.csv")
         md_out = os.path.join(output_dir, f"{base_name}_parsed_{timestamp}.md")
         parser_obj.save_to_csv(data, csv_out)
         parser_obj.save_to_markdown(data, md_out)
+        # 年/月パーティションの履歴 (Parquet/Feather) に当日分を追記
+        append_history(post_date, data, output_dir)
+        # 本文の『さん（』の数・直近の件数と比べ、食い違えば公開前に通知（block 設定時は終了コード3で公開を止める）
+        blocked = run_check(post_date, data, parser_obj.marker_count, unparsed=parser_obj.unparsed,
+                            output_dir=output_dir)
+        # 日次の人数・市町村別・年代別の推移集計を当日分だけ更新
+        update_trends(post_date, data, output_dir)
         print(f"ENTRY_COUNT={len(data)}")
-        sys.exit(0)
+        sys.exit(3 if blocked else 0)
 
     if args.file and args.csv:
         print('同時指定はできません (--file か --csv のどちらか)')
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""日次件数の異常検知（スクレイピング・解析の退行を公開前に止める）
+当日の解析件数を次の2つと比べ、食い違えば通知チャネル (notifications) へ警告する。
+
+- 目印の数: 本文中の『さん（』の数（解析器とは独立した安価な見積もり。parse_file で1回だけ数える）
+- 直近の基準: 推移集計 (trend_stats) の直近28日のうち掲載のあった日の中央値（7日分未満なら比較しない）
+
+判定:
+- 解析件数 < 目印の数 → 取りこぼし（解析できなかった行を添えて警告）
+- 解析件数 > 目印の数 → 目印の無い書式の混入（同上、警告のみ）
+- 中央値の 0.4 倍未満 / 2.5 倍超 → 取得漏れ・二重取得の疑い
+
+設定: OKUYAMI_ANOMALY_BLOCK=1 / config.ini [anomaly] block = true で、警告時に解析を終了コード3で止める
+（auto_upload.bat は解析失敗として公開しない）。既定は警告のみ。
+ただし目印があるのに解析件数が0件の場合は、設定に関係なく警告のうえ終了コード3
+（掲載なしの日として公開・通知しない）。
+
+単体実行:
+  python parse_check.py okuyami_20250808.txt --date 2025-08-08
+"""
+from __future__ import annotations
+from datetime import date, datetime, timedelta
+from statistics import median
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+from dedup import is_duplicate
+from notifications import notify
+from settings import get_settings
+from trend_stats import TrendStore
+
+__all__ = ['MARKER', 'Issue', 'count_markers', 'baseline', 'check_counts', 'alert_message', 'run_check']
+
+# 人物行の目印（『氏名さん（ふりがな）』）
+MARKER = 'さん（'
+BASELINE_DAYS = 28
+BASELINE_MIN_DAYS = 7
+LOW_RATIO = 0.4
+HIGH_RATIO = 2.5
+# 警告に添える未解析行の上限
+_SAMPLE_LIMIT = 5
+
+
+class Issue(NamedTuple):
+    kind: str  # 'markers' / 'baseline'
+    message: str
+
+
+def count_markers(text: str) -> int:
+    return text.count(MARKER)
+
+
+def baseline(day: date, store: Optional[TrendStore] = None) -> Optional[float]:
+    """day より前の直近 BASELINE_DAYS 日で掲載のあった日の中央値（日数不足なら None）"""
+    if store is None:  # 空の TrendStore は偽になるため None で判定
+        store = TrendStore()
+    totals = store.daily_totals(day - timedelta(days=BASELINE_DAYS), day - timedelta(days=1))
+    counts = [c for c in totals.values() if c > 0]  # 休刊日は除く
+    if len(counts) < BASELINE_MIN_DAYS:
+        return None
+    return float(median(counts))
+
+
+def check_counts(day: date, records: Sequence[Dict[str, Any]], markers: int, *,
+                 unparsed: Sequence[str] = (), store: Optional[TrendStore] = None) -> List[Issue]:
+    issues: List[Issue] = []
+    parsed = len(records)
+    if parsed != markers:
+        what = '取りこぼし' if parsed < markers else '目印の無い行を解析'
+        msg = f'解析件数 {parsed}件 / 本文の「{MARKER}」{markers}件 ({what})'
+        if unparsed:
+            samples = [s[:40] for s in unparsed[:_SAMPLE_LIMIT]]
+            msg += '\n' + '\n'.join(f'  未解析: {s}' for s in samples)
+        issues.append(Issue('markers', msg))
+    base = baseline(day, store)
+    if base is not None:
+        # 推移集計と同じく再掲・訂正は数えない
+        count = sum(1 for r in records if not is_duplicate(r))
+        if count < base * LOW_RATIO or count > base * HIGH_RATIO:
+            issues.append(Issue('baseline', f'件数 {count}件 が直近{BASELINE_DAYS}日の中央値 {base:g}件 から大きく外れています'))
+    return issues
+
+
+def alert_message(day: date, issues: Sequence[Issue], blocked: Optional[bool] = None) -> str:
+    if blocked is None:
+        blocked = get_settings().anomaly_block
+    lines = [f'【解析件数の異常 {day:%Y-%m-%d}】']
+    lines += [f'- {i.message}' for i in issues]
+    lines.append('公開を停止しました。raw_html と解析結果を確認してください。' if blocked
+                 else '公開は続行します（確認してください）。')
+    return '\n'.join(lines)
+
+
+def run_check(day: Any, records: Sequence[Dict[str, Any]], markers: int, *, unparsed: Sequence[str] = (),
+              send: bool = True, output_dir: Optional[str] = None, block: bool = False) -> bool:
+    """検査して異常があれば表示・通知。公開を止めるべきなら True（block 設定時、または block=True）"""
+    if isinstance(day, str):
+        try:
+            day = datetime.strptime(day, '%Y-%m-%d').date()
+        except ValueError:
+            return False
+    if not isinstance(day, date):
+        return False
+    try:
+        issues = check_counts(day, records, markers, unparsed=unparsed, store=TrendStore(output_dir=output_dir))
+    except Exception as e:
+        print(f'件数検査に失敗(無視): {e}')
+        return False
+    if not issues:
+        return False
+    blocked = block or get_settings().anomaly_block
+    msg = alert_message(day, issues, blocked)
+    print(msg)
+    if send:
+        try:
+            results = notify(msg, tag=f'anomaly-{day:%Y-%m-%d}')
+            if results:
+                print('異常通知: ' + ', '.join(f'{k}={"OK" if v else "NG"}' for k, v in results.items()))
+        except Exception as e:
+            print(f'異常通知に失敗: {e}')
+    return blocked
+
+
+if __name__ == '__main__':
+    import argparse
+    import re
+    ap = argparse.ArgumentParser(description='テキストを解析して件数の異常を確認（通知はしない）')
+    ap.add_argument('file', help='入力テキスト (okuyami_YYYYMMDD.txt)')
+    ap.add_argument('--date', help='掲載日 YYYY-MM-DD (既定: 本文の「日付:」)')
+    ap.add_argument('--notify', action='store_true', help='異常時に通知チャネルへ送信')
+    ap.add_argument('--output-dir', help='推移集計を探す解析の出力先 (既定: settings)')
+    cli = ap.parse_args()
+    from parse_and_format_obituary import OkuyamiParser
+    p = OkuyamiParser()
+    data = p.parse_file(cli.file)
+    day_s = cli.date
+    if not day_s:
+        with open(cli.file, 'r', encoding='utf-8') as rf:
+            m = re.search(r'日付:\s*(20\d{2}-\d{2}-\d{2})', rf.read())
+        day_s = m.group(1) if m else date.today().isoformat()
+    blocked = run_check(day_s, data, p.marker_count, unparsed=p.unparsed, send=cli.notify, output_dir=cli.output_dir)
+    print(f'解析 {len(data)}件 / 目印 {p.marker_count}件' + (' (公開停止)' if blocked else ''))
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""解析の行単位トレース（人物の取りこぼし・市町村の誤割り当ての原因調査用）
+OkuyamiParser.tracer に ParseTracer を設定した時だけ、本文の各行について
+行の種類・通った分岐・結果（レコード or 棄却理由）を1行1件の JSONL に書き出す。
+未設定 (None) の通常実行では分岐ごとの None 判定だけで、このモジュールも読み込まない。
+
+行の種類 (tok) と分岐 (branch):
+- region: region / region_merged（次行の単独『■』と結合）/ region_fallback（次行の人物の前の地域名）
+- city: city_known（既知市町村の最長一致＋人物）/ city_split（市町村末尾で分割＋人物）/ city（見出しのみ）
+- person: person（地域・市町村は直前の見出し）
+- other: ignored（目印『さん（』の無い行）/ blank
+- holiday / error: ファイル単位（休刊日検知・解析例外）
+
+各行: {"n": 行番号(前処理後), "tok", "branch", "region", "city", "text", "record" | "reason"}
+
+使い方:
+  python parse_and_format_obituary.py --file okuyami_20250808.txt --trace trace.jsonl
+  python parse_trace.py trace.jsonl [--rejected]
+"""
+from __future__ import annotations
+import json
+import traceback
+from collections import Counter
+from typing import Any, Dict, Optional
+
+__all__ = ['ParseTracer', 'summarize']
+
+# 行の抜粋の長さ（JSONL を小さく保つ）
+_TEXT_LIMIT = 80
+
+
+class ParseTracer:
+    def __init__(self, path: str):
+        self.path = path
+        self._fh = open(path, 'w', encoding='utf-8')
+        self.counts: Counter = Counter()
+
+    def __enter__(self) -> 'ParseTracer':
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def _write(self, entry: Dict[str, Any]) -> None:
+        self._fh.write(json.dumps(entry, ensure_ascii=False, separators=(',', ':'), default=str))
+        self._fh.write('\n')
+
+    def line(self, n: int, tok: str, branch: str, text: str, *, region: str = '', city: str = '',
+             record: Optional[Dict[str, Any]] = None, reason: str = '') -> None:
+        self.counts[f'{branch}:rejected' if reason else branch] += 1
+        entry: Dict[str, Any] = {'n': n, 'tok': tok, 'branch': branch, 'region': region, 'city': city,
+                                 'text': text[:_TEXT_LIMIT]}
+        if record is not None:
+            entry['record'] = record
+        if reason:
+            entry['reason'] = reason
+        self._write(entry)
+
+    def event(self, tok: str, **fields: Any) -> None:
+        self.counts[tok] += 1
+        self._write({'tok': tok, **fields})
+
+    def error(self, exc: BaseException) -> None:
+        self.event('error', error=repr(exc), traceback=traceback.format_exc(limit=5))
+
+    def close(self) -> None:
+        if not self._fh.closed:
+            self._fh.close()
+
+
+def summarize(path: str, rejected_only: bool = False) -> Counter:
+    """トレースを読み、分岐ごとの件数を返す（rejected_only なら棄却行を表示）"""
+    counts: Counter = Counter()
+    with open(path, 'r', encoding='utf-8') as rf:
+        for raw in rf:
+            entry = json.loads(raw)
+            branch = entry.get('branch') or entry.get('tok')
+            if entry.get('reason'):
+                counts[f'{branch}:rejected'] += 1
+                if rejected_only:
+                    print(f"{entry.get('n')}\t{branch}\t{entry['reason']}\t{entry.get('city') or entry.get('region')}\t"
+                          f"{entry.get('text')}")
+            else:
+                counts[branch] += 1
+            if entry.get('tok') == 'error':
+                print(entry.get('traceback') or entry.get('error'))
+    return counts
+
+
+if __name__ == '__main__':
+    import argparse
+    ap = argparse.ArgumentParser(description='解析トレース (JSONL) の集計')
+    ap.add_argument('trace', help='--trace で書き出した JSONL')
+    ap.add_argument('--rejected', action='store_true', help='棄却された行を表示')
+    cli = ap.parse_args()
+    for name, cnt in sorted(summarize(cli.trace, cli.rejected).items()):
+        print(f'{name}: {cnt}')
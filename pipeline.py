@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""取得→解析→公開→通知の非同期パイプライン（auto_upload.bat の asyncio 版）
+依存関係の無い処理を1つのイベントループ上で重ねて実行し、全体の所要時間を最長の経路に近づける。
+
+  取得 (selenium, 別プロセス) ─→ 解析 (別プロセス) ─┬→ 公開 (git commit/push) ─→ 公開確認 ─→ 通知・ウォッチリスト
+  送信箱の再送 ────────────────────────────────────┤
+                                                    ├→ 履歴アーカイブ再作成 (record_archive, 検索用)
+                                                    ├→ Excel 出力 (--excel)
+                                                    └→ 統計メッセージ作成 (trend_stats)
+
+- 取得・解析は従来どおりスクリプトを子プロセスで実行し、ログを logs/ に保存（終了コードの意味も同じ。
+  解析の 2 は掲載なし通知、3 は件数異常 (parse_check) による公開停止）
+- git push・アーカイブ作成・Excel 出力・統計作成はスレッドで並行に実行
+- 公開確認は wait_for_publication_async（待機は asyncio.sleep）、LINE/Discord/Webhook 送信もスレッドで行い
+  ループを止めない
+- 終了コード: 0 成功 / 1 取得・解析・公開の失敗、または通知が全チャネルで失敗 / 2 公開未確認のため通知せず
+  （send_line_stats と同じ。通知は他の段階と並行でも結果を待って返す）
+- --at HH:MM で常駐し毎日実行。設定は実行ごとに get_settings(watch=True) で読み直す
+- 対象日（投稿日付・通知タグ・統計・公開確認）は --file 指定時はその本文の「日付:」、
+  無ければファイル名 okuyami_YYYYMMDD から決める（過去分の再処理で当日扱いにしない）。取得時は実行日
+
+単体実行:
+  python pipeline.py                                   # 取得から通知まで
+  python pipeline.py --file okuyami_data/okuyami_20250808.txt --no-notify
+  python pipeline.py --at 07:10                        # 常駐
+"""
+from __future__ import annotations
+import asyncio
+import glob
+import os
+import re
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Dict, List, Optional, Tuple
+from settings import get_settings
+
+__all__ = ['Pipeline', 'input_date', 'run_daily']
+
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+_SAVED = re.compile(r'(CSV|Markdown)ファイルを保存しました: (.+)$', re.M)
+_ENTRY_COUNT = re.compile(r'^ENTRY_COUNT=(\d+)', re.M)
+_HEADER_DATE = re.compile(r'日付:\s*(20\d{2}-\d{2}-\d{2})')
+_NAME_DATE = re.compile(r'okuyami_(20\d{6})')
+# 「日付:」を探す先頭行数（ヘッダは区切り線 ==== までの数行）
+_HEADER_LINES = 20
+# 解析スクリプトの終了コード
+PARSE_NO_DATA = 2
+PARSE_BLOCKED = 3
+
+
+def input_date(path: str) -> Optional[datetime]:
+    """入力テキストの掲載日。本文ヘッダの「日付: YYYY-MM-DD」、無ければファイル名の okuyami_YYYYMMDD"""
+    try:
+        with open(path, 'r', encoding='utf-8') as rf:
+            for _, line in zip(range(_HEADER_LINES), rf):
+                m = _HEADER_DATE.search(line)
+                if m:
+                    return datetime.strptime(m.group(1), '%Y-%m-%d')
+    except (OSError, UnicodeDecodeError, ValueError):
+        pass
+    m = _NAME_DATE.search(os.path.basename(path))
+    if m:
+        try:
+            return datetime.strptime(m.group(1), '%Y%m%d')
+        except ValueError:
+            pass
+    return None
+
+
+class Pipeline:
+    def __init__(self, *, input_file: Optional[str] = None, output_dir: str = './okuyami_output',
+                 notify: bool = True, force_notify: bool = False, archive: bool = True, excel: bool = False,
+                 log_dir: str = 'logs'):
+        self.input_file = input_file
+        self.output_dir = output_dir
+        self.notify = notify
+        self.force_notify = force_notify
+        self.archive = archive
+        self.excel = excel
+        self.log_dir = log_dir
+        self.started = datetime.now()
+        self.target_dt = self.started
+        if input_file:
+            self.target_dt = input_date(input_file) or self.started
+            if self.target_dt is self.started:
+                print(f'警告: {input_file} から掲載日を判定できないため実行日を使います')
+        self.tag = self.target_dt.strftime('%Y-%m-%d')
+        self.run_ts = self.started.strftime('%Y%m%d_%H%M%S')
+        # 段階名 → (開始, 終了) 秒（パイプライン開始からの経過）
+        self.timings: Dict[str, Tuple[float, float]] = {}
+        self.outputs: Dict[str, str] = {}
+        self.entry_count: Optional[int] = None
+        self._t0 = 0.0
+
+    # --- 共通 ---
+
+    async def _stage(self, name: str, aw: Awaitable[Any]) -> Any:
+        start = time.monotonic() - self._t0
+        print(f'[{name}] 開始 (+{start:.1f}s)')
+        try:
+            return await aw
+        finally:
+            end = time.monotonic() - self._t0
+            self.timings[name] = (start, end)
+            print(f'[{name}] 終了 ({end - start:.1f}s)')
+
+    async def _run_script(self, name: str, args: List[str]) -> Tuple[int, str]:
+        """スクリプトを子プロセスで実行し (終了コード, 出力) を返す。出力は logs/<name>_<時刻>.log にも保存"""
+        env = dict(os.environ, PYTHONIOENCODING='utf-8', PYTHONUTF8='1')
+        proc = await asyncio.create_subprocess_exec(
+            sys.executable, os.path.join(_BASE_DIR, args[0]), *args[1:],
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT, env=env,
+        )
+        out_b, _ = await proc.communicate()
+        out = out_b.decode('utf-8', errors='replace')
+        os.makedirs(self.log_dir, exist_ok=True)
+        with open(os.path.join(self.log_dir, f'{name}_{self.run_ts}.log'), 'w', encoding='utf-8') as wf:
+            wf.write(out)
+        for line in out.splitlines():
+            print(f'  {name}| {line}')
+        return proc.returncode, out
+
+    # --- 段階 ---
+
+    async def scrape(self) -> Optional[str]:
+        rc, _ = await self._run_script('scrape', ['selenium_okuyami_scraper.py', '--auto', '--prefer-today',
+                                                  '--venues-dir', self.output_dir])
+        path = os.path.join('okuyami_data', f'okuyami_{self.target_dt:%Y%m%d}.txt')
+        if rc != 0:
+            if not os.path.exists(path):
+                print(f'取得失敗 (rc={rc})、当日ファイルもありません')
+                return None
+            print(f'取得失敗 (rc={rc}) ですが既存の {path} を使います')
+        return path if os.path.exists(path) else None
+
+    async def parse(self, input_file: str) -> int:
+        rc, out = await self._run_script('parse', ['parse_and_format_obituary.py', '--file', input_file,
+                                                   '--output-dir', self.output_dir])
+        for kind, path in _SAVED.findall(out):
+            self.outputs[kind] = path.strip()
+        m = _ENTRY_COUNT.search(out)
+        self.entry_count = int(m.group(1)) if m else None
+        return rc
+
+    def _upload(self) -> bool:
+        from upload_to_github_pages import GitHubPagesUploader
+        settings = get_settings()
+        os.environ.setdefault('LANG', 'ja_JP.UTF-8')
+        os.environ.setdefault('LC_ALL', 'ja_JP.UTF-8')
+        uploader = GitHubPagesUploader(settings.pages_repo, settings.branch)
+        return uploader.upload_markdown_file(
+            source_file=self.outputs.get('Markdown'),
+            commit_message=f'Auto-update {self.tag} ({self.started:%Y-%m-%d %H:%M:%S})',
+            dt=self.target_dt,
+        )
+
+    def _build_archive(self) -> int:
+        from history_store import HistoryStore
+        from record_archive import build_from_csv, build_from_history, default_path
+        settings = get_settings()
+        path = default_path(self.output_dir)
+        if HistoryStore.available() and settings.history_enabled:
+            n = build_from_history(path, HistoryStore(settings.history_path(self.output_dir)))
+        else:
+            n = build_from_csv(path, sorted(glob.glob(os.path.join(self.output_dir, 'okuyami_*_parsed_*.csv'))))
+        print(f'履歴アーカイブ: {path} ({n}件)')
+        return n
+
+    def _write_excel(self) -> Optional[str]:
+        csv_path = self.outputs.get('CSV')
+        if not csv_path:
+            return None
+        import pandas as pd
+        from parse_and_format_obituary import OkuyamiParser
+        out = os.path.splitext(csv_path)[0] + '.xlsx'
+        OkuyamiParser().save_to_excel(pd.read_csv(csv_path, encoding='utf-8-sig').to_dict(orient='records'), out)
+        return out
+
+    async def _notify_after_publication(self, prepared: 'asyncio.Task', flushed: 'asyncio.Task') -> int:
+        """公開確認を待ってから通知。待機中もループ上の他の段階は進む"""
+        from notifications import load_channels
+        from notify_ledger import NotifyLedger, content_hash
+        from publish_check import wait_for_publication_async
+        from send_line_stats import notify_stats, notify_watchlist
+        flushed_rc = await flushed
+        if flushed_rc is not None and not self.force_notify:
+            print('当日分は送信箱から再送済みのため統計通知を省略します')
+            return flushed_rc
+        msg, records, markers = await prepared
+        if not msg:
+            print('送信するメッセージが空のため中止')
+            return 0
+        ledger = NotifyLedger()
+        digest = content_hash(msg)
+        # 送信済み・公開確認済み (台帳) なら待たない（判定は notify_stats に任せる）
+        pending = [ch for ch in load_channels() if self.force_notify or not ledger.is_sent(self.tag, digest, ch.name)]
+        wait = bool(pending) and (self.force_notify or not ledger.is_published(self.tag, digest))
+        if wait and not await wait_for_publication_async(self.target_dt, extra_markers=markers):
+            print('GitHub Pagesの公開が未確認のため通知をスキップします')
+            return 2
+        rc = await asyncio.to_thread(notify_stats, msg, self.tag, ledger=ledger, force=self.force_notify,
+                                     published=wait)
+        if rc == 0 and records:
+            await asyncio.to_thread(notify_watchlist, records, self.tag, ledger=ledger, force=self.force_notify)
+        return rc
+
+    async def _notify_no_data(self) -> int:
+        from send_line_stats import no_data_message, notify_stats
+        return await asyncio.to_thread(notify_stats, no_data_message(self.target_dt), self.tag,
+                                       force=self.force_notify)
+
+    # --- 全体 ---
+
+    async def run(self) -> int:
+        self._t0 = time.monotonic()
+        rc = await self._run()
+        self.report()
+        return rc
+
+    async def _run(self) -> int:
+        flushed: Optional[asyncio.Task] = None
+        if self.notify:
+            from notify_ledger import NotifyLedger
+            from send_line_stats import flush_pending
+            # 前回の送信失敗分の再送は取得・解析と並行
+            flushed = asyncio.create_task(self._stage('outbox', asyncio.to_thread(flush_pending, self.tag,
+                                                                                  NotifyLedger())))
+        input_file = self.input_file or await self._stage('scrape', self.scrape())
+        if not input_file:
+            return await self._finish(1, flushed)
+        rc = await self._stage('parse', self.parse(input_file))
+        if rc == PARSE_NO_DATA:
+            print('掲載なし (解析結果が空)')
+            rc = await self._stage('notify', self._notify_no_data()) if self.notify else 0
+            return await self._finish(rc, flushed)
+        if rc != 0:
+            print(f'解析失敗 rc={rc}' + (' (件数異常のため公開を停止)' if rc == PARSE_BLOCKED else ''))
+            return await self._finish(1, flushed)
+
+        # 公開と、公開に必要ない書き出し・統計作成を並行
+        side: List[asyncio.Task] = []
+        if self.archive:
+            side.append(asyncio.create_task(self._stage('archive', asyncio.to_thread(self._build_archive))))
+        if self.excel:
+            side.append(asyncio.create_task(self._stage('excel', asyncio.to_thread(self._write_excel))))
+        prepared: Optional[asyncio.Task] = None
+        if self.notify:
+            from send_line_stats import todays_message
+            prepared = asyncio.create_task(self._stage('stats', asyncio.to_thread(
+                todays_message, self.target_dt, self.outputs.get('CSV'))))
+        published = await self._stage('upload', asyncio.to_thread(self._upload))
+        if not published:
+            print('アップロード失敗')
+            if prepared is not None:
+                prepared.cancel()
+            return await self._finish(1, flushed, side)
+        notified: Optional[asyncio.Task] = None
+        if prepared is not None and flushed is not None:
+            notified = asyncio.create_task(self._stage('notify', self._notify_after_publication(prepared, flushed)))
+            side.append(notified)
+        await self._finish(0, flushed, side)
+        return self._notify_rc(notified)
+
+    @staticmethod
+    def _notify_rc(task: Optional[asyncio.Task]) -> int:
+        """通知段階の終了コード（例外・取り消しは失敗の 1）"""
+        if task is None:
+            return 0
+        if task.cancelled() or task.exception() is not None:
+            return 1
+        return task.result() or 0
+
+    async def _finish(self, rc: int, flushed: Optional[asyncio.Task], side: Optional[List[asyncio.Task]] = None) -> int:
+        tasks = [t for t in [flushed, *(side or [])] if t is not None]
+        for res in await asyncio.gather(*tasks, return_exceptions=True):
+            if isinstance(res, BaseException) and not isinstance(res, asyncio.CancelledError):
+                print(f'並行処理の例外 (継続): {type(res).__name__}: {res}')
+        return rc
+
+    def report(self) -> None:
+        if not self.timings:
+            return
+        wall = time.monotonic() - self._t0
+        serial = sum(end - start for start, end in self.timings.values())
+        print('=== 所要時間 ===')
+        for name, (start, end) in sorted(self.timings.items(), key=lambda kv: kv[1][0]):
+            print(f'{name:8s} +{start:7.1f}s → +{end:7.1f}s ({end - start:.1f}s)')
+        print(f'全体 {wall:.1f}s（各段階の合計 {serial:.1f}s）' +
+              (f' 件数 {self.entry_count}' if self.entry_count is not None else ''))
+
+
+def _next_run(at: str, now: datetime) -> datetime:
+    hour, minute = (int(x) for x in at.split(':', 1))
+    run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    return run if run > now else run + timedelta(days=1)
+
+
+async def run_daily(at: str, **options: Any) -> None:
+    """毎日 at (HH:MM) に実行する常駐ループ。設定ファイルの変更は次回の実行から反映"""
+    while True:
+        wake = _next_run(at, datetime.now())
+        print(f'次回実行: {wake:%Y-%m-%d %H:%M}')
+        await asyncio.sleep(max(0.0, (wake - datetime.now()).total_seconds()))
+        get_settings(watch=True)
+        try:
+            rc = await Pipeline(**options).run()
+            print(f'=== PIPELINE {"SUCCESS" if rc == 0 else "FAILED"} (rc={rc}) ===')
+        except Exception as e:
+            print(f'パイプライン例外: {e}')
+
+
+if __name__ == '__main__':
+    import argparse
+    ap = argparse.ArgumentParser(description='取得→解析→公開→通知を非同期で一括実行')
+    ap.add_argument('--file', help='取得を省略して解析するテキスト (okuyami_YYYYMMDD.txt)')
+    ap.add_argument('--output-dir', default='./okuyami_output', help='解析結果の出力先')
+    ap.add_argument('--no-notify', action='store_true', help='公開確認・通知をしない')
+    ap.add_argument('--force-notify', action='store_true', help='通知台帳を無視して再通知')
+    ap.add_argument('--no-archive', action='store_true', help='履歴アーカイブ (record_archive) を作り直さない')
+    ap.add_argument('--excel', action='store_true', help='解析結果の Excel (.xlsx) も出力')
+    ap.add_argument('--at', metavar='HH:MM', help='常駐して毎日この時刻に実行')
+    cli = ap.parse_args()
+    opts = dict(input_file=cli.file, output_dir=cli.output_dir, notify=not cli.no_notify,
+                force_notify=cli.force_notify, archive=not cli.no_archive, excel=cli.excel)
+    get_settings(watch=True)
+    if cli.at:
+        try:
+            asyncio.run(run_daily(cli.at, **opts))
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+    rc = asyncio.run(Pipeline(**opts).run())
+    print(f'=== PIPELINE {"SUCCESS" if rc == 0 else "FAILED"} (rc={rc}) ===')
+    sys.exit(rc)
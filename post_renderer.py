@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""投稿Markdownのテンプレート描画
+- レイアウトは templates/ 配下のテンプレートで定義（変更はテンプレート編集のみ）
+  post_<layout>.md.tmpl : ページ全体。${rows} の位置に行を流し込む (string.Template)
+  row_<layout>.html.tmpl: 1行分
+  post_<layout>.md.j2   : Jinja2 版（OKUYAMI_TEMPLATE_ENGINE=jinja2 かつ jinja2 導入時）
+- 行データは dict のイテレータから1行ずつ生成し、チャンク単位で書き出す（全体を連結しない）
+- 住所リンク・斎場リンク (venue_gazetteer の座標)・関係者分割・強調表示判定 (priority_rules の highlight ルール) は
+  prepare_row に集約（I/O と分離）
+- コンパイル済みテンプレートはファイル更新時刻つきでキャッシュ
+layout: inline (従来のインラインstyle) / compact (共通CSS + class属性)
+"""
+from __future__ import annotations
+import os
+from string import Template
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+from urllib.parse import quote_plus
+from common_utils import lazy_module
+from priority_rules import PriorityEngine, get_priority_engine
+from venue_gazetteer import VenueGazetteer, get_gazetteer
+jinja2 = lazy_module('jinja2', optional=True)  # optional。jinja2 エンジン選択時のみ読み込む
+
+__all__ = ['prepare_row', 'iter_rows', 'render_post', 'write_post', 'get_engine']
+
+_TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+_ROWS_MARK = '${rows}'
+_CACHE: Dict[Tuple[str, str, float], Any] = {}
+
+
+def _template_dir() -> str:
+    return os.getenv('OKUYAMI_TEMPLATE_DIR') or _TEMPLATE_DIR
+
+
+def get_engine() -> str:
+    """string (既定) / jinja2。jinja2 未導入時は string にフォールバック"""
+    engine = os.getenv('OKUYAMI_TEMPLATE_ENGINE', 'string').strip().lower()
+    if engine == 'jinja2' and not jinja2:
+        print('警告: jinja2 が見つからないため string.Template で描画します')
+        return 'string'
+    return 'jinja2' if engine == 'jinja2' else 'string'
+
+
+def _blank(v: Any) -> bool:
+    # None / 空文字 / NaN (float の自己不一致)
+    return v is None or v == '' or (isinstance(v, float) and v != v)
+
+
+def prepare_row(rec: Dict[str, Any], engine: Optional[PriorityEngine] = None,
+                gazetteer: Optional[VenueGazetteer] = None) -> Dict[str, Any]:
+    """CSV/DataFrame 1行 (dict) から表示用の値を組み立てる"""
+    name = '' if _blank(rec.get('氏名')) else rec['氏名']
+    # 過去に掲載済み (dedup の再掲/訂正) は初出日を添える
+    dup = '' if _blank(rec.get('重複')) else str(rec['重複'])
+    if dup and name:
+        since = '' if _blank(rec.get('重複元')) else str(rec['重複元'])
+        name = f'{name}<br><small>{dup}' + (f' ({since[5:].replace("-", "/")}掲載)' if since else '') + '</small>'
+    age = '' if _blank(rec.get('年齢')) else rec['年齢']
+    # 住所（= 市町村 + 住所 を連結、重複回避し簡略表示）
+    city = '' if _blank(rec.get('市町村')) else str(rec['市町村'])
+    address_raw = '' if _blank(rec.get('住所')) else str(rec['住所'])
+    if city and address_raw:
+        merged_addr = address_raw if address_raw.startswith(city) else f'{city}{address_raw}'
+    else:
+        merged_addr = city or address_raw
+    # 簡略表示（モバイル最適化のため）。検索クエリは省略前の住所で
+    short_addr = merged_addr[:15] + '...' if len(merged_addr) > 15 else merged_addr
+    # Google Maps へリンク
+    addr_html = short_addr
+    if merged_addr:
+        map_url = f'https://www.google.com/maps/search/?api=1&query={quote_plus(merged_addr)}'
+        addr_html = f'<a href="{map_url}" target="_blank" rel="noopener">{short_addr}</a>'
+    # 斎場（座標辞書にあるものだけ、紙面の座標へ直接リンク）
+    venue_html = ''
+    venue = None if _blank(rec.get('会場')) else (gazetteer or get_gazetteer()).lookup(str(rec['会場']))
+    if venue:
+        venue_html = f'<br><a href="{venue.map_url}" target="_blank" rel="noopener">斎場: {venue.name}</a>'
+    # 関係者（読点/カンマで改行表示）
+    relatives = rec.get('関係者')
+    raw_rel = relatives if isinstance(relatives, str) else ''
+    rel_html = ''
+    if raw_rel:
+        parts = [p.strip() for p in raw_rel.replace('，', '、').split('、') if p.strip()]
+        rel_html = '<br>'.join(parts) if parts else raw_rel
+    highlight = (engine or get_priority_engine()).highlight(raw_rel)
+    return {
+        'name': name,
+        'age': age,
+        'addr_html': addr_html,
+        'venue_html': venue_html,
+        'rel_html': rel_html,
+        'highlight': highlight,
+        # テンプレート用の派生値
+        'highlight_style': 'color: red; ' if highlight else '',
+        'rel_class': 'rel highlight' if highlight else 'rel',
+    }
+
+
+def iter_rows(records: Iterable[Dict[str, Any]], output_dir: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    engine = get_priority_engine()
+    gazetteer = get_gazetteer(output_dir)
+    for rec in records:
+        yield prepare_row(rec, engine, gazetteer)
+
+
+def _load_string_template(layout: str) -> Tuple[Template, Template, Template]:
+    """(ページ前半, 行, ページ後半) のコンパイル済みテンプレート"""
+    base = _template_dir()
+    page_path = os.path.join(base, f'post_{layout}.md.tmpl')
+    row_path = os.path.join(base, f'row_{layout}.html.tmpl')
+    key = ('string', page_path, max(os.path.getmtime(page_path), os.path.getmtime(row_path)))
+    cached = _CACHE.get(key)
+    if cached is None:
+        with open(page_path, 'r', encoding='utf-8') as rf:
+            page = rf.read()
+        with open(row_path, 'r', encoding='utf-8') as rf:
+            row = rf.read()
+        head, sep, tail = page.partition(_ROWS_MARK)
+        if not sep:
+            raise ValueError(f'{page_path} に {_ROWS_MARK} がありません')
+        cached = (Template(head), Template(row), Template(tail))
+        _CACHE[key] = cached
+    return cached
+
+
+def _load_jinja_template(layout: str) -> Any:
+    base = _template_dir()
+    path = os.path.join(base, f'post_{layout}.md.j2')
+    key = ('jinja2', path, os.path.getmtime(path))
+    cached = _CACHE.get(key)
+    if cached is None:
+        env = jinja2.Environment(
+            loader=jinja2.FileSystemLoader(base),
+            autoescape=False,
+            keep_trailing_newline=True,
+            trim_blocks=True,
+        )
+        cached = env.get_template(os.path.basename(path))
+        _CACHE[key] = cached
+    return cached
+
+
+def render_post(records: Iterable[Dict[str, Any]], *, layout: str, front_matter: str, jp_date: str,
+                updated: str, minify: bool = False, engine: Optional[str] = None,
+                prepared: bool = False) -> Iterator[str]:
+    """投稿Markdownをチャンク単位で生成する（prepared=True なら records は prepare_row 済みの行）"""
+    context = {
+        'front_matter': front_matter,
+        'jp_date': jp_date,
+        'updated': updated,
+        # compact レイアウトの行区切り（minify で除去）
+        'nl': '' if minify else '\n',
+    }
+    rows = iter(records) if prepared else iter_rows(records)
+    if (engine or get_engine()) == 'jinja2':
+        yield from _load_jinja_template(layout).generate(rows=rows, **context)
+        return
+    head, row_tmpl, tail = _load_string_template(layout)
+    yield head.substitute(context)
+    row_sub = row_tmpl.substitute
+    for row in rows:
+        yield row_sub(row, nl=context['nl'])
+    yield tail.substitute(context)
+
+
+def write_post(fp, chunks: Iterable[str]) -> int:
+    """チャンクを書き出し、UTF-8 のバイト数を返す"""
+    size = 0
+    for chunk in chunks:
+        fp.write(chunk)
+        size += len(chunk.encode('utf-8'))
+    return size
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""優先度ルールエンジン
+config.ini の [priority] からルール（キーワード・市町村・正規表現・優先度）を読み込み、
+対象列ごとに1本の結合正規表現（名前付きグループ）へコンパイルして一括判定する。
+各グループは先読み (?=...) で包み優先度の高い順に並べるため、一致は重ならず消費されず、
+各位置で最上位のルールが報告される（『元NEC』=3 と『NEC』=1 が重なっても 1 になる）。
+- score_frame(df): 列を一度だけ連結し、行ごとに結合正規表現を1回走査（df.apply(axis=1) を使わない）
+- score_records(records): dict のリストを1パスで判定
+- highlight(text): highlight 指定ルールに一致するか（投稿の関係者セル赤字表示）
+優先度は数値が小さいほど上位。一致したルールの最小値、どれにも一致しなければ default。
+
+設定例 (未設定時は従来規則 NEC/ＮＥＣ=1, 中央市=2, その他=3 と同等):
+  [priority]
+  default = 3
+  rules = nec, chuo
+  nec.level = 1
+  nec.keywords = NEC, ＮＥＣ
+  nec.fields = 氏名, 職歴・属性, 関係者, 喪主
+  nec.highlight = true
+  chuo.level = 2
+  chuo.cities = 中央市
+  # 正規表現: <name>.regex = ..., 大文字小文字無視: <name>.ignorecase = true
+
+確認: python priority_rules.py --check
+"""
+from __future__ import annotations
+import re
+from typing import Any, Dict, Iterable, List, Optional, Pattern, Tuple
+from settings import get_settings, load_settings
+
+__all__ = ['PriorityRule', 'PriorityEngine', 'load_priority_engine', 'get_priority_engine']
+
+DEFAULT_FIELDS: Tuple[str, ...] = ('氏名', '職歴・属性', '関係者', '喪主')
+FALLBACK_PRIORITY = 99
+
+
+class PriorityRule:
+    def __init__(self, name: str, level: int, *, keywords: Iterable[str] = (), cities: Iterable[str] = (),
+                 regex: str = '', fields: Iterable[str] = DEFAULT_FIELDS, ignorecase: bool = False,
+                 highlight: bool = False):
+        self.name = name
+        self.level = level
+        self.keywords = [k for k in keywords if k]
+        self.cities = {c for c in cities if c}
+        self.regex = regex
+        self.fields = tuple(fields) or DEFAULT_FIELDS
+        self.ignorecase = ignorecase
+        self.highlight = highlight
+
+    def pattern(self) -> Optional[str]:
+        """テキスト判定用の正規表現（キーワード/正規表現が無ければ None）"""
+        alts = [re.escape(k) for k in self.keywords]
+        if self.regex:
+            alts.append(f'(?:{self.regex})')
+        if not alts:
+            return None
+        body = '|'.join(alts)
+        return f'(?i:{body})' if self.ignorecase else f'(?:{body})'
+
+
+def _group(i: int) -> str:
+    return f'r{i}'
+
+
+class PriorityEngine:
+    def __init__(self, rules: List[PriorityRule], default: int = 3):
+        self.rules = rules
+        self.default = default
+        # 対象列の組ごとに結合正規表現を1本作る
+        self._matchers: List[Tuple[Tuple[str, ...], Pattern[str], Dict[str, int]]] = []
+        by_fields: Dict[Tuple[str, ...], List[Tuple[int, str]]] = {}
+        levels: Dict[str, int] = {}
+        for i, rule in enumerate(rules):
+            pat = rule.pattern()
+            if pat:
+                # 幅0の先読み: 一致が文字を消費しないので、重なる下位ルールに上位ルールが隠されない
+                by_fields.setdefault(rule.fields, []).append((rule.level, f'(?=(?P<{_group(i)}>{pat}))'))
+                levels[_group(i)] = rule.level
+        for fields, parts in by_fields.items():
+            # 同じ位置では先に並んだ選択肢が採られるため、優先度の高い（小さい）順に並べる
+            parts.sort(key=lambda p: p[0])
+            self._matchers.append((fields, re.compile('|'.join(p for _, p in parts)), levels))
+        # 市町村は完全一致の辞書引き
+        self._city_level: Dict[str, int] = {}
+        for rule in rules:
+            for city in rule.cities:
+                self._city_level[city] = min(rule.level, self._city_level.get(city, rule.level))
+        hl = [r.pattern() for r in rules if r.highlight and r.pattern()]
+        self._highlight: Optional[Pattern[str]] = re.compile('|'.join(hl)) if hl else None
+
+    def _text_level(self, combined: Pattern[str], levels: Dict[str, int], text: str) -> Optional[int]:
+        best: Optional[int] = None
+        for m in combined.finditer(text):
+            lv = levels[m.lastgroup]  # type: ignore[index]
+            if best is None or lv < best:
+                best = lv
+        return best
+
+    def score_record(self, rec: Any) -> int:
+        try:
+            get = rec.get if hasattr(rec, 'get') else (lambda k, d=None: rec[k] if k in rec else d)
+            best = self._city_level.get(str(get('市町村', '')), self.default)
+            for fields, combined, levels in self._matchers:
+                text = ' '.join(str(get(f, '')) for f in fields)
+                lv = self._text_level(combined, levels, text)
+                if lv is not None and lv < best:
+                    best = lv
+            return best
+        except Exception:
+            return FALLBACK_PRIORITY
+
+    def score_records(self, records: Iterable[Any]) -> List[int]:
+        return [self.score_record(r) for r in records]
+
+    def score_frame(self, df: Any) -> Any:
+        """DataFrame 全体の優先度 Series。列の連結は列単位で一度だけ行う"""
+        import pandas as pd
+        if df.empty:
+            return pd.Series([], index=df.index, dtype='int64')
+        if '市町村' in df.columns:
+            scores = df['市町村'].map(str).map(self._city_level).fillna(self.default).astype('int64')
+        else:
+            scores = pd.Series(self.default, index=df.index, dtype='int64')
+        for fields, combined, levels in self._matchers:
+            text = None
+            for f in fields:
+                # compute_priority と同じく str() 化（欠損列は空文字）
+                col = df[f].map(str) if f in df.columns else pd.Series('', index=df.index)
+                text = col if text is None else text + ' ' + col
+            matched = text.map(lambda t: self._text_level(combined, levels, t))
+            lv = pd.to_numeric(matched, errors='coerce').fillna(self.default).astype('int64')
+            scores = scores.where(scores <= lv, lv)
+        return scores
+
+    def highlight(self, text: Any) -> bool:
+        return bool(self._highlight and isinstance(text, str) and text and self._highlight.search(text))
+
+
+def _default_rules() -> List[PriorityRule]:
+    return [
+        PriorityRule('nec', 1, keywords=['NEC', 'ＮＥＣ'], highlight=True),
+        PriorityRule('chuo', 2, cities=['中央市']),
+    ]
+
+
+def _split(value: str) -> List[str]:
+    return [v.strip() for v in re.split(r'[,、]', value) if v.strip()]
+
+
+def load_priority_engine(path: Optional[str] = None) -> PriorityEngine:
+    """config.ini の [priority] からエンジンを構築。未設定・不正時は従来規則
+    path 省略時は settings が読み込んだ config.ini を使う"""
+    cfg = (load_settings(path) if path else get_settings()).config
+    if not cfg.has_section('priority'):
+        return PriorityEngine(_default_rules())
+    sec = cfg['priority']
+    default = sec.getint('default', fallback=3)
+    rules: List[PriorityRule] = []
+    for name in _split(sec.get('rules', '')):
+        try:
+            rules.append(PriorityRule(
+                name,
+                sec.getint(f'{name}.level', fallback=default),
+                keywords=_split(sec.get(f'{name}.keywords', '')),
+                cities=_split(sec.get(f'{name}.cities', '')),
+                regex=sec.get(f'{name}.regex', '').strip(),
+                fields=_split(sec.get(f'{name}.fields', '')) or DEFAULT_FIELDS,
+                ignorecase=sec.getboolean(f'{name}.ignorecase', fallback=False),
+                highlight=sec.getboolean(f'{name}.highlight', fallback=False),
+            ))
+            if rules[-1].regex:
+                re.compile(rules[-1].regex)
+        except (ValueError, re.error) as e:
+            print(f"優先度ルール {name} を無視します: {e}")
+            if rules and rules[-1].name == name:
+                rules.pop()
+    return PriorityEngine(rules or _default_rules(), default)
+
+
+_ENGINE_CACHE: Dict[int, PriorityEngine] = {}
+
+
+def get_priority_engine() -> PriorityEngine:
+    """コンパイル済みエンジンを返す（settings の再読込時のみ再構築）"""
+    settings = get_settings()
+    engine = _ENGINE_CACHE.get(settings.generation)
+    if engine is None:
+        _ENGINE_CACHE.clear()
+        engine = _ENGINE_CACHE[settings.generation] = load_priority_engine()
+    return engine
+
+
+def _check() -> int:
+    """重なり・包含するキーワードの判定確認（score_record と score_frame の一致も確認）"""
+    cases = [
+        # (ルール, レコード, 期待する優先度)
+        ([PriorityRule('a', 3, keywords=['NE']), PriorityRule('b', 1, keywords=['NEC'])],
+         {'職歴・属性': 'NEC社員'}, 1),
+        ([PriorityRule('a', 3, keywords=['元NEC']), PriorityRule('b', 1, keywords=['NEC'])],
+         {'職歴・属性': '元NEC社員'}, 1),
+        ([PriorityRule('a', 2, keywords=['NECソリ']), PriorityRule('b', 1, regex=r'ソリュー\w+')],
+         {'関係者': '長男 NECソリューション勤務'}, 1),
+        ([PriorityRule('a', 1, keywords=['NEC']), PriorityRule('b', 2, cities=['中央市'])],
+         {'市町村': '中央市', '氏名': '山田'}, 2),
+        (_default_rules(), {'市町村': '甲府市', '関係者': '妻 花子'}, 3),
+    ]
+    try:
+        import pandas as pd
+    except ImportError:
+        pd = None
+    failed = 0
+    for rules, rec, expected in cases:
+        engine = PriorityEngine(rules)
+        got = [engine.score_record(rec)]
+        if pd is not None:
+            got.append(int(engine.score_frame(pd.DataFrame([rec])).iloc[0]))
+        ok = all(g == expected for g in got)
+        failed += not ok
+        print(f"{'OK' if ok else 'NG'}  {rec} -> {got} (期待 {expected})")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    ap = argparse.ArgumentParser(description='優先度ルールの確認')
+    ap.add_argument('--check', action='store_true', help='重なるキーワード等の判定を確認（失敗で終了コード1）')
+    cli = ap.parse_args()
+    if cli.check:
+        sys.exit(_check())
+    engine = get_priority_engine()
+    for rule in engine.rules:
+        print(f'{rule.level}: {rule.name} keywords={rule.keywords} cities={sorted(rule.cities)} regex={rule.regex!r}')
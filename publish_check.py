@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""GitHub Pages 公開確認バックエンド
+- build : Pages builds API (/repos/{owner}/{repo}/pages/builds/latest) の status/commit をローカル HEAD と照合
+- marker: サイト上のマーカーファイル (publish-status.json, ビルド時の commit SHA を埋め込み) をローカル HEAD と照合
+- html  : 投稿ページ本文の『お悔やみ情報 (YYYY年MM月DD日)』検索（従来方式・フォールバック）
+
+順序は環境変数 OKUYAMI_PUBLISH_CHECK (例: "build,marker,html") で指定。既定 "auto" は
+build → marker → html の順に試す。未公開(False)・判定不能(None)でも次のバックエンドへ回し、
+どれかが公開済み(True)と判定した時点で確定（build が古いリビジョンのまま等でも html で確認できる）。
+API/サイトのURLは環境変数で差し替え可能なため、tools/stub_pages_server.py を使えばローカルで待ち時間を調整できる。
+"""
+from __future__ import annotations
+import json
+import os
+import re
+import subprocess
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from common_utils import get_today_post_url, get_site_url, get_jp_date, lazy_module
+from settings import get_settings
+requests = lazy_module('requests', optional=True)  # optional。初回の HTTP 送信時に読み込む
+
+__all__ = [
+    'PublicationCheck', 'PagesBuildCheck', 'MarkerFileCheck', 'HtmlMarkerCheck',
+    'build_checks', 'wait_for_publication', 'wait_for_publication_async', 'get_pages_repo_path', 'MARKER_FILE_NAME', 'MARKER_FILE_CONTENT'
+]
+
+_DEF_API = 'https://api.github.com'
+_USER_AGENT = 'okuyami-bot/1.0 (+https://github.com/MiMicroAG/okuyami)'
+
+# Pages リポジトリに配置するマーカーファイル。Jekyll(GitHub Pages)がビルド時に commit SHA を埋め込む。
+MARKER_FILE_NAME = 'publish-status.json'
+MARKER_FILE_CONTENT = (
+    '---\n'
+    'layout: null\n'
+    'sitemap: false\n'
+    '---\n'
+    '{"revision": "{{ site.github.build_revision }}", "built_at": "{{ site.time | date_to_xmlschema }}"}\n'
+)
+
+
+def add_cache_buster(url: str, attempt: int) -> str:
+    sep = '&' if '?' in url else '?'
+    return f"{url}{sep}_ts={int(time.time())}_{attempt}"
+
+
+def http_get(url: str, headers: Optional[Dict[str, str]] = None, timeout: int = 10) -> Tuple[int, str]:
+    """GET して (status, text) を返す。requests が無ければ urllib にフォールバック。"""
+    hdrs = {
+        'User-Agent': _USER_AGENT,
+        'Cache-Control': 'no-cache',
+        'Pragma': 'no-cache'
+    }
+    if headers:
+        hdrs.update(headers)
+    if requests:
+        response = requests.get(url, headers=hdrs, timeout=timeout)
+        return response.status_code, response.text or ''
+    import urllib.request
+    import urllib.error
+    req = urllib.request.Request(url, headers=hdrs)
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:  # type: ignore[arg-type]
+            charset = resp.headers.get_content_charset() or 'utf-8'
+            data = resp.read()
+            try:
+                text = data.decode(charset, errors='replace')
+            except LookupError:
+                text = data.decode('utf-8', errors='replace')
+            status = getattr(resp, 'status', resp.getcode())
+            return status, text
+    except urllib.error.HTTPError as he:  # type: ignore[attr-defined]
+        data = he.read() if hasattr(he, 'read') else b''
+        charset = he.headers.get_content_charset() if getattr(he, 'headers', None) else 'utf-8'
+        try:
+            text = data.decode(charset or 'utf-8', errors='replace')
+        except LookupError:
+            text = data.decode('utf-8', errors='replace')
+        return he.code, text
+
+
+def get_pages_repo_path() -> str:
+    """Pages リポジトリのローカルパス
+    優先: OKUYAMI_PAGES_REPO / GITHUB_PAGES_REPO (auto_upload.bat が設定)
+    次点: config.ini [github] repo_path (%OneDrive% 等の環境変数を展開)
+    既定: スクリプトと同じ階層の okuyami-info
+    """
+    return get_settings().pages_repo
+
+
+def _git_output(repo_path: str, args: List[str]) -> str:
+    try:
+        result = subprocess.run(['git', *args], cwd=repo_path, capture_output=True, text=True, encoding='utf-8')
+        if result.returncode == 0:
+            return result.stdout.strip()
+    except Exception:
+        pass
+    return ''
+
+
+class PublicationCheck:
+    """公開確認バックエンドの基底クラス
+    check() は True=公開済み / False=未反映 / None=判定不能（True 以外は次のバックエンドへ）
+    """
+    name = 'base'
+
+    def available(self) -> bool:
+        return True
+
+    def check(self, target_dt: datetime, attempt: int) -> Optional[bool]:
+        raise NotImplementedError
+
+    def describe_last(self) -> str:
+        return ''
+
+
+class _HeadShaMixin:
+    """ローカル Pages リポジトリの HEAD SHA を1回だけ取得して保持"""
+    repo_path: str = ''
+    _head_sha: Optional[str] = None
+
+    def expected_sha(self) -> str:
+        if self._head_sha is None:
+            self._head_sha = _git_output(self.repo_path, ['rev-parse', 'HEAD']) if os.path.isdir(self.repo_path) else ''
+        return self._head_sha
+
+
+class PagesBuildCheck(_HeadShaMixin, PublicationCheck):
+    """GitHub Pages builds API で最新ビルドの状態と commit を照合"""
+    name = 'build'
+
+    def __init__(self, repo_path: Optional[str] = None, slug: Optional[str] = None,
+                 token: Optional[str] = None, api_url: Optional[str] = None):
+        self.repo_path = repo_path or get_pages_repo_path()
+        settings = get_settings()
+        self.api_url = (api_url or settings.github_api_url or _DEF_API).rstrip('/')
+        self.token = token or settings.github_token
+        self._slug = slug or settings.pages_repo_slug or None
+        self.last = ''
+
+    def slug(self) -> str:
+        if self._slug is None:
+            remote = _git_output(self.repo_path, ['remote', 'get-url', 'origin']) if os.path.isdir(self.repo_path) else ''
+            m = re.search(r'github\.com[:/]+([^/]+/[^/]+?)(?:\.git)?/?$', remote)
+            self._slug = m.group(1) if m else ''
+        return self._slug
+
+    def available(self) -> bool:
+        # Pages builds API は認証必須。トークン・slug・ローカルSHAが揃う場合のみ使用
+        return bool(self.token and self.slug() and self.expected_sha())
+
+    def check(self, target_dt: datetime, attempt: int) -> Optional[bool]:
+        url = f"{self.api_url}/repos/{self.slug()}/pages/builds/latest"
+        headers = {
+            'Accept': 'application/vnd.github+json',
+            'Authorization': f'Bearer {self.token}',
+        }
+        status, body = http_get(url, headers=headers)
+        if status != 200:
+            self.last = f'status={status}'
+            return None
+        try:
+            info = json.loads(body)
+        except ValueError:
+            self.last = 'JSON解析失敗'
+            return None
+        build_status = str(info.get('status', ''))
+        commit = str(info.get('commit', ''))
+        self.last = f'build={build_status}, commit={commit[:7]}'
+        if build_status == 'errored':
+            # ビルド失敗は待っても反映されないため判定を次へ回す
+            return None
+        return build_status == 'built' and commit == self.expected_sha()
+
+    def describe_last(self) -> str:
+        return self.last
+
+
+class MarkerFileCheck(_HeadShaMixin, PublicationCheck):
+    """サイト上の publish-status.json に埋め込まれた revision をローカル HEAD と照合"""
+    name = 'marker'
+
+    def __init__(self, repo_path: Optional[str] = None, site_url: Optional[str] = None):
+        self.repo_path = repo_path or get_pages_repo_path()
+        self.site_url = (site_url or get_site_url()).rstrip('/')
+        self.last = ''
+
+    def available(self) -> bool:
+        return bool(self.expected_sha()) and os.path.exists(os.path.join(self.repo_path, MARKER_FILE_NAME))
+
+    def check(self, target_dt: datetime, attempt: int) -> Optional[bool]:
+        url = add_cache_buster(f"{self.site_url}/{MARKER_FILE_NAME}", attempt)
+        status, body = http_get(url)
+        if status != 200:
+            # 404 = マーカー未配置の可能性。判定はフォールバックへ回す
+            self.last = f'status={status}'
+            return None
+        try:
+            revision = str(json.loads(body).get('revision', ''))
+        except ValueError:
+            self.last = 'JSON解析失敗'
+            return None
+        if not revision:
+            # build_revision が空 = GitHub Pages 以外でのビルド。判定不能
+            self.last = 'revision空'
+            return None
+        self.last = f'revision={revision[:7]}'
+        return revision == self.expected_sha()
+
+    def describe_last(self) -> str:
+        return self.last
+
+
+class HtmlMarkerCheck(PublicationCheck):
+    """投稿ページを取得して見出し文字列を検索（従来方式）"""
+    name = 'html'
+
+    def __init__(self, extra_markers: Optional[List[str]] = None):
+        self.extra_markers = [m for m in (extra_markers or []) if isinstance(m, str) and m.strip()]
+        self.last = ''
+
+    def check(self, target_dt: datetime, attempt: int) -> Optional[bool]:
+        url = add_cache_buster(get_today_post_url(target_dt), attempt)
+        required_marker = f'お悔やみ情報 ({get_jp_date(target_dt)})'
+        status, body = http_get(url)
+        self.last = f'status={status}'
+        if status == 200 and body and required_marker in body:
+            missing_optional = [m for m in self.extra_markers if m not in body]
+            if missing_optional:
+                print(f'参考: 以下の確認用文字列は未検出です: {", ".join(missing_optional)}')
+            return True
+        if status == 200 and body:
+            self.last = f'status=200, 冒頭: {body[:120]}'
+        return False
+
+    def describe_last(self) -> str:
+        return self.last
+
+
+_BACKENDS = {
+    'build': PagesBuildCheck,
+    'marker': MarkerFileCheck,
+}
+
+
+def build_checks(spec: Optional[str] = None, *, extra_markers: Optional[List[str]] = None) -> List[PublicationCheck]:
+    """OKUYAMI_PUBLISH_CHECK の指定からバックエンド列を組み立てる。html は常に末尾に置く。"""
+    if spec is None:
+        spec = get_settings().publish_check
+    names = [s.strip().lower() for s in spec.split(',') if s.strip()]
+    if not names or names == ['auto']:
+        names = ['build', 'marker', 'html']
+    checks: List[PublicationCheck] = []
+    for name in names:
+        if name == 'html':
+            continue
+        factory = _BACKENDS.get(name)
+        if factory is None:
+            print(f'警告: 未知の公開確認方式を無視します: {name}')
+            continue
+        try:
+            backend = factory()
+            if backend.available():
+                checks.append(backend)
+        except Exception as exc:
+            print(f'公開確認方式 {name} の初期化失敗: {exc}')
+    checks.append(HtmlMarkerCheck(extra_markers))
+    return checks
+
+
+def _try_checks(checks: List[PublicationCheck], target_dt: datetime, attempt: int) -> Tuple[Optional[bool], str, str]:
+    """1回分の確認。最初に True を返したバックエンドで確定し、False/None なら次を試す。
+    (結果, 判定した方式, 最後の例外) を返す（全滅時は False があれば False、無ければ None）"""
+    last_error = ''
+    outcome: Optional[bool] = None
+    for backend in checks:
+        try:
+            result = backend.check(target_dt, attempt)
+        except Exception as exc:
+            last_error = f'{backend.name}: {type(exc).__name__}: {exc}'
+            result = None
+        if result:
+            return True, backend.name, last_error
+        if result is False:
+            outcome = False
+    return outcome, '', last_error
+
+
+def _report_pending(checks: List[PublicationCheck], attempt: int, interval: int) -> None:
+    detail = '; '.join(f'{c.name}:{c.describe_last()}' for c in checks if c.describe_last())
+    print(f'未確認: attempt={attempt} ({detail or "応答なし"})。{interval}s待機。')
+
+
+def _report_timeout(checks: List[PublicationCheck], timeout: int, last_error: str) -> None:
+    print(f'GitHub Pagesの公開確認がタイムアウトしました ({timeout}s)。')
+    for backend in checks:
+        if backend.describe_last():
+            print(f'最終状態 [{backend.name}]: {backend.describe_last()}')
+    if last_error:
+        print(f'最終エラー: {last_error}')
+
+
+def _prepare(target_dt: datetime, checks: Optional[List[PublicationCheck]], extra_markers: Optional[List[str]],
+             timeout: Optional[int], interval: Optional[int]) -> Tuple[List[PublicationCheck], int, int]:
+    if timeout is None:
+        timeout = get_settings().publish_wait_seconds
+    if interval is None:
+        interval = get_settings().publish_poll_interval
+    if checks is None:
+        checks = build_checks(extra_markers=extra_markers)
+    names = ','.join(c.name for c in checks)
+    print(f'GitHub Pages公開確認開始: {get_today_post_url(target_dt)} (方式: {names})')
+    return checks, timeout, interval
+
+
+def wait_for_publication(target_dt: datetime, *, checks: Optional[List[PublicationCheck]] = None,
+                         extra_markers: Optional[List[str]] = None,
+                         timeout: Optional[int] = None, interval: Optional[int] = None) -> bool:
+    """公開をポーリングで確認。各試行でバックエンドを順に評価し、True を返したもので確定する。
+    False/None は次のバックエンドへ（試行の結果は False が1つでもあれば False、無ければ None）。
+    いずれの試行でも確定しないままタイムアウトすれば False。"""
+    checks, timeout, interval = _prepare(target_dt, checks, extra_markers, timeout, interval)
+    start = time.monotonic()
+    attempt = 0
+    last_error = ''
+    while time.monotonic() - start <= timeout:
+        attempt += 1
+        result, decided_by, error = _try_checks(checks, target_dt, attempt)
+        last_error = error or last_error
+        if result:
+            elapsed = int(time.monotonic() - start)
+            print(f'公開確認成功: attempt={attempt}, elapsed={elapsed}s, 方式={decided_by}')
+            return True
+        _report_pending(checks, attempt, interval)
+        time.sleep(interval)
+    _report_timeout(checks, timeout, last_error)
+    return False
+
+
+async def wait_for_publication_async(target_dt: datetime, *, checks: Optional[List[PublicationCheck]] = None,
+                                     extra_markers: Optional[List[str]] = None,
+                                     timeout: Optional[int] = None, interval: Optional[int] = None) -> bool:
+    """wait_for_publication のイベントループ版（pipeline 用）。
+    HTTP 確認はスレッドで行い、待機は asyncio.sleep のためループ上の他の処理を止めない。"""
+    import asyncio  # アップロード等の同期経路では読み込まない
+    checks, timeout, interval = _prepare(target_dt, checks, extra_markers, timeout, interval)
+    start = time.monotonic()
+    attempt = 0
+    last_error = ''
+    while time.monotonic() - start <= timeout:
+        attempt += 1
+        result, decided_by, error = await asyncio.to_thread(_try_checks, checks, target_dt, attempt)
+        last_error = error or last_error
+        if result:
+            elapsed = int(time.monotonic() - start)
+            print(f'公開確認成功: attempt={attempt}, elapsed={elapsed}s, 方式={decided_by}')
+            return True
+        _report_pending(checks, attempt, interval)
+        await asyncio.sleep(interval)
+    _report_timeout(checks, timeout, last_error)
+    return False
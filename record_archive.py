@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""解析履歴の固定長バイナリアーカイブ (mmap 読み出し)
+数万件規模の履歴を検索・集計のたびに CSV/pandas で読み込まずに済むよう、
+1ファイル = ヘッダ + 固定長レコード表 + 文字列索引 + 文字列ヒープ (UTF-8) の形式で保存する。
+
+  ヘッダ      : _HEADER (magic, version, レコード数, 文字列数, 各領域のオフセット)
+  レコード表  : _RECORD (掲載日/死亡日=序数日, 通夜/告別式=エポック分 (いずれも0=欠損), 年齢 (-1=欠損),
+                文字列ID x 12) × レコード数
+  文字列索引  : (ヒープ内オフセット, バイト長) × 文字列数。ID 0 は空文字
+  文字列ヒープ: 同一文字列は1回だけ格納（市町村・地域・会場などはインターン済みIDで比較できる）
+
+読み出し側 (ArchiveReader) はファイルを mmap し、レコード・列は必要になった分だけ unpack する。
+numpy があれば columns() で数値列・文字列ID列をコピーなしの配列として取得できる。
+検索は文字列ヒープを1回走査して該当IDを求め、ID列との照合だけで行う。
+
+単体実行:
+  python record_archive.py --build                  # 履歴 (history_store) から作成
+  python record_archive.py --build --csv "okuyami_output/okuyami_*_parsed_*.csv"
+  python record_archive.py --search NEC --field occupation --field relatives
+  python record_archive.py --stats
+"""
+from __future__ import annotations
+import bisect
+import csv
+import glob
+import mmap
+import os
+import re
+import struct
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from common_utils import fw_alnum_to_hw, lazy_module
+from event_dates import resolve_death_date, resolve_event_datetime
+from history_store import FIELD_MAP, HistoryStore
+from settings import get_settings
+
+__all__ = ['ArchiveReader', 'write_archive', 'build_from_history', 'build_from_csv', 'STRING_FIELDS', 'default_path']
+
+np = lazy_module('numpy', optional=True)
+
+_MAGIC = b'OKYA'
+_VERSION = 2
+# magic, version, 予約, レコード数, 文字列数, レコード表/文字列索引/ヒープのオフセット, ヒープ長
+_HEADER = struct.Struct('<4sHHIIQQQQ')
+STRING_FIELDS: Tuple[str, ...] = (
+    'region', 'city', 'name', 'kana', 'address', 'death_text',
+    'occupation', 'chief_mourner', 'relatives', 'wake', 'funeral', 'venue',
+)
+NUMERIC_FIELDS: Tuple[str, ...] = ('publish_date', 'death_date', 'wake_at', 'funeral_at', 'age')
+_RECORD = struct.Struct('<IIIIh' + 'I' * len(STRING_FIELDS))
+_S0 = len(NUMERIC_FIELDS)  # 文字列IDの開始位置
+_EPOCH = datetime(1970, 1, 1)
+_STRREF = struct.Struct('<II')
+_CSV_NAME = re.compile(r'okuyami_(\d{8})_parsed_(\d{8}_\d{6})')
+
+
+def default_path(output_dir: Optional[str] = None) -> str:
+    return os.path.join(os.path.dirname(get_settings().history_path(output_dir).rstrip('/\\')) or '.',
+                        'okuyami_records.bin')
+
+
+def _minutes(v: Optional[datetime]) -> int:
+    return int((v - _EPOCH).total_seconds()) // 60 if v else 0
+
+
+def _from_minutes(v: int) -> Optional[datetime]:
+    return _EPOCH + timedelta(minutes=v) if v else None
+
+
+# --- 書き出し ---
+
+def write_archive(path: str, records: Iterable[Dict[str, Any]]) -> int:
+    """records: publish_date/death_date (date), wake_at/funeral_at (datetime), age (int),
+    STRING_FIELDS (str) を持つ dict。件数を返す"""
+    ids: Dict[str, int] = {'': 0}
+    heap = bytearray()
+    refs = [(0, 0)]
+    rows = bytearray()
+    n = 0
+    for rec in records:
+        sids = []
+        for f in STRING_FIELDS:
+            v = rec.get(f)
+            s = '' if v is None else str(v)
+            sid = ids.get(s)
+            if sid is None:
+                b = s.encode('utf-8')
+                sid = ids[s] = len(refs)
+                refs.append((len(heap), len(b)))
+                heap += b
+            sids.append(sid)
+        pub, death, age = rec.get('publish_date'), rec.get('death_date'), rec.get('age')
+        rows += _RECORD.pack(pub.toordinal() if pub else 0, death.toordinal() if death else 0,
+                             _minutes(rec.get('wake_at')), _minutes(rec.get('funeral_at')),
+                             -1 if age is None else int(age), *sids)
+        n += 1
+    off_records = _HEADER.size
+    off_index = off_records + len(rows)
+    off_heap = off_index + _STRREF.size * len(refs)
+    header = _HEADER.pack(_MAGIC, _VERSION, 0, n, len(refs), off_records, off_index, off_heap, len(heap))
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as wf:
+        wf.write(header)
+        wf.write(rows)
+        wf.write(b''.join(_STRREF.pack(o, l) for o, l in refs))
+        wf.write(heap)
+    os.replace(tmp, path)
+    return n
+
+
+def build_from_history(path: str, store: Optional[HistoryStore] = None) -> int:
+    table = (store or HistoryStore()).read_table()
+    cols = {name: table.column(name).to_pylist() for name in ('publish_date', 'seq', *NUMERIC_FIELDS[1:], *STRING_FIELDS)}
+    order = sorted(range(table.num_rows), key=lambda i: (cols['publish_date'][i], cols['seq'][i]))
+    return write_archive(path, ({k: v[i] for k, v in cols.items()} for i in order))
+
+
+def build_from_csv(path: str, csv_paths: Iterable[str]) -> int:
+    """解析済みCSVから作成（日付ごとに最新の1本）。pyarrow の無い環境向け"""
+    latest: Dict[str, Tuple[str, str]] = {}
+    for p in csv_paths:
+        m = _CSV_NAME.search(os.path.basename(p))
+        if m and (m.group(1) not in latest or m.group(2) > latest[m.group(1)][0]):
+            latest[m.group(1)] = (m.group(2), p)
+
+    def _iter() -> Iterator[Dict[str, Any]]:
+        for day_s, (_, p) in sorted(latest.items()):
+            day = datetime.strptime(day_s, '%Y%m%d').date()
+            with open(p, 'r', encoding='utf-8-sig', newline='') as rf:
+                for row in csv.DictReader(rf):
+                    rec: Dict[str, Any] = {dst: (row.get(src) or '').strip() for src, dst in FIELD_MAP.items()}
+                    age = re.search(r'\d+', fw_alnum_to_hw(rec.pop('age')))
+                    rec['age'] = int(age.group()) if age else None
+                    rec['publish_date'] = day
+                    rec['death_date'] = resolve_death_date(rec['death_text'], day)
+                    rec['wake_at'] = resolve_event_datetime(rec['wake'], day)
+                    rec['funeral_at'] = resolve_event_datetime(rec['funeral'], day)
+                    yield rec
+    return write_archive(path, _iter())
+
+
+# --- 読み出し ---
+
+class ArchiveReader:
+    def __init__(self, path: str):
+        self.path = path
+        self._fp = open(path, 'rb')
+        try:
+            self._mm = mmap.mmap(self._fp.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # 空ファイル
+            self._fp.close()
+            raise ValueError(f'アーカイブが空です: {path}')
+        magic, version, _, self.count, self.string_count, self._off_rec, self._off_idx, self._off_heap, self._heap_len = \
+            _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC or version != _VERSION:
+            self.close()
+            raise ValueError(f'アーカイブ形式が不正です: {path}')
+        self._view = memoryview(self._mm)
+        self._strings: Dict[int, str] = {}
+        self._offsets: Optional[List[int]] = None
+
+    def close(self) -> None:
+        if getattr(self, '_view', None) is not None:
+            self._view.release()
+            self._view = None  # type: ignore[assignment]
+        self._mm.close()
+        self._fp.close()
+
+    def __enter__(self) -> 'ArchiveReader':
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    # 文字列
+    def string(self, sid: int) -> str:
+        s = self._strings.get(sid)
+        if s is None:
+            off, length = _STRREF.unpack_from(self._mm, self._off_idx + _STRREF.size * sid)
+            start = self._off_heap + off
+            s = self._strings[sid] = str(self._view[start:start + length], 'utf-8')
+        return s
+
+    def _heap_offsets(self) -> List[int]:
+        if self._offsets is None:
+            raw = self._view[self._off_idx:self._off_heap].cast('I')
+            self._offsets = list(raw[0::2])
+            raw.release()
+        return self._offsets
+
+    def string_ids(self, needle: str) -> set:
+        """needle を含む文字列のID集合（ヒープを1回走査）"""
+        if not needle:
+            return set()
+        heap = self._mm
+        pat = needle.encode('utf-8')
+        offsets = self._heap_offsets()
+        found = set()
+        pos = heap.find(pat, self._off_heap, self._off_heap + self._heap_len)
+        while pos != -1:
+            rel = pos - self._off_heap
+            sid = bisect.bisect_right(offsets, rel) - 1
+            # 同じオフセットの空文字 (ID 0) を飛ばして実体のIDへ
+            while sid + 1 < len(offsets) and offsets[sid + 1] == offsets[sid]:
+                sid += 1
+            off, length = _STRREF.unpack_from(self._mm, self._off_idx + _STRREF.size * sid)
+            if rel + len(pat) <= off + length:
+                found.add(sid)
+            pos = heap.find(pat, pos + 1, self._off_heap + self._heap_len)
+        return found
+
+    # レコード
+    def raw(self, i: int) -> Tuple[int, ...]:
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        return _RECORD.unpack_from(self._mm, self._off_rec + _RECORD.size * i)
+
+    def record(self, i: int) -> Dict[str, Any]:
+        pub, death, wake, funeral, age, *sids = self.raw(i)
+        rec: Dict[str, Any] = {
+            'publish_date': date.fromordinal(pub) if pub else None,
+            'death_date': date.fromordinal(death) if death else None,
+            'wake_at': _from_minutes(wake),
+            'funeral_at': _from_minutes(funeral),
+            'age': None if age < 0 else age,
+        }
+        for f, sid in zip(STRING_FIELDS, sids):
+            rec[f] = self.string(sid)
+        return rec
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(self.count):
+            yield self.record(i)
+
+    def iter_raw(self) -> Iterator[Tuple[int, ...]]:
+        return _RECORD.iter_unpack(self._view[self._off_rec:self._off_rec + _RECORD.size * self.count])
+
+    def columns(self) -> Any:
+        """numpy の構造化配列（mmap 上のビュー、コピーなし）。numpy が無ければ ImportError"""
+        if not np:
+            raise ImportError('columns() には numpy が必要です')
+        dtype = np.dtype([(f, '<u4') for f in NUMERIC_FIELDS[:-1]] + [('age', '<i2')]
+                         + [(f, '<u4') for f in STRING_FIELDS])
+        return np.frombuffer(self._mm, dtype=dtype, count=self.count, offset=self._off_rec)
+
+    def column(self, field: str) -> List[Any]:
+        """1列分（文字列列はIDを文字列に、日付は date、通夜/告別式は datetime に変換）"""
+        k = (*NUMERIC_FIELDS, *STRING_FIELDS).index(field)
+        vals = [r[k] for r in self.iter_raw()]
+        if field in STRING_FIELDS:
+            return [self.string(v) for v in vals]
+        if field == 'age':
+            return [None if v < 0 else v for v in vals]
+        if field in ('wake_at', 'funeral_at'):
+            return [_from_minutes(v) for v in vals]
+        return [date.fromordinal(v) if v else None for v in vals]
+
+    # 検索・集計
+    def search(self, text: str, fields: Sequence[str] = ('name', 'occupation', 'relatives', 'chief_mourner'),
+               since: Optional[date] = None, until: Optional[date] = None) -> List[int]:
+        """text を含むレコード番号（指定列のいずれか）"""
+        ids = self.string_ids(text)
+        if not ids:
+            return []
+        ks = [_S0 + STRING_FIELDS.index(f) for f in fields]
+        lo = since.toordinal() if since else 0
+        hi = until.toordinal() if until else 1 << 32
+        return [i for i, r in enumerate(self.iter_raw()) if lo <= r[0] <= hi and any(r[k] in ids for k in ks)]
+
+    def events(self, kind: str = 'funeral', since: Optional[datetime] = None, until: Optional[datetime] = None,
+               venue: Optional[str] = None) -> List[int]:
+        """期間 [since, until) の通夜/告別式 (kind=wake|funeral) のレコード番号を日時順に。venue は会場の部分一致"""
+        k = NUMERIC_FIELDS.index(f'{kind}_at')
+        since = since or datetime.combine(date.today(), datetime.min.time())
+        lo = _minutes(since)
+        hi = _minutes(until or since + timedelta(days=7))
+        kv = _S0 + STRING_FIELDS.index('venue')
+        ids = self.string_ids(venue) if venue else None
+        hits = [(r[k], i) for i, r in enumerate(self.iter_raw()) if lo <= r[k] < hi and (ids is None or r[kv] in ids)]
+        return [i for _, i in sorted(hits)]
+
+    def count_by(self, field: str) -> Counter:
+        """文字列列の値ごとの件数（ID単位で数えてから文字列化）"""
+        k = _S0 + STRING_FIELDS.index(field)
+        ids = Counter(r[k] for r in self.iter_raw())
+        return Counter({self.string(sid): n for sid, n in ids.items()})
+
+    def age_stats(self) -> Dict[str, float]:
+        k = NUMERIC_FIELDS.index('age')
+        ages = [r[k] for r in self.iter_raw() if r[k] >= 0]
+        if not ages:
+            return {'count': 0}
+        return {'count': len(ages), 'mean': sum(ages) / len(ages), 'min': min(ages), 'max': max(ages)}
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+    ap = argparse.ArgumentParser(description='解析履歴のバイナリアーカイブ（作成・検索・集計）')
+    ap.add_argument('--path', help='アーカイブファイル (既定: 履歴ディレクトリと同じ階層の okuyami_records.bin)')
+    ap.add_argument('--build', action='store_true', help='作成（既定は history_store の履歴から）')
+    ap.add_argument('--csv', metavar='GLOB', help='--build で解析済みCSVから作成')
+    ap.add_argument('--search', help='文字列検索')
+    ap.add_argument('--field', action='append', choices=STRING_FIELDS, help='--search の対象列 (複数可)')
+    ap.add_argument('--stats', action='store_true', help='市町村別件数・年齢統計')
+    cli = ap.parse_args()
+    path = cli.path or default_path()
+    if cli.build:
+        t0 = time.perf_counter()
+        if cli.csv:
+            n = build_from_csv(path, sorted(glob.glob(cli.csv)))
+        else:
+            if not HistoryStore.available():
+                print('pyarrow が無いため --csv を指定してください')
+                raise SystemExit(1)
+            n = build_from_history(path)
+        print(f'{path}: {n}件, {os.path.getsize(path)} bytes ({time.perf_counter() - t0:.2f}s)')
+    if cli.search or cli.stats:
+        t0 = time.perf_counter()
+        with ArchiveReader(path) as reader:
+            opened = time.perf_counter() - t0
+            if cli.search:
+                hits = reader.search(cli.search, cli.field or ('name', 'occupation', 'relatives', 'chief_mourner'))
+                print(f'"{cli.search}": {len(hits)}件 / {len(reader)}件 (open {opened * 1000:.1f} ms, 計 {(time.perf_counter() - t0) * 1000:.1f} ms)')
+                for i in hits[:20]:
+                    r = reader.record(i)
+                    print(f"  {r['publish_date']} {r['city']} {r['name']} ({r['age']}) {r['occupation']}")
+            if cli.stats:
+                print(f'件数: {len(reader)}, 年齢: {reader.age_stats()}')
+                for city, n in reader.count_by('city').most_common():
+                    print(f'  {city or "(不明)"}: {n}')
@@ -6,13 +6,6 @@ Microsoft Edge（Chromium）とSeleniumを使用してブラウザ自動化に
 お悔やみ情報を取得してローカルフォルダにテキストファイルとして保存
 """
 
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options as ChromeOptions
-from selenium.webdriver.chrome.service import Service as ChromeService
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
 import os
 import time
 import tempfile
@@ -21,10 +14,125 @@ from datetime import datetime
 import re
 import shutil
 import logging
-from typing import Optional, cast
+from typing import Optional, Tuple, cast
+from settings import get_settings
+from venue_gazetteer import record_venues
+
+# selenium はスクレイパー生成時に読み込む（--help や認証情報未設定で終了する経路を軽くする）
+webdriver = ChromeOptions = ChromeService = By = WebDriverWait = EC = None  # type: ignore
+TimeoutException = NoSuchElementException = None  # type: ignore
+
+
+def _import_selenium() -> None:
+    """selenium の各名前をモジュール変数に束縛する（初回のみ import）"""
+    global webdriver, ChromeOptions, ChromeService, By, WebDriverWait, EC, TimeoutException, NoSuchElementException
+    if webdriver is not None:
+        return
+    from selenium import webdriver as _webdriver
+    from selenium.webdriver.chrome.options import Options as _ChromeOptions
+    from selenium.webdriver.chrome.service import Service as _ChromeService
+    from selenium.webdriver.common.by import By as _By
+    from selenium.webdriver.support.ui import WebDriverWait as _WebDriverWait
+    from selenium.webdriver.support import expected_conditions as _EC
+    from selenium.common.exceptions import TimeoutException as _Timeout, NoSuchElementException as _NoSuchElement
+    ChromeOptions, ChromeService, By, WebDriverWait, EC = _ChromeOptions, _ChromeService, _By, _WebDriverWait, _EC
+    TimeoutException, NoSuchElementException = _Timeout, _NoSuchElement
+    webdriver = _webdriver
+
+
+def restore_layout(inner_html: str) -> str:
+    """#p_textarea の innerHTML（またはテキスト）から解析用の行構造を復元する
+    <br> を改行に、地域見出し ■ / 市町村 ◇ / 人物 (〜さん（) の前で改行し、
+    分割された単漢字行と '■ 甲 府' + '■' の見出しを連結する。
+    raw_html/ の保存分からも同じ入力を再現できるよう WebDriver に依存しない。
+    """
+    raw = re.sub(r'<br\s*/?>', '\n', inner_html, flags=re.I)
+    raw = re.sub(r'<[^>]+>', '', raw)
+    raw = raw.replace('\u3000', ' ')
+    # 基本区切り
+    raw = re.sub(r'(?<!\n)■', '\n■', raw)
+    raw = re.sub(r'(?<!\n)◇', '\n◇', raw)
+    raw = re.sub(r'。(?!\n)(?=[一-龥々〆〇]{1,8}[^。\n]{0,25}?さん（)', '。\n', raw)
+    lines = [l for l in (s.rstrip() for s in raw.split('\n')) if l.strip()]
+    # 単漢字連結
+    out = []
+    buf = []
+    for ln in lines:
+        if re.fullmatch(r'[一-龥々〆〇]$', ln):
+            buf.append(ln)
+            continue
+        if buf:
+            ln = ''.join(buf) + ln
+            buf = []
+        out.append(ln)
+    if buf:
+        out.append(''.join(buf))
+    # 地域見出し行修正: '■ 甲 府' + 余分スペース→ '■ 甲 府 ■'
+    fixed = []
+    i = 0
+    while i < len(out):
+        ln = out[i]
+        # パターン: 行1 = '■ 甲 府' (行頭 '■' かつ後続15文字以内に2つ目の'■'が無い) かつ 次行が単独 '■'
+        if ln.startswith('■') and '■' not in ln[1:15] and i + 1 < len(out) and out[i+1] == '■':
+            fixed.append(ln.rstrip() + ' ■')
+            i += 2
+            continue
+        fixed.append(ln)
+        i += 1
+    return '\n'.join(fixed)
+
+
+_SKIP_PATTERNS = [
+    r'^音声読み上げ$',
+    r'^写真画像を拡大する$',
+    r'^斎場の地図はこちら$',
+    r'^Copyright.*$',
+    r'^〒\d{3}-\d{4}.*$',
+    r'^\(055\).*$',
+    r'^山梨日日新聞社$',
+    r'^ホーム$',
+    r'^ログアウト$',
+    r'^記事スクラップ$',
+    r'^マイニュースメール$'
+]
+
+
+def filter_okuyami_text(text: str) -> str:
+    """明らかに不要な行（ナビゲーション・著作権表示など）と空行を除く。結果が短すぎる場合は元のテキスト"""
+    # #p_textareaから取得した場合は、既にお悔やみ情報のみの可能性が高い
+    # 簡単なクリーニングのみ実行
+    filtered_lines = []
+    for line in text.split('\n'):
+        line = line.strip()
+        # 空行をスキップ
+        if not line:
+            continue
+        # 明らかに不要な行をスキップ
+        if not any(re.search(pattern, line) for pattern in _SKIP_PATTERNS):
+            filtered_lines.append(line)
+    result = '\n'.join(filtered_lines)
+    # 結果が短すぎる場合は元のテキストを返す
+    if len(result.strip()) < 100:
+        print("フィルタリング後のテキストが短すぎるため、元のテキストを使用します")
+        return text
+    return result
+
+
+def format_article(content: str, date: str, title: str, fetched_at: Optional[str] = None) -> str:
+    """保存ファイル (okuyami_YYYYMMDD.txt) の内容: ヘッダ + 区切り線 + 本文"""
+    if fetched_at is None:
+        fetched_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    return (
+        f"取得日時: {fetched_at}\n"
+        f"タイトル: {title}\n"
+        f"日付: {date}\n"
+        + "=" * 50 + "\n\n"
+        + content
+    )
+
 
 class SeleniumOkuyamiScraper:
-    def __init__(self, email, password, output_dir="./okuyami_data", headless=True):
+    def __init__(self, email, password, output_dir="./okuyami_data", headless=True, venues_dir=None):
         """
         初期化
         
@@ -33,11 +141,14 @@ class SeleniumOkuyamiScraper:
             password (str): ログイン用パスワード
             output_dir (str): 出力ディレクトリ
             headless (bool): ヘッドレスモードで実行するか
+            venues_dir (str): 会場辞書を置く解析の出力先（None なら既定の ./okuyami_output）
         """
+        _import_selenium()
         self.email = email
         self.password = password
         self.output_dir = output_dir
         self.headless = headless
+        self.venues_dir = venues_dir
         self.driver = None
         self.wait = None
         self._temp_user_data_dir = None
@@ -541,48 +652,15 @@ class SeleniumOkuyamiScraper:
                     except Exception:
                         pass
 
+                    # 斎場リンク (class="saijyo") の座標を会場辞書へ
+                    if inner_html:
+                        record_venues(inner_html, self.venues_dir)
+
                     # inner_html からレイアウト復元（<br> / 見出し / 人物単位）
-                    restored = content
                     try:
-                        import re as _reseg
-                        raw = inner_html or content
-                        raw = _reseg.sub(r'<br\s*/?>', '\n', raw, flags=_reseg.I)
-                        raw = _reseg.sub(r'<[^>]+>', '', raw)
-                        raw = raw.replace('\u3000', ' ')
-                        # 基本区切り
-                        raw = _reseg.sub(r'(?<!\n)■', '\n■', raw)
-                        raw = _reseg.sub(r'(?<!\n)◇', '\n◇', raw)
-                        raw = _reseg.sub(r'。(?!\n)(?=[一-龥々〆〇]{1,8}[^。\n]{0,25}?さん（)', '。\n', raw)
-                        lines = [l for l in (s.rstrip() for s in raw.split('\n')) if l.strip()]
-                        # 単漢字連結
-                        out = []
-                        buf = []
-                        for ln in lines:
-                            if _reseg.fullmatch(r'[一-龥々〆〇]$', ln):
-                                buf.append(ln)
-                                continue
-                            if buf:
-                                ln = ''.join(buf) + ln
-                                buf = []
-                            out.append(ln)
-                        if buf:
-                            out.append(''.join(buf))
-                        # 地域見出し行修正: '■ 甲 府' + 余分スペース→ '■ 甲 府 ■'
-                        fixed = []
-                        i = 0
-                        while i < len(out):
-                            ln = out[i]
-                            # パターン: 行1 = '■ 甲 府' (行頭 '■' かつ後続15文字以内に2つ目の'■'が無い) かつ 次行が単独 '■'
-                            if ln.startswith('■') and '■' not in ln[1:15] and i + 1 < len(out) and out[i+1] == '■':
-                                merged = ln.rstrip() + ' ■'
-                                fixed.append(merged)
-                                i += 2
-                                continue
-                            fixed.append(ln)
-                            i += 1
-                        restored = '\n'.join(fixed)
+                        restored = restore_layout(inner_html or content)
                     except Exception:
-                        pass
+                        restored = content
 
                     # ログ簡潔化
                     print("お悔やみ情報を#p_textareaから取得しました (layout restored)")
@@ -632,52 +710,7 @@ class SeleniumOkuyamiScraper:
         Returns:
             str: フィルタリングされたお悔やみ情報
         """
-        # #p_textareaから取得した場合は、既にお悔やみ情報のみの可能性が高い
-        # 簡単なクリーニングのみ実行
-        
-        lines = text.split('\n')
-        filtered_lines = []
-        
-        # 明らかに不要な行のみをスキップ
-        skip_patterns = [
-            r'^音声読み上げ$',
-            r'^写真画像を拡大する$',
-            r'^斎場の地図はこちら$',
-            r'^Copyright.*$',
-            r'^〒\d{3}-\d{4}.*$',
-            r'^\(055\).*$',
-            r'^山梨日日新聞社$',
-            r'^ホーム$',
-            r'^ログアウト$',
-            r'^記事スクラップ$',
-            r'^マイニュースメール$'
-        ]
-        
-        for line in lines:
-            line = line.strip()
-            
-            # 空行をスキップ
-            if not line:
-                continue
-            
-            # 明らかに不要な行をスキップ
-            should_skip = False
-            for pattern in skip_patterns:
-                if re.search(pattern, line):
-                    should_skip = True
-                    break
-            
-            if not should_skip:
-                filtered_lines.append(line)
-        
-        result = '\n'.join(filtered_lines)
-        
-        # 結果が短すぎる場合は元のテキストを返す
-        if len(result.strip()) < 100:
-            print("フィルタリング後のテキストが短すぎるため、元のテキストを使用します")
-            return text
-        
-        return result
+        return filter_okuyami_text(text)
     
     def save_to_file(self, content, date, title):
         """
@@ -696,11 +729,7 @@ class SeleniumOkuyamiScraper:
             
             # ファイルに保存
             with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(f"取得日時: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                f.write(f"タイトル: {title}\n")
-                f.write(f"日付: {date}\n")
-                f.write("=" * 50 + "\n\n")
-                f.write(content)
+                f.write(format_article(content, date, title))
             
             print(f"ファイル保存完了: {filepath}")
             
@@ -828,6 +857,12 @@ class SeleniumOkuyamiScraper:
         self._cleanup_user_data_dir()
 
 
+def _resolve_credentials(email: Optional[str] = None, password: Optional[str] = None) -> Tuple[str, str]:
+    """認証情報（引数 > 環境変数 OKUYAMI_EMAIL/OKUYAMI_PASSWORD > config.ini [auth]）"""
+    settings = get_settings()
+    return email or settings.auth_email, password or settings.auth_password
+
+
 def main():
     """
     メイン関数
@@ -835,8 +870,7 @@ def main():
     import sys
     import argparse
     
-    # 設定（環境変数・config.ini対応）
-    import configparser
+    # 設定（環境変数・config.ini対応は settings で一元管理）
     OUTPUT_DIR = "./okuyami_data"
     HEADLESS = True  # ヘッドレスモード（Falseにするとブラウザが表示される）
     
@@ -850,6 +884,7 @@ def main():
     parser.add_argument('--email', type=str, help='ログインメールアドレス（環境変数OKUYAMI_EMAIL優先）')
     parser.add_argument('--password', type=str, help='ログインパスワード（環境変数OKUYAMI_PASSWORD優先）')
     parser.add_argument('--prefer-today', action='store_true', help='本日分がある場合のみ取得（なければ中止）')
+    parser.add_argument('--venues-dir', type=str, help='会場辞書を置く解析の出力先（既定: ./okuyami_output）')
     
     # 引数がない場合はインタラクティブモード
     if len(sys.argv) == 1:
@@ -875,14 +910,7 @@ def main():
                     # 日付形式の検証
                     datetime.strptime(date_str, '%Y-%m-%d')
                     # 認証情報の取得
-                    cfg_email, cfg_password = None, None
-                    config = configparser.ConfigParser()
-                    if os.path.exists('config.ini'):
-                        config.read('config.ini', encoding='utf-8')
-                        cfg_email = config.get('auth', 'email', fallback=None)
-                        cfg_password = config.get('auth', 'password', fallback=None)
-                    email = os.getenv('OKUYAMI_EMAIL', cfg_email)
-                    password = os.getenv('OKUYAMI_PASSWORD', cfg_password)
+                    email, password = _resolve_credentials()
                     if not email or not password:
                         print('認証情報が見つかりません。環境変数OKUYAMI_EMAIL/OKUYAMI_PASSWORD、またはconfig.iniを設定してください。')
                         sys.exit(1)
@@ -892,14 +920,7 @@ def main():
                 except ValueError:
                     print("日付形式が正しくありません (YYYY-MM-DD)")
             elif choice == "2":
-                config = configparser.ConfigParser()
-                cfg_email, cfg_password = None, None
-                if os.path.exists('config.ini'):
-                    config.read('config.ini', encoding='utf-8')
-                    cfg_email = config.get('auth', 'email', fallback=None)
-                    cfg_password = config.get('auth', 'password', fallback=None)
-                email = os.getenv('OKUYAMI_EMAIL', cfg_email)
-                password = os.getenv('OKUYAMI_PASSWORD', cfg_password)
+                email, password = _resolve_credentials()
                 if not email or not password:
                     print('認証情報が見つかりません。環境変数OKUYAMI_EMAIL/OKUYAMI_PASSWORD、またはconfig.iniを設定してください。')
                     sys.exit(1)
@@ -907,14 +928,7 @@ def main():
                 success = scraper.scrape_latest(1)
                 sys.exit(0 if success else 1)
             elif choice == "3":
-                config = configparser.ConfigParser()
-                cfg_email, cfg_password = None, None
-                if os.path.exists('config.ini'):
-                    config.read('config.ini', encoding='utf-8')
-                    cfg_email = config.get('auth', 'email', fallback=None)
-                    cfg_password = config.get('auth', 'password', fallback=None)
-                email = os.getenv('OKUYAMI_EMAIL', cfg_email)
-                password = os.getenv('OKUYAMI_PASSWORD', cfg_password)
+                email, password = _resolve_credentials()
                 if not email or not password:
                     print('認証情報が見つかりません。環境変数OKUYAMI_EMAIL/OKUYAMI_PASSWORD、またはconfig.iniを設定してください。')
                     sys.exit(1)
@@ -923,14 +937,7 @@ def main():
                 sys.exit(0 if success else 1)
             elif choice == "4":
                 print("ブラウザ表示モードで最新1件を取得します...")
-                config = configparser.ConfigParser()
-                cfg_email, cfg_password = None, None
-                if os.path.exists('config.ini'):
-                    config.read('config.ini', encoding='utf-8')
-                    cfg_email = config.get('auth', 'email', fallback=None)
-                    cfg_password = config.get('auth', 'password', fallback=None)
-                email = os.getenv('OKUYAMI_EMAIL', cfg_email)
-                password = os.getenv('OKUYAMI_PASSWORD', cfg_password)
+                email, password = _resolve_credentials()
                 if not email or not password:
                     print('認証情報が見つかりません。環境変数OKUYAMI_EMAIL/OKUYAMI_PASSWORD、またはconfig.iniを設定してください。')
                     sys.exit(1)
@@ -950,19 +957,12 @@ def main():
         elif args.headless:
             headless_mode = True
         # 認証情報の決定（引数 > 環境変数 > config.ini）
-        config = configparser.ConfigParser()
-        cfg_email, cfg_password = None, None
-        if os.path.exists('config.ini'):
-            config.read('config.ini', encoding='utf-8')
-            cfg_email = config.get('auth', 'email', fallback=None)
-            cfg_password = config.get('auth', 'password', fallback=None)
-        email = args.email or os.getenv('OKUYAMI_EMAIL', cfg_email)
-        password = args.password or os.getenv('OKUYAMI_PASSWORD', cfg_password)
+        email, password = _resolve_credentials(args.email, args.password)
         if not email or not password:
             print('認証情報が見つかりません。--email/--password、環境変数OKUYAMI_EMAIL/OKUYAMI_PASSWORD、またはconfig.iniを設定してください。')
             sys.exit(1)
 
-        scraper = SeleniumOkuyamiScraper(email, password, OUTPUT_DIR, headless_mode)
+        scraper = SeleniumOkuyamiScraper(email, password, OUTPUT_DIR, headless_mode, venues_dir=args.venues_dir)
         
         try:
             if args.auto:
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""設定の一元管理
+環境変数 > config.ini > Pages リポジトリの _config.yml > 既定値 の順にマージした型付き設定を返す。
+一度読んだ結果はプロセス内でキャッシュし、各スクリプト・モジュールは get_settings() を参照する。
+常駐プロセス (pipeline など) は get_settings(watch=True) または OKUYAMI_SETTINGS_WATCH=1 で、
+config.ini / _config.yml の更新時刻が変わった時だけ読み直す。
+
+  config.ini の場所: OKUYAMI_CONFIG (既定 ./config.ini)
+  任意セクションは settings.config (configparser, 補間なし) から参照
+"""
+from __future__ import annotations
+import configparser
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+__all__ = ['Settings', 'get_settings', 'load_settings', 'reset_settings', 'DEFAULT_OUTPUT_DIR']
+
+_DEF_SITE = 'https://MiMicroAG.github.io/okuyami-info'
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+_TRUE = ('1', 'true', 'yes', 'on')
+# 解析結果の出力先（parse_and_format_obituary.py --output-dir の既定）
+DEFAULT_OUTPUT_DIR = './okuyami_output'
+
+
+def _env(key: str) -> str:
+    val = os.getenv(key)
+    return val.strip() if val and val.strip() else ''
+
+
+def _unquote(s: str) -> str:
+    s = s.strip()
+    if len(s) >= 2 and s[0] == s[-1] == '"':
+        s = s[1:-1]
+    return s
+
+
+@dataclass
+class Settings:
+    # サイト / Pages リポジトリ
+    site_url: str = _DEF_SITE
+    pages_repo: str = ''
+    branch: str = 'main'
+    pages_repo_slug: str = ''
+    github_token: str = ''
+    github_api_url: str = 'https://api.github.com'
+    git_backend: str = 'porcelain'
+    # スクレイピング認証
+    auth_email: str = ''
+    auth_password: str = ''
+    # 出力
+    render_mode: str = 'inline'
+    minify_html: bool = False
+    # 履歴 (history_store: 年/月パーティションの Parquet/Feather)
+    history_enabled: bool = True
+    history_dir: str = ''  # 空なら出力先の history（history_path）
+    history_format: str = 'parquet'
+    # 重複検出（過去 N 日と照合。0 で無効）
+    dedup_window_days: int = 30
+    trend_stats_file: str = ''  # 空なら出力先の trend_stats.json（trend_stats_path）
+    # 件数の異常検知 (parse_check): True なら警告時に解析を失敗させて公開を止める
+    anomaly_block: bool = False
+    # 公開確認
+    publish_check: str = 'auto'
+    publish_wait_seconds: int = 600
+    publish_poll_interval: int = 15
+    # 通知
+    line_enabled: bool = True
+    line_token: str = ''
+    line_recipients: List[str] = field(default_factory=list)
+    discord_enabled: bool = True
+    discord_webhook_url: str = ''
+    webhook_enabled: bool = True
+    webhook_url: str = ''
+    watchlist_file: str = './watchlist.txt'
+    venue_gazetteer: str = ''  # 空なら出力先の venue_gazetteer.json（venue_gazetteer_path）
+    # 元データ
+    config: configparser.ConfigParser = field(default_factory=lambda: configparser.ConfigParser(interpolation=None))
+    config_path: str = 'config.ini'
+    jekyll_config_path: str = ''
+    # 読込時の (パス, mtime)。watch 時の変更検知に使用
+    sources: Tuple[Tuple[str, float], ...] = ()
+    generation: int = 0
+
+    def history_path(self, output_dir: Optional[str] = None) -> str:
+        """履歴ディレクトリ。未設定なら解析の出力先 (--output-dir) の下"""
+        return self.history_dir or os.path.join(output_dir or DEFAULT_OUTPUT_DIR, 'history')
+
+    def trend_stats_path(self, output_dir: Optional[str] = None) -> str:
+        """推移集計のヘッダファイル。未設定なら解析の出力先 (--output-dir) の下"""
+        return self.trend_stats_file or os.path.join(output_dir or DEFAULT_OUTPUT_DIR, 'trend_stats.json')
+
+    def venue_gazetteer_path(self, output_dir: Optional[str] = None) -> str:
+        """斎場の座標辞書（取得時に追記する側）。未設定なら解析の出力先 (--output-dir) の下"""
+        return self.venue_gazetteer or os.path.join(output_dir or DEFAULT_OUTPUT_DIR, 'venue_gazetteer.json')
+
+    def section(self, name: str) -> Dict[str, str]:
+        return dict(self.config[name]) if self.config.has_section(name) else {}
+
+    def changed(self) -> bool:
+        for path, mtime in self.sources:
+            if _mtime(path) != mtime:
+                return True
+        return False
+
+
+def _mtime(path: str) -> float:
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0.0
+
+
+def _read_jekyll_site(path: str) -> Tuple[str, str]:
+    """_config.yml のトップレベル url / baseurl"""
+    url_val, baseurl_val = '', ''
+    try:
+        with open(path, 'r', encoding='utf-8') as yf:
+            for line in yf:
+                m = re.match(r'(url|baseurl):\s*"?([^"\n#]*)"?', line)
+                if m:
+                    if m.group(1) == 'url':
+                        url_val = m.group(2).strip()
+                    else:
+                        baseurl_val = m.group(2).strip()
+    except OSError:
+        pass
+    return url_val, baseurl_val
+
+
+_GENERATION = 0
+
+
+def load_settings(config_path: Optional[str] = None) -> Settings:
+    """環境変数・config.ini・_config.yml を読んで Settings を作る（キャッシュしない）"""
+    global _GENERATION
+    config_path = config_path or _env('OKUYAMI_CONFIG') or 'config.ini'
+    cfg = configparser.ConfigParser(interpolation=None)
+    if os.path.exists(config_path):
+        try:
+            cfg.read(config_path, encoding='utf-8')
+        except Exception as e:
+            print(f"config.ini 読込失敗(既定値で継続): {e}")
+            cfg = configparser.ConfigParser(interpolation=None)
+
+    def ini(section: str, key: str, default: str = '') -> str:
+        return _unquote(cfg.get(section, key, fallback=default) or '')
+
+    def ini_bool(section: str, key: str, default: bool) -> bool:
+        try:
+            return cfg.getboolean(section, key, fallback=default)
+        except ValueError:
+            return default
+
+    s = Settings(config=cfg, config_path=config_path)
+    s.pages_repo = (_env('OKUYAMI_PAGES_REPO') or _env('GITHUB_PAGES_REPO')
+                    or os.path.expandvars(ini('github', 'repo_path'))
+                    or os.path.join(_BASE_DIR, 'okuyami-info'))
+    s.branch = ini('github', 'branch', 'main') or 'main'
+    s.pages_repo_slug = _env('OKUYAMI_PAGES_REPO_SLUG')
+    s.github_token = _env('OKUYAMI_GITHUB_TOKEN') or _env('GITHUB_TOKEN')
+    s.github_api_url = (_env('OKUYAMI_GITHUB_API_URL') or s.github_api_url).rstrip('/')
+    s.git_backend = (_env('OKUYAMI_GIT_BACKEND') or 'porcelain').lower()
+
+    s.auth_email = _env('OKUYAMI_EMAIL') or ini('auth', 'email')
+    s.auth_password = _env('OKUYAMI_PASSWORD') or ini('auth', 'password')
+    s.render_mode = (_env('OKUYAMI_RENDER_MODE') or 'inline').lower()
+    s.minify_html = _env('OKUYAMI_MINIFY_HTML').lower() in _TRUE
+    env_history = _env('OKUYAMI_HISTORY').lower()
+    s.history_enabled = env_history in _TRUE if env_history else ini_bool('history', 'enabled', True)
+    s.history_dir = _env('OKUYAMI_HISTORY_DIR') or ini('history', 'dir') or s.history_dir
+    s.history_format = (_env('OKUYAMI_HISTORY_FORMAT') or ini('history', 'format') or s.history_format).lower()
+    try:
+        s.dedup_window_days = int(_env('OKUYAMI_DEDUP_WINDOW') or ini('dedup', 'window_days') or s.dedup_window_days)
+    except ValueError:
+        print('警告: OKUYAMI_DEDUP_WINDOW / [dedup] window_days が数値ではありません')
+
+    s.publish_check = _env('OKUYAMI_PUBLISH_CHECK') or 'auto'
+    try:
+        s.publish_wait_seconds = int(_env('OKUYAMI_PUBLISH_WAIT_SECONDS') or 600)
+        s.publish_poll_interval = int(_env('OKUYAMI_PUBLISH_POLL_INTERVAL') or 15)
+    except ValueError:
+        print('警告: OKUYAMI_PUBLISH_WAIT_SECONDS / OKUYAMI_PUBLISH_POLL_INTERVAL が数値ではありません')
+
+    s.line_enabled = ini_bool('line_messaging', 'enabled', True)
+    s.line_token = _unquote(_env('LINE_MESSAGING_CHANNEL_ACCESS_TOKEN') or ini('line_messaging', 'channel_access_token'))
+    to_raw = _unquote(_env('LINE_MESSAGING_TO') or ini('line_messaging', 'to'))
+    s.line_recipients = [r.strip().strip('"') for r in to_raw.split(',') if r.strip()]
+    s.discord_enabled = ini_bool('discord', 'enabled', True)
+    s.discord_webhook_url = _unquote(_env('DISCORD_WEBHOOK_URL') or ini('discord', 'webhook_url'))
+    s.webhook_enabled = ini_bool('webhook', 'enabled', True)
+    s.webhook_url = _unquote(_env('OKUYAMI_WEBHOOK_URL') or ini('webhook', 'url'))
+    s.watchlist_file = _env('OKUYAMI_WATCHLIST') or ini('watchlist', 'file') or s.watchlist_file
+    s.venue_gazetteer = _env('OKUYAMI_VENUES') or ini('venues', 'file') or s.venue_gazetteer
+    s.trend_stats_file = _env('OKUYAMI_TRENDS') or ini('trends', 'file') or s.trend_stats_file
+    env_block = _env('OKUYAMI_ANOMALY_BLOCK').lower()
+    s.anomaly_block = env_block in _TRUE if env_block else ini_bool('anomaly', 'block', False)
+
+    # サイトURL: OKUYAMI_SITE_URL > Pages リポジトリ/_config.yml > スクリプト隣の okuyami-info/_config.yml
+    candidates = [os.path.join(s.pages_repo, '_config.yml'), os.path.join(_BASE_DIR, 'okuyami-info', '_config.yml')]
+    s.jekyll_config_path = next((p for p in candidates if os.path.exists(p)), candidates[0])
+    site = _env('OKUYAMI_SITE_URL')
+    if not site:
+        url_val, baseurl_val = _read_jekyll_site(s.jekyll_config_path)
+        if url_val:
+            site = url_val.rstrip('/') + ('/' + baseurl_val.strip('/') if baseurl_val.strip('/') else '')
+    s.site_url = (site or _DEF_SITE).rstrip('/')
+
+    s.sources = ((os.path.abspath(config_path), _mtime(config_path)),
+                 (os.path.abspath(s.jekyll_config_path), _mtime(s.jekyll_config_path)))
+    _GENERATION += 1
+    s.generation = _GENERATION
+    return s
+
+
+_lock = threading.Lock()
+_cached: Optional[Settings] = None
+
+
+def get_settings(*, watch: Optional[bool] = None) -> Settings:
+    """キャッシュ済み設定。watch=True (または OKUYAMI_SETTINGS_WATCH=1) ならファイル更新時に読み直す"""
+    global _cached
+    if watch is None:
+        watch = _env('OKUYAMI_SETTINGS_WATCH').lower() in _TRUE
+    with _lock:
+        if _cached is None or (watch and _cached.changed()):
+            _cached = load_settings()
+        return _cached
+
+
+def reset_settings() -> None:
+    """キャッシュを破棄（環境変数を変更した後などに使用）"""
+    global _cached
+    with _lock:
+        _cached = None
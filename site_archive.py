@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Pages リポジトリのアーカイブページ・マニフェストの差分更新
+- archives/manifest.json : 全投稿の軽量一覧 (日付, URL, 人数, 市町村別人数)
+- archives/YYYY-MM.md    : 月別アーカイブ (permalink /archives/YYYY/MM/)
+- archives/city/<slug>.md: 市町村別アーカイブ (permalink /archives/city/<slug>/)
+- archives/index.md      : 月・市町村の一覧
+公開のたびに全投稿を読み直すのではなく、マニフェストの該当日だけを差し替え、
+影響を受けた月・市町村のページのみ再生成する（内容が同じなら書き込まない）。
+人数は解析済みMarkdownと同名のCSV (csv モジュールで読込) から求める。
+"""
+from __future__ import annotations
+import csv
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+
+__all__ = ['ArchiveIndex', 'city_slug', 'read_city_counts', 'CITY_SLUGS']
+
+ARCHIVE_DIR = 'archives'
+MANIFEST_NAME = 'manifest.json'
+
+# 市町村名 → URL 用 ASCII スラッグ（山梨県27市町村）
+CITY_SLUGS: Dict[str, str] = {
+    '甲府市': 'kofu', '韮崎市': 'nirasaki', '北杜市': 'hokuto', '甲斐市': 'kai',
+    '南アルプス市': 'minami-alps', '中央市': 'chuo', '昭和町': 'showa',
+    '身延町': 'minobu', '南部町': 'nanbu', '富士川町': 'fujikawa', '早川町': 'hayakawa',
+    '山梨市': 'yamanashi', '笛吹市': 'fuefuki', '甲州市': 'koshu', '市川三郷町': 'ichikawamisato',
+    '富士吉田市': 'fujiyoshida', '富士河口湖町': 'fujikawaguchiko', '忍野村': 'oshino',
+    '山中湖村': 'yamanakako', '西桂町': 'nishikatsura', '道志村': 'doshi', '大月市': 'otsuki',
+    '上野原市': 'uenohara', '都留市': 'tsuru', '小菅村': 'kosuge', '丹波山村': 'tabayama',
+    '鳴沢村': 'narusawa',
+}
+
+
+def city_slug(city: str) -> str:
+    """既知の市町村は固定スラッグ、それ以外は名前のハッシュから生成"""
+    slug = CITY_SLUGS.get(city)
+    if slug:
+        return slug
+    return 'city-' + hashlib.sha1(city.encode('utf-8')).hexdigest()[:8]
+
+
+def read_city_counts(csv_path: str) -> Optional[Dict[str, int]]:
+    """解析済みCSVの市町村別人数。CSVが無い/読めない場合は None"""
+    if not csv_path or not os.path.exists(csv_path):
+        return None
+    counts: Dict[str, int] = {}
+    try:
+        with open(csv_path, 'r', encoding='utf-8-sig', newline='') as rf:
+            for row in csv.DictReader(rf):
+                city = (row.get('市町村') or '').strip() or '不明'
+                counts[city] = counts.get(city, 0) + 1
+    except Exception as e:
+        print(f"CSV読込失敗(アーカイブ人数なし): {e}")
+        return None
+    return counts
+
+
+def post_url(dt: datetime) -> str:
+    """サイト内相対URL (_config.yml の posts permalink /:collection/:year/:month/:day/:title/)"""
+    return f"/posts/{dt.strftime('%Y/%m/%d')}/okuyami-info/"
+
+
+class ArchiveIndex:
+    def __init__(self, repo_path: str):
+        self.repo_path = repo_path
+        self.base_dir = os.path.join(repo_path, ARCHIVE_DIR)
+        self.manifest_path = os.path.join(self.base_dir, MANIFEST_NAME)
+        self.posts: Dict[str, dict] = self._load()
+        self._dirty_months: Set[str] = set()
+        self._dirty_cities: Set[str] = set()
+        self._manifest_dirty = False
+
+    def _load(self) -> Dict[str, dict]:
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as rf:
+                data = json.load(rf)
+            posts = data.get('posts', {}) if isinstance(data, dict) else {}
+            return {k: v for k, v in posts.items() if isinstance(v, dict)}
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"マニフェスト読込失敗(空として再作成): {e}")
+            return {}
+
+    def record(self, dt: datetime, title: str, city_counts: Optional[Dict[str, int]], note: str = '') -> None:
+        """1日分の投稿を登録。変化があれば該当月・新旧の市町村を更新対象にする"""
+        key = dt.strftime('%Y-%m-%d')
+        cities = dict(sorted((city_counts or {}).items()))
+        entry = {
+            'url': post_url(dt),
+            'title': title,
+            'total': sum(cities.values()),
+            'cities': cities,
+        }
+        if note:
+            entry['note'] = note
+        old = self.posts.get(key)
+        if old == entry:
+            return
+        self.posts[key] = entry
+        self._manifest_dirty = True
+        self._dirty_months.add(key[:7])
+        self._dirty_cities.update(cities)
+        if old:
+            self._dirty_cities.update(old.get('cities', {}))
+
+    # --- 出力 ---
+    def _write_if_changed(self, path: str, content: str, written: List[str]) -> None:
+        try:
+            with open(path, 'r', encoding='utf-8') as rf:
+                if rf.read() == content:
+                    return
+        except OSError:
+            pass
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8', newline='\n') as wf:
+            wf.write(content)
+        written.append(path)
+
+    @staticmethod
+    def _front(title: str, permalink: str) -> str:
+        return f'---\nlayout: page\ntitle: "{title}"\npermalink: {permalink}\n---\n\n'
+
+    @staticmethod
+    def _link(label: str, url: str) -> str:
+        return f"[{label}]({{{{ '{url}' | relative_url }}}})"
+
+    def _month_page(self, month: str) -> str:
+        year, mon = month.split('-')
+        lines = [self._front(f'お悔やみ情報 {year}年{mon}月', f'/archives/{year}/{mon}/')]
+        lines.append('| 日付 | 人数 | 市町村 |\n|---|---:|---|\n')
+        for key in sorted((k for k in self.posts if k.startswith(month)), reverse=True):
+            e = self.posts[key]
+            d = datetime.strptime(key, '%Y-%m-%d')
+            cities = '、'.join(self._link(f'{c}({n})', f'/archives/city/{city_slug(c)}/')
+                              for c, n in e.get('cities', {}).items())
+            total = e.get('note') or f"{e.get('total', 0)}名"
+            lines.append(f"| {self._link(d.strftime('%Y年%m月%d日'), e['url'])} | {total} | {cities} |\n")
+        lines.append(f"\n{self._link('アーカイブ一覧へ', '/archives/')}\n")
+        return ''.join(lines)
+
+    def _city_page(self, city: str) -> str:
+        lines = [self._front(f'お悔やみ情報 {city}', f'/archives/city/{city_slug(city)}/')]
+        year = ''
+        for key in sorted((k for k, e in self.posts.items() if city in e.get('cities', {})), reverse=True):
+            if key[:4] != year:
+                lines.append(('\n' if year else '') + f'## {key[:4]}年\n\n')
+                year = key[:4]
+            d = datetime.strptime(key, '%Y-%m-%d')
+            n = self.posts[key]['cities'][city]
+            lines.append(f"- {self._link(d.strftime('%m月%d日'), self.posts[key]['url'])} {n}名\n")
+        lines.append(f"\n{self._link('アーカイブ一覧へ', '/archives/')}\n")
+        return ''.join(lines)
+
+    def _index_page(self) -> str:
+        months: Dict[str, int] = {}
+        cities: Dict[str, int] = {}
+        for key, e in self.posts.items():
+            months[key[:7]] = months.get(key[:7], 0) + int(e.get('total', 0))
+            for c, n in e.get('cities', {}).items():
+                cities[c] = cities.get(c, 0) + int(n)
+        lines = [self._front('お悔やみ情報 アーカイブ', '/archives/'), '## 月別\n']
+        year = ''
+        for month in sorted(months, reverse=True):
+            y, m = month.split('-')
+            if y != year:
+                year = y
+                lines.append(f'\n### {y}年\n\n')
+            lines.append(f"- {self._link(f'{m}月', f'/archives/{y}/{m}/')} {months[month]}名\n")
+        lines.append('\n## 市町村別\n\n')
+        for c in sorted(cities, key=lambda c: (-cities[c], c)):
+            lines.append(f"- {self._link(c, f'/archives/city/{city_slug(c)}/')} {cities[c]}名\n")
+        return ''.join(lines)
+
+    def _manifest(self) -> str:
+        data = {
+            'generated': datetime.now().strftime('%Y-%m-%d'),
+            'count': len(self.posts),
+            'posts': dict(sorted(self.posts.items())),
+        }
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+    def flush(self) -> List[str]:
+        """変更があったファイルのパスを返す（コミット対象）"""
+        written: List[str] = []
+        if not self._manifest_dirty:
+            return written
+        for month in sorted(self._dirty_months):
+            self._write_if_changed(os.path.join(self.base_dir, f'{month}.md'), self._month_page(month), written)
+        for city in sorted(self._dirty_cities):
+            self._write_if_changed(os.path.join(self.base_dir, 'city', f'{city_slug(city)}.md'),
+                                   self._city_page(city), written)
+        self._write_if_changed(os.path.join(self.base_dir, 'index.md'), self._index_page(), written)
+        self._write_if_changed(self.manifest_path, self._manifest(), written)
+        self._dirty_months.clear()
+        self._dirty_cities.clear()
+        self._manifest_dirty = False
+        return written
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""起動時間 (import 時間) の回帰チェック
+各スクリプトを `python -X importtime -c "import <module>"` で新しいプロセスに読み込み、
+stderr の累積時間 (cumulative) から自モジュールの import 時間を求めて予算と比較する。
+あわせて、起動時に読み込んではいけない重い依存 (pandas / selenium / requests / jinja2 / openpyxl)
+が import されていないかを確認する。予算超過・禁止依存の読み込みがあれば終了コード 1。
+
+例:
+  python tools/bench_importtime.py
+  python tools/bench_importtime.py --runs 5 --budget-ms 150 --verbose
+"""
+from __future__ import annotations
+import argparse
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = (
+    'selenium_okuyami_scraper',
+    'parse_and_format_obituary',
+    'upload_to_github_pages',
+    'send_line_stats',
+)
+# 起動時に読み込まれてはならないトップレベルパッケージ
+HEAVY = ('pandas', 'numpy', 'selenium', 'requests', 'jinja2', 'openpyxl')
+
+# "import time: self [us] | cumulative | imported package"
+_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def measure(module: str) -> Tuple[float, List[str]]:
+    """(自モジュールの累積 import 時間 ms, 読み込まれた重い依存) を返す"""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                          cwd=ROOT, capture_output=True, text=True, encoding='utf-8', env=env)
+    if proc.returncode != 0:
+        raise RuntimeError(f'{module} の import に失敗: {proc.stderr.strip().splitlines()[-1:]}')
+    total_us = 0
+    heavy = set()
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if not m:
+            continue
+        name = m.group(4)
+        top = name.split('.', 1)[0]
+        if top in HEAVY:
+            heavy.add(top)
+        if name == module:
+            total_us = int(m.group(2))
+    return total_us / 1000.0, sorted(heavy)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description='スクリプトの import 時間を予算と比較')
+    ap.add_argument('--runs', type=int, default=3, help='各モジュールの計測回数（最小値を採用）')
+    ap.add_argument('--budget-ms', type=float, default=200.0, help='1モジュールあたりの予算 (ms)')
+    ap.add_argument('--module', action='append', help='対象モジュール（複数指定可。既定: 4スクリプト）')
+    ap.add_argument('--allow-heavy', action='store_true', help='重い依存の読み込みを失敗扱いにしない')
+    ap.add_argument('--verbose', action='store_true')
+    args = ap.parse_args()
+
+    failed = False
+    results: Dict[str, Tuple[float, List[str]]] = {}
+    for module in args.module or MODULES:
+        best = None
+        heavy: List[str] = []
+        for _ in range(max(1, args.runs)):
+            try:
+                ms, heavy = measure(module)
+            except RuntimeError as e:
+                print(f'NG  {module}: {e}')
+                failed = True
+                break
+            best = ms if best is None else min(best, ms)
+        if best is None:
+            continue
+        results[module] = (best, heavy)
+        over = best > args.budget_ms
+        bad_heavy = heavy and not args.allow_heavy
+        status = 'NG ' if over or bad_heavy else 'OK '
+        failed = failed or over or bool(bad_heavy)
+        note = f'  重い依存: {", ".join(heavy)}' if heavy else ''
+        print(f'{status} {module:<28} {best:8.1f} ms (予算 {args.budget_ms:.0f} ms){note}')
+    if args.verbose:
+        print(f'python: {sys.version.split()[0]}, runs: {args.runs}')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""解析 (parse_and_format_obituary) のベンチマークと回帰確認
+raw_html/ に保存された記事の innerHTML をスクレイパーと同じ手順 (restore_layout → filter_okuyami_text)
+で解析入力に変換し、コーパス tools/parser_corpus/ とゴールデンCSV (golden/) を作る。
+
+  corpus : raw_html/article_<id>_inner.html → parser_corpus/okuyami_YYYYMMDD.txt
+  golden : 現在のエンジンの解析結果を golden/okuyami_YYYYMMDD.csv に記録（意図した変更の後に更新）
+  check  : 解析結果をゴールデンCSVと比較（差分があれば終了コード 1）
+  bench  : コーパスと合成文書（--sizes 人数）で処理速度 (records/s) と tracemalloc のピークメモリを計測。
+           1件あたりの時間が規模に対して大きく伸びる（超線形）場合は警告
+  synth  : コーパスの人物行を組み合わせた大規模な合成文書を出力
+
+エンジンは ENGINES に登録（新しい解析方式を追加したら並べて比較できる）。--engine module:function でも指定可。
+function(path) は parse_file と同じくレコード(dict)のリストを返すこと。
+
+例:
+  python tools/bench_parser.py corpus
+  python tools/bench_parser.py check
+  python tools/bench_parser.py bench --sizes 1000,10000
+  python tools/bench_parser.py synth --persons 10000 -o big.txt
+"""
+from __future__ import annotations
+import argparse
+import contextlib
+import csv
+import glob
+import importlib
+import io
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from parse_and_format_obituary import OkuyamiParser  # noqa: E402
+from selenium_okuyami_scraper import filter_okuyami_text, format_article, restore_layout  # noqa: E402
+
+RAW_DIR = os.path.join(ROOT, 'raw_html')
+CORPUS_DIR = os.path.join(ROOT, 'tools', 'parser_corpus')
+GOLDEN_DIR = os.path.join(CORPUS_DIR, 'golden')
+COLUMNS = ['地域', '市町村', '氏名', 'ふりがな', '住所', '死亡日', '年齢',
+           '職歴・属性', '喪主', '関係者', '通夜', '告別式', '会場']
+
+Engine = Callable[[str], List[dict]]
+
+
+def _current_engine(path: str) -> List[dict]:
+    return OkuyamiParser().parse_file(path)
+
+
+ENGINES: Dict[str, Engine] = {
+    'current': _current_engine,
+}
+
+
+def resolve_engine(spec: str) -> Engine:
+    if spec in ENGINES:
+        return ENGINES[spec]
+    module, sep, func = spec.partition(':')
+    if not sep:
+        raise SystemExit(f'未知のエンジン: {spec} (登録済み: {", ".join(ENGINES)} / module:function)')
+    return getattr(importlib.import_module(module), func)
+
+
+# --- コーパス ---
+
+def _article_date(page_path: str) -> Optional[str]:
+    """保存したページ全体HTMLの記事URL (/article/YYYY/MM/DD/<id>) から掲載日"""
+    try:
+        with open(page_path, 'r', encoding='utf-8') as rf:
+            m = re.search(r'/article/(\d{4})/(\d{2})/(\d{2})/\d+', rf.read())
+    except OSError:
+        return None
+    return f'{m.group(1)}-{m.group(2)}-{m.group(3)}' if m else None
+
+
+def build_corpus(raw_dir: str = RAW_DIR, out_dir: str = CORPUS_DIR) -> List[str]:
+    os.makedirs(out_dir, exist_ok=True)
+    written = []
+    for inner in sorted(glob.glob(os.path.join(raw_dir, 'article_*_inner.html'))):
+        article_id = os.path.basename(inner)[len('article_'):-len('_inner.html')]
+        date = _article_date(os.path.join(raw_dir, f'article_{article_id}.html'))
+        if not date:
+            print(f'スキップ (掲載日不明): {inner}')
+            continue
+        with open(inner, 'r', encoding='utf-8') as rf:
+            with contextlib.redirect_stdout(io.StringIO()):
+                content = filter_okuyami_text(restore_layout(rf.read()))
+        m, d = int(date[5:7]), int(date[8:10])
+        title = f'おくやみ（{m}月{d}日付）'
+        path = os.path.join(out_dir, f"okuyami_{date.replace('-', '')}.txt")
+        with open(path, 'w', encoding='utf-8', newline='\n') as wf:
+            wf.write(format_article(content, date, title, fetched_at=f'{date} 00:00:00'))
+        written.append(path)
+    return written
+
+
+def corpus_files(corpus_dir: str = CORPUS_DIR) -> List[str]:
+    return sorted(glob.glob(os.path.join(corpus_dir, 'okuyami_*.txt')))
+
+
+def _golden_path(path: str) -> str:
+    return os.path.join(GOLDEN_DIR, os.path.splitext(os.path.basename(path))[0] + '.csv')
+
+
+def _rows(records: List[dict]) -> List[List[str]]:
+    return [['' if r.get(c) is None else str(r.get(c)) for c in COLUMNS] for r in records]
+
+
+def _parse_quiet(engine: Engine, path: str) -> List[dict]:
+    with contextlib.redirect_stdout(io.StringIO()):
+        return engine(path)
+
+
+def write_golden(engine: Engine) -> None:
+    os.makedirs(GOLDEN_DIR, exist_ok=True)
+    for path in corpus_files():
+        rows = _rows(_parse_quiet(engine, path))
+        with open(_golden_path(path), 'w', encoding='utf-8', newline='') as wf:
+            w = csv.writer(wf, lineterminator='\n')
+            w.writerow(COLUMNS)
+            w.writerows(rows)
+        print(f'{os.path.basename(_golden_path(path))}: {len(rows)}件')
+
+
+def check_golden(engine: Engine, verbose: bool = False) -> int:
+    failed = 0
+    for path in corpus_files():
+        golden = _golden_path(path)
+        if not os.path.exists(golden):
+            print(f'NG  {os.path.basename(path)}: ゴールデンCSVがありません (golden を実行)')
+            failed += 1
+            continue
+        with open(golden, 'r', encoding='utf-8', newline='') as rf:
+            expected = list(csv.reader(rf))[1:]
+        actual = _rows(_parse_quiet(engine, path))
+        if actual == expected:
+            print(f'OK  {os.path.basename(path)}: {len(actual)}件')
+            continue
+        failed += 1
+        print(f'NG  {os.path.basename(path)}: 件数 {len(expected)} → {len(actual)}')
+        shown = 0
+        for i, (exp, act) in enumerate(zip(expected, actual)):
+            for col, e, a in zip(COLUMNS, exp, act):
+                if e != a and (verbose or shown < 5):
+                    print(f'    [{i}] {col}: {e!r} → {a!r}')
+                    shown += 1
+    return 1 if failed else 0
+
+
+# --- 合成文書 ---
+
+def _corpus_people() -> List[str]:
+    people = []
+    for path in corpus_files():
+        with open(path, 'r', encoding='utf-8') as rf:
+            people.extend(ln.rstrip('\n') for ln in rf if 'さん（' in ln and not ln.startswith(('■', '◇')))
+    if not people:
+        raise SystemExit('コーパスがありません (corpus を実行)')
+    return people
+
+
+def synth_document(persons: int, seed: int = 0, people: Optional[List[str]] = None) -> str:
+    """persons 人分の文書。地域/市町村見出しは紙面の並びで、人物行はコーパスの行を氏名を変えて再利用"""
+    rng = random.Random(seed)
+    people = people or _corpus_people()
+    regions: Dict[str, List[str]] = {}
+    for city, region in OkuyamiParser().city_region_map.items():
+        regions.setdefault(region, []).append(city)
+    cities = [(region, city) for region, cs in regions.items() for city in cs]
+    per_city = [persons // len(cities) + (1 if i < persons % len(cities) else 0) for i in range(len(cities))]
+    name_re = re.compile(r'^([^さ（]{2,8})さん（')
+    given = [m.group(1)[2:] for m in map(name_re.match, people) if m and len(m.group(1)) > 2] or ['太郎']
+    lines = []
+    current_region = None
+    for (region, city), n in zip(cities, per_city):
+        if n == 0:
+            continue
+        if region != current_region:
+            lines.append(f'■ {region} ■')
+            current_region = region
+        if region != '甲 府':
+            lines.append(f'◇{city}')
+        for _ in range(n):
+            line = rng.choice(people)
+            m = name_re.match(line)
+            if m:
+                line = m.group(1)[:2] + rng.choice(given) + line[m.end(1):]
+            lines.append(line)
+    return format_article('\n'.join(lines), '2025-08-01', 'おくやみ（8月1日付）', fetched_at='2025-08-01 00:00:00')
+
+
+# --- 計測 ---
+
+def _time_parse(engine: Engine, paths: List[str], runs: int) -> Tuple[float, int]:
+    best = None
+    records = 0
+    for _ in range(max(1, runs)):
+        start = time.perf_counter()
+        records = sum(len(_parse_quiet(engine, p)) for p in paths)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best or 0.0, records
+
+
+def _peak_memory(engine: Engine, paths: List[str]) -> int:
+    tracemalloc.start()
+    try:
+        for p in paths:
+            _parse_quiet(engine, p)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench(engine_names: List[str], sizes: List[int], runs: int) -> int:
+    workdir = tempfile.mkdtemp(prefix='okuyami_bench_')
+    people = _corpus_people()
+    cases: List[Tuple[str, List[str], int]] = [('corpus', corpus_files(), 0)]
+    for n in sizes:
+        path = os.path.join(workdir, f'okuyami_synth_{n}.txt')
+        with open(path, 'w', encoding='utf-8') as wf:
+            wf.write(synth_document(n, people=people))
+        cases.append((f'synth-{n}', [path], n))
+    status = 0
+    print(f'{"engine":<10} {"case":<12} {"records":>8} {"sec":>8} {"rec/s":>10} {"us/rec":>8} {"peak MiB":>9}')
+    for name in engine_names:
+        engine = resolve_engine(name)
+        per_record: List[Tuple[int, float]] = []
+        for label, paths, n in cases:
+            sec, records = _time_parse(engine, paths, runs)
+            peak = _peak_memory(engine, paths)
+            rate = records / sec if sec > 0 else 0.0
+            us = sec / records * 1e6 if records else 0.0
+            print(f'{name:<10} {label:<12} {records:>8} {sec:>8.3f} {rate:>10.0f} {us:>8.1f} {peak / 2**20:>9.2f}')
+            if n and records:
+                per_record.append((n, us))
+                if records != n:
+                    print(f'  警告: 合成 {n} 人に対し {records} 件')
+        # 規模に対する1件あたり時間の伸び（線形なら ~1.0）
+        if len(per_record) >= 2:
+            (n0, us0), (n1, us1) = per_record[0], per_record[-1]
+            growth = us1 / us0 if us0 else 0.0
+            note = '  ← 超線形の疑い' if growth > 2.0 else ''
+            print(f'  {name}: 1件あたり時間 {n0}人→{n1}人 ×{growth:.2f}{note}')
+            if growth > 2.0:
+                status = 1
+    return status
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description='解析のベンチマーク・ゴールデン回帰確認')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    sub.add_parser('corpus', help='raw_html からコーパスを生成')
+    g = sub.add_parser('golden', help='ゴールデンCSVを記録')
+    g.add_argument('--engine', default='current')
+    c = sub.add_parser('check', help='ゴールデンCSVと比較')
+    c.add_argument('--engine', default='current')
+    c.add_argument('--verbose', action='store_true')
+    b = sub.add_parser('bench', help='速度・メモリ計測')
+    b.add_argument('--engine', action='append', help='エンジン（複数指定可。既定: 登録済み全て）')
+    b.add_argument('--sizes', default='1000,10000', help='合成文書の人数 (カンマ区切り)')
+    b.add_argument('--runs', type=int, default=3)
+    s = sub.add_parser('synth', help='合成文書を出力')
+    s.add_argument('--persons', type=int, default=10000)
+    s.add_argument('--seed', type=int, default=0)
+    s.add_argument('-o', '--output', required=True)
+    args = ap.parse_args()
+
+    if args.cmd == 'corpus':
+        for path in build_corpus():
+            print(os.path.relpath(path, ROOT))
+        return 0
+    if args.cmd == 'golden':
+        write_golden(resolve_engine(args.engine))
+        return 0
+    if args.cmd == 'check':
+        return check_golden(resolve_engine(args.engine), args.verbose)
+    if args.cmd == 'bench':
+        sizes = [int(x) for x in args.sizes.split(',') if x.strip()]
+        return bench(args.engine or list(ENGINES), sizes, args.runs)
+    with open(args.output, 'w', encoding='utf-8') as wf:
+        wf.write(synth_document(args.persons, args.seed))
+    print(f'{args.output}: {args.persons}人')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
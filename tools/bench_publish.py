@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""公開 (commit + push) レイテンシのベンチマーク
+一時ディレクトリにローカル bare リポジトリと作業クローンを作り、
+upload_to_github_pages.GitHubPagesUploader.commit_paths を porcelain / plumbing の両方式で
+--runs 回ずつ実行して所要時間を比較する。ネットワークには接続しない。
+- 変更あり: 毎回ファイルを書き換えて公開
+- 変更なし: 書き換えずに再実行（当日分の再公開・リトライに相当）
+終了時に作業ツリーが clean で、コミット内容が git add と同じ（フィルタ・改行変換済み）かを確認する。
+
+例:
+  python tools/bench_publish.py --runs 20 --files 2
+  python tools/bench_publish.py --runs 20 --autocrlf     # core.autocrlf=true + CRLF の投稿
+"""
+from __future__ import annotations
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from upload_to_github_pages import GitHubPagesUploader  # noqa: E402
+
+
+def _git(cwd: str, *args: str) -> None:
+    subprocess.run(['git', *args], cwd=cwd, check=True, capture_output=True)
+
+
+def _setup(base: str, name: str, autocrlf: bool) -> str:
+    bare = os.path.join(base, f'{name}.git')
+    work = os.path.join(base, name)
+    _git(base, 'init', '--bare', '-b', 'main', bare)
+    _git(base, 'clone', bare, work)
+    _git(work, 'config', 'user.name', 'bench')
+    _git(work, 'config', 'user.email', 'bench@example.invalid')
+    if autocrlf:
+        _git(work, 'config', 'core.autocrlf', 'true')
+    _git(work, 'checkout', '-b', 'main')
+    os.makedirs(os.path.join(work, '_posts'), exist_ok=True)
+    with open(os.path.join(work, 'index.md'), 'w', encoding='utf-8') as wf:
+        wf.write('# bench\n')
+    _git(work, 'add', 'index.md')
+    _git(work, 'commit', '-m', 'init')
+    _git(work, 'push', '-u', 'origin', 'main')
+    return work
+
+
+def _publish(uploader: GitHubPagesUploader, paths: list, message: str) -> float:
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        ok = uploader.commit_paths(paths, message)
+    elapsed = time.perf_counter() - start
+    if not ok:
+        raise SystemExit(f'{message}: 公開に失敗しました')
+    return elapsed
+
+
+def _verify(work: str, backend: str) -> None:
+    """作業ツリーが clean で、HEAD の内容が git add の結果と一致すること"""
+    status = subprocess.run(['git', 'status', '--porcelain'], cwd=work, capture_output=True, text=True).stdout
+    staged = subprocess.run(['git', 'diff', 'HEAD', '--quiet'], cwd=work).returncode
+    if status.strip() or staged != 0:
+        raise SystemExit(f'{backend}: コミット内容が作業ツリーと一致しません\n{status}')
+
+
+def _summary(label: str, timings: list) -> str:
+    return (f'{label:10s} mean={statistics.mean(timings) * 1000:7.1f}ms '
+            f'median={statistics.median(timings) * 1000:7.1f}ms max={max(timings) * 1000:7.1f}ms')
+
+
+def _run(backend: str, base: str, runs: int, files: int, autocrlf: bool) -> dict:
+    work = _setup(base, backend, autocrlf)
+    uploader = GitHubPagesUploader(work, 'main', backend)
+    newline = '\r\n' if autocrlf else '\n'
+    changed, unchanged = [], []
+    for i in range(runs):
+        paths = []
+        for j in range(files):
+            path = os.path.join(work, '_posts', f'2025-01-{j + 1:02d}-okuyami.md')
+            with open(path, 'w', encoding='utf-8', newline=newline) as wf:
+                wf.write(f'---\ntitle: bench {i}\n---\n\n' + ('| 氏名 | 年齢 |\n' * 200) + f'{i}\n')
+            paths.append(path)
+        changed.append(_publish(uploader, paths, f'bench {backend} {i}'))
+        unchanged.append(_publish(uploader, paths, f'bench {backend} {i} (unchanged)'))
+    _verify(work, backend)
+    log = subprocess.run(['git', 'rev-list', '--count', 'main'], cwd=work, capture_output=True, text=True)
+    print(f'{backend} (commits={log.stdout.strip()})')
+    print('  ' + _summary('変更あり', changed))
+    print('  ' + _summary('変更なし', unchanged))
+    return {'changed': changed, 'unchanged': unchanged}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Pages 公開レイテンシ比較 (porcelain vs plumbing)')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--files', type=int, default=2, help='1回の公開で更新するファイル数')
+    parser.add_argument('--autocrlf', action='store_true', help='core.autocrlf=true で CRLF の投稿を公開')
+    parser.add_argument('--keep', action='store_true', help='一時リポジトリを削除しない')
+    args = parser.parse_args()
+    base = tempfile.mkdtemp(prefix='okuyami-bench-')
+    try:
+        results = {b: _run(b, base, args.runs, args.files, args.autocrlf) for b in ('porcelain', 'plumbing')}
+        for kind, label in (('changed', '変更あり'), ('unchanged', '変更なし')):
+            ratio = (statistics.median(results['porcelain'][kind])
+                     / max(statistics.median(results['plumbing'][kind]), 1e-9))
+            print(f'{label}: plumbing は porcelain の {ratio:.2f} 倍速 (median)')
+    finally:
+        if args.keep:
+            print(f'作業ディレクトリ: {base}')
+        else:
+            shutil.rmtree(base, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
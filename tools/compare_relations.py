@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""解析結果 (喪主・関係者など) の新旧比較
+_extract_relatives / _extract_chief_mourner 等を変更したときに、過去の全日分を
+旧版 (git リビジョン) と新版 (作業ツリー、または別リビジョン) で解析して列ごとの差分を集計する。
+
+- 旧版は `git archive <rev>` で一時ディレクトリに展開し、依存モジュールも同じリビジョンのものを使う
+- 版ごとに spawn のワーカープロセス群を立て、ファイルをまとめて並列に解析（モジュール名の衝突なし）
+- レコードは (日付, 氏名, 住所) のハッシュキーで突き合わせ（同一キーは出現順で区別）
+- 列ごとの変更件数・割合と例を表示。--json で機械可読出力
+
+例:
+  python tools/compare_relations.py                      # HEAD と作業ツリー
+  python tools/compare_relations.py --old HEAD~3 --fields 喪主,関係者 --examples 10
+  python tools/compare_relations.py --inputs "okuyami_data/okuyami_2024*.txt"
+"""
+from __future__ import annotations
+import argparse
+import contextlib
+import glob
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import re
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COLUMNS = ('地域', '市町村', '氏名', 'ふりがな', '住所', '死亡日', '年齢',
+           '職歴・属性', '喪主', '関係者', '通夜', '告別式', '会場')
+KEY_FIELDS = ('氏名', '住所')
+DEFAULT_INPUTS = (
+    os.path.join(ROOT, 'okuyami_data', 'okuyami_*.txt'),
+    os.path.join(ROOT, 'tools', 'parser_corpus', 'okuyami_*.txt'),
+)
+_DATE_RE = re.compile(r'okuyami_(\d{8})')
+
+Row = Tuple[str, ...]
+
+# --- ワーカー側（版ごとのプロセスで parse_and_format_obituary を読み込む） ---
+_PARSER_MODULE = None
+
+
+def _init_worker(src_dir: str) -> None:
+    global _PARSER_MODULE
+    sys.path.insert(0, src_dir)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import parse_and_format_obituary
+    _PARSER_MODULE = parse_and_format_obituary
+
+
+def _parse_batch(paths: List[str]) -> List[Tuple[str, List[Row]]]:
+    out = []
+    for path in paths:
+        with contextlib.redirect_stdout(io.StringIO()):
+            try:
+                records = _PARSER_MODULE.OkuyamiParser().parse_file(path)  # type: ignore[union-attr]
+            except Exception:
+                records = []
+        out.append((path, [tuple('' if r.get(c) is None else str(r.get(c)) for c in COLUMNS) for r in records]))
+    return out
+
+
+# --- 親プロセス側 ---
+
+def export_revision(rev: str, dest: str) -> str:
+    """git archive で rev の *.py を dest に展開"""
+    proc = subprocess.run(['git', 'archive', '--format=tar', rev, '--', '*.py'],
+                          cwd=ROOT, capture_output=True)
+    if proc.returncode != 0:
+        raise SystemExit(f'git archive {rev} に失敗: {proc.stderr.decode("utf-8", "replace").strip()}')
+    with tarfile.open(fileobj=io.BytesIO(proc.stdout)) as tf:
+        tf.extractall(dest)
+    return dest
+
+
+def _source_dir(spec: str, tmp: str, label: str) -> str:
+    if spec in ('.', 'WORKTREE'):
+        return ROOT
+    return export_revision(spec, os.path.join(tmp, label))
+
+
+def parse_all(src_dir: str, paths: List[str], workers: int, chunk: int) -> Dict[str, List[Row]]:
+    ctx = multiprocessing.get_context('spawn')
+    batches = [paths[i:i + chunk] for i in range(0, len(paths), chunk)]
+    result: Dict[str, List[Row]] = {}
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                             initializer=_init_worker, initargs=(src_dir,)) as pool:
+        for part in pool.map(_parse_batch, batches):
+            result.update(part)
+    return result
+
+
+def _key(date: str, row: Row, occurrence: int) -> bytes:
+    h = hashlib.blake2b(digest_size=12)
+    h.update(date.encode('utf-8'))
+    for f in KEY_FIELDS:
+        h.update(b'\x00' + row[COLUMNS.index(f)].encode('utf-8'))
+    h.update(b'\x00' + str(occurrence).encode('ascii'))
+    return h.digest()
+
+
+def index_rows(parsed: Dict[str, List[Row]]) -> Dict[bytes, Tuple[str, Row]]:
+    index: Dict[bytes, Tuple[str, Row]] = {}
+    for path, rows in parsed.items():
+        m = _DATE_RE.search(os.path.basename(path))
+        date = m.group(1) if m else os.path.basename(path)
+        seen: Counter = Counter()
+        for row in rows:
+            base = tuple(row[COLUMNS.index(f)] for f in KEY_FIELDS)
+            index[_key(date, row, seen[base])] = (date, row)
+            seen[base] += 1
+    return index
+
+
+def compare(old: Dict[bytes, Tuple[str, Row]], new: Dict[bytes, Tuple[str, Row]],
+            fields: List[str], max_examples: int) -> dict:
+    common = old.keys() & new.keys()
+    stats = {f: 0 for f in fields}
+    examples: Dict[str, List[dict]] = {f: [] for f in fields}
+    idx = [(f, COLUMNS.index(f)) for f in fields]
+    for k in sorted(common, key=lambda k: (old[k][0], k)):
+        date, orow = old[k]
+        nrow = new[k][1]
+        if orow == nrow:
+            continue
+        for f, i in idx:
+            if orow[i] != nrow[i]:
+                stats[f] += 1
+                if len(examples[f]) < max_examples:
+                    examples[f].append({'date': date, '氏名': orow[COLUMNS.index('氏名')],
+                                        'old': orow[i], 'new': nrow[i]})
+
+    def _ids(keys, side):
+        return sorted(f'{side[k][0]} {side[k][1][COLUMNS.index("氏名")]}' for k in keys)
+
+    only_old = old.keys() - new.keys()
+    only_new = new.keys() - old.keys()
+    return {
+        'matched': len(common),
+        'only_old': len(only_old),
+        'only_new': len(only_new),
+        'only_old_examples': _ids(only_old, old)[:max_examples],
+        'only_new_examples': _ids(only_new, new)[:max_examples],
+        'fields': {f: {'changed': stats[f], 'ratio': stats[f] / len(common) if common else 0.0,
+                       'examples': examples[f]} for f in fields},
+    }
+
+
+def _print_report(report: dict, timing: Dict[str, float]) -> None:
+    print(f"突き合わせ: {report['matched']}件 / 旧のみ: {report['only_old']}件 / 新のみ: {report['only_new']}件")
+    for label, key in (('旧のみ', 'only_old_examples'), ('新のみ', 'only_new_examples')):
+        for ex in report[key]:
+            print(f'  {label}: {ex}')
+    print(f'{"列":<8} {"変更":>7} {"割合":>8}')
+    for f, st in report['fields'].items():
+        print(f'{f:<8} {st["changed"]:>7} {st["ratio"]:>8.2%}')
+    for f, st in report['fields'].items():
+        if not st['examples']:
+            continue
+        print(f'\n[{f}]')
+        for ex in st['examples']:
+            print(f"  {ex['date']} {ex['氏名']}: {ex['old']!r}")
+            print(f"  {'':8} → {ex['new']!r}")
+    print('\n' + ', '.join(f'{k} {v:.2f}s' for k, v in timing.items()))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description='解析結果の新旧比較（列ごとの差分集計）')
+    ap.add_argument('--old', default='HEAD', help='旧版の git リビジョン (既定: HEAD)')
+    ap.add_argument('--new', default='.', help='新版: . (作業ツリー, 既定) または git リビジョン')
+    ap.add_argument('--inputs', action='append', help='入力 glob (複数可。既定: okuyami_data と tools/parser_corpus)')
+    ap.add_argument('--fields', default='喪主,関係者', help='比較する列 (カンマ区切り。all で全列)')
+    ap.add_argument('--examples', type=int, default=5, help='列ごとの表示例数')
+    ap.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) // 2), help='版ごとのワーカー数')
+    ap.add_argument('--chunk', type=int, default=64, help='1タスクあたりのファイル数')
+    ap.add_argument('--json', metavar='PATH', help='集計結果を JSON で保存')
+    args = ap.parse_args(argv)
+
+    fields = list(COLUMNS) if args.fields == 'all' else [f.strip() for f in args.fields.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in COLUMNS]
+    if unknown:
+        print(f'エラー: 未知の列 {unknown}')
+        return 2
+    paths = sorted({p for pattern in (args.inputs or DEFAULT_INPUTS) for p in glob.glob(pattern)})
+    if not paths:
+        print('入力ファイルがありません')
+        return 1
+
+    timing: Dict[str, float] = {}
+    with tempfile.TemporaryDirectory(prefix='okuyami_cmp_') as tmp:
+        t0 = time.perf_counter()
+        old_dir = _source_dir(args.old, tmp, 'old')
+        new_dir = _source_dir(args.new, tmp, 'new')
+        timing['展開'] = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        # 新旧のプールを同時に走らせる
+        with ThreadPoolExecutor(max_workers=2) as tp:
+            f_old = tp.submit(parse_all, old_dir, paths, args.workers, args.chunk)
+            f_new = tp.submit(parse_all, new_dir, paths, args.workers, args.chunk)
+            old_parsed, new_parsed = f_old.result(), f_new.result()
+        timing['解析'] = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    report = compare(index_rows(old_parsed), index_rows(new_parsed), fields, args.examples)
+    timing['比較'] = time.perf_counter() - t0
+    report['files'] = len(paths)
+    report['old'] = args.old
+    report['new'] = args.new
+    print(f'入力: {len(paths)}ファイル (旧 {args.old} / 新 {args.new})')
+    _print_report(report, timing)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as wf:
+            json.dump(report, wf, ensure_ascii=False, indent=1)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""LINE Messaging API のローカルスタブ
+line_notifier.py の multicast/push・再試行・レート制御をネットワーク無しで検証するためのサーバ。
+受信したリクエストは標準出力に記録し、終了時に集計を表示する。
+
+例:
+  python tools/stub_line_server.py --port 8766 --throttle-every 3
+  set LINE_API_BASE=http://127.0.0.1:8766
+  set LINE_MESSAGING_CHANNEL_ACCESS_TOKEN=dummy
+  set LINE_MESSAGING_TO=U0123...,U4567...,C...
+  python send_line_stats.py --notify-no-data
+"""
+from __future__ import annotations
+import argparse
+import json
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _State:
+    invalid_token = 'invalid'
+    throttle_every = 0
+    error_every = 0
+    lock = threading.Lock()
+    calls = 0
+    counts: Counter = Counter()
+    delivered: Counter = Counter()
+    retry_keys: set = set()
+
+
+class StubLineHandler(BaseHTTPRequestHandler):
+    def _send(self, status: int, body: dict, headers: dict | None = None) -> None:
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _authorized(self) -> bool:
+        auth = self.headers.get('Authorization', '')
+        return auth.startswith('Bearer ') and auth[7:] != _State.invalid_token
+
+    def do_GET(self) -> None:  # noqa: N802
+        with _State.lock:
+            _State.counts[self.path] += 1
+        if self.path != '/v2/bot/info':
+            self._send(404, {'message': 'Not found'})
+            return
+        if not self._authorized():
+            self._send(401, {'message': 'Authentication failed'})
+            return
+        self._send(200, {'userId': 'Ustub', 'basicId': '@stub', 'displayName': 'stub bot'})
+
+    def do_POST(self) -> None:  # noqa: N802
+        length = int(self.headers.get('Content-Length', '0') or 0)
+        raw = self.rfile.read(length) if length else b''
+        with _State.lock:
+            _State.calls += 1
+            call_no = _State.calls
+            _State.counts[self.path] += 1
+        if self.path not in ('/v2/bot/message/push', '/v2/bot/message/multicast'):
+            self._send(404, {'message': 'Not found'})
+            return
+        if not self._authorized():
+            self._send(401, {'message': 'Authentication failed'})
+            return
+        if _State.throttle_every and call_no % _State.throttle_every == 0:
+            self._send(429, {'message': 'The API rate limit has been exceeded.'}, {'Retry-After': '1'})
+            return
+        if _State.error_every and call_no % _State.error_every == 0:
+            self._send(503, {'message': 'Service unavailable'})
+            return
+        retry_key = self.headers.get('X-Line-Retry-Key')
+        with _State.lock:
+            if retry_key and retry_key in _State.retry_keys:
+                self._send(409, {'message': 'The retry key is already accepted'})
+                return
+            if retry_key:
+                _State.retry_keys.add(retry_key)
+        try:
+            payload = json.loads(raw.decode('utf-8') or '{}')
+        except ValueError:
+            self._send(400, {'message': 'Invalid JSON'})
+            return
+        to = payload.get('to')
+        targets = to if isinstance(to, list) else [to]
+        if self.path.endswith('multicast') and len(targets) > 500:
+            self._send(400, {'message': 'Size must be between 1 and 500'})
+            return
+        with _State.lock:
+            for t in targets:
+                _State.delivered[t] += 1
+        self._send(200, {})
+
+    def log_message(self, fmt: str, *args) -> None:
+        print(f'[stub-line] {fmt % args}')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='LINE Messaging API スタブサーバ')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--throttle-every', type=int, default=0, help='N回に1回 429 (Retry-After: 1) を返す')
+    parser.add_argument('--error-every', type=int, default=0, help='N回に1回 503 を返す')
+    parser.add_argument('--invalid-token', default='invalid', help='401 を返すトークン値')
+    args = parser.parse_args()
+    _State.throttle_every = args.throttle_every
+    _State.error_every = args.error_every
+    _State.invalid_token = args.invalid_token
+    server = ThreadingHTTPServer((args.host, args.port), StubLineHandler)
+    print(f'stub LINE server: http://{args.host}:{args.port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f'requests: {dict(_State.counts)}')
+        print(f'delivered: {sum(_State.delivered.values())} messages to {len(_State.delivered)} recipients')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""GitHub Pages / Pages builds API のローカルスタブ
+公開確認 (publish_check.py) の待ち時間・ポーリング間隔をライブサイト無しで調整するためのサーバ。
+--delay 秒経過までは「ビルド中」を返し、経過後に --sha のコミットで公開済みとして応答する。
+
+例:
+  python tools/stub_pages_server.py --port 8765 --sha <Pages repo の HEAD> --delay 20
+  set OKUYAMI_SITE_URL=http://127.0.0.1:8765/okuyami-info
+  set OKUYAMI_GITHUB_API_URL=http://127.0.0.1:8765
+  set OKUYAMI_GITHUB_TOKEN=dummy
+  set OKUYAMI_PAGES_REPO_SLUG=MiMicroAG/okuyami-info
+  python send_line_stats.py
+"""
+from __future__ import annotations
+import argparse
+import json
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _State:
+    sha = ''
+    delay = 0.0
+    started = 0.0
+    fail_first = 0
+    hits = 0
+
+    @classmethod
+    def published(cls) -> bool:
+        return time.monotonic() - cls.started >= cls.delay
+
+
+class StubPagesHandler(BaseHTTPRequestHandler):
+    def _send(self, status: int, body: str, content_type: str = 'application/json') -> None:
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:  # noqa: N802
+        _State.hits += 1
+        if _State.hits <= _State.fail_first:
+            self._send(503, '{"message": "stub unavailable"}')
+            return
+        path = self.path.split('?', 1)[0]
+        published = _State.published()
+        if re.search(r'/repos/[^/]+/[^/]+/pages/builds/latest$', path):
+            body = {
+                'status': 'built' if published else 'building',
+                'commit': _State.sha if published else '0' * 40,
+            }
+            self._send(200, json.dumps(body))
+            return
+        if path.endswith('/publish-status.json'):
+            revision = _State.sha if published else '0' * 40
+            self._send(200, json.dumps({'revision': revision, 'built_at': ''}))
+            return
+        m = re.search(r'/posts/(\d{4})/(\d{2})/(\d{2})/okuyami-info/?$', path)
+        if m:
+            if not published:
+                self._send(404, '<html><body>Not Found</body></html>', 'text/html')
+                return
+            jp_date = f'{m.group(1)}年{m.group(2)}月{m.group(3)}日'
+            self._send(200, f'<html><body><h1>お悔やみ情報 ({jp_date})</h1></body></html>', 'text/html')
+            return
+        self._send(404, '{"message": "Not Found"}')
+
+    def log_message(self, fmt: str, *args) -> None:
+        print(f'[stub-pages] {self.address_string()} {fmt % args}')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='GitHub Pages 公開確認用スタブサーバ')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--sha', default='', help='公開済みとして返すコミットSHA (Pages repo の HEAD)')
+    parser.add_argument('--delay', type=float, default=0.0, help='公開済みになるまでの秒数')
+    parser.add_argument('--fail-first', type=int, default=0, help='最初のN回は503を返す')
+    args = parser.parse_args()
+    _State.sha = args.sha
+    _State.delay = args.delay
+    _State.fail_first = args.fail_first
+    _State.started = time.monotonic()
+    server = ThreadingHTTPServer((args.host, args.port), StubPagesHandler)
+    print(f'stub pages server: http://{args.host}:{args.port} (delay={args.delay}s, sha={args.sha[:7] or "-"})')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
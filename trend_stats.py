@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""掲載人数の推移（日次集計の累積和）
+人数・年齢合計・市町村別・年代別の件数の累計を、1日1件の固定長レコードとして追記式のログ (.cum) に保存する。
+7/30/365日の合計や前年同期比は2件の累計の差で求めるため、過去のCSVも履歴全体も読み直さない。
+
+  ヘッダ (JSON, trend_stats_file): 版, 先頭日, 市町村名の列順（追加のみ）, 列数
+  累計ログ (.cum)                : _record_struct × 先頭日からの日数（掲載の無い日は前日の累計のまま）
+
+- 解析のたびに当日分を update_day で置き換え（再掲・訂正 (dedup) は数えない）。
+  最終日以降の追加・最終日の置き換えは数件の読み書き、過去日の差し替え（バックフィル）のみ以降の累計を書き直す
+- version 1（日別集計の JSON）は読み込み時に変換
+- 統計メッセージ (LINE 等) は build_stats_message に集約（send_line_stats / 解析スクリプト共通）
+- 保存先: OKUYAMI_TRENDS / config.ini [trends] file（既定は解析の出力先の trend_stats.json）
+
+単体実行:
+  python trend_stats.py --backfill                         # 履歴ストアから作り直す
+  python trend_stats.py --backfill-csv "okuyami_output/okuyami_*_parsed_*.csv"
+  python trend_stats.py --show [--date 2025-08-08]
+"""
+from __future__ import annotations
+import csv
+import glob
+import json
+import os
+import re
+import struct
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from common_utils import fw_alnum_to_hw, lazy_module
+from dedup import CORRECTION, DUP_COLUMN, REPEAT, is_duplicate
+from settings import get_settings
+
+__all__ = ['TrendStore', 'Window', 'AGE_BANDS', 'TREND_WINDOWS', 'update_trends', 'trend_lines',
+           'build_stats_message']
+
+pd = lazy_module('pandas')
+
+AGE_BANDS: Tuple[Tuple[str, int], ...] = (
+    ('〜59歳', 0), ('60代', 60), ('70代', 70), ('80代', 80), ('90代', 90), ('100歳〜', 100),
+)
+TREND_WINDOWS = (7, 30, 365)
+_CSV_NAME = re.compile(r'okuyami_(\d{8})_parsed_(\d{8}_\d{6})')
+_VERSION = 2
+# 市町村別の初期列数（山梨県は27市町村。超えたら倍に広げる）
+_MIN_SLOTS = 32
+
+
+def age_band(age: int) -> str:
+    label = AGE_BANDS[0][0]
+    for name, lower in AGE_BANDS:
+        if age >= lower:
+            label = name
+    return label
+
+
+def _age(v: Any) -> Optional[int]:
+    if v is None or (isinstance(v, float) and v != v):
+        return None
+    m = re.search(r'\d+', fw_alnum_to_hw(str(v)))
+    return int(m.group()) if m else None
+
+
+def _city(v: Any) -> str:
+    if v is None or (isinstance(v, float) and v != v):
+        return ''
+    return str(v).strip()
+
+
+class Window(NamedTuple):
+    end: date
+    days: int
+    covered: int  # 集計のある日数
+    total: int
+    age_sum: int
+    age_n: int
+    cities: Counter
+    bands: Counter
+
+    @property
+    def mean_age(self) -> Optional[float]:
+        return self.age_sum / self.age_n if self.age_n else None
+
+
+def _record_struct(slots: int) -> struct.Struct:
+    # 累計: 集計日数, 人数, 年齢合計, 年齢あり件数, 年代別 x len(AGE_BANDS), 市町村別 x slots
+    return struct.Struct('<IIQI' + 'I' * (len(AGE_BANDS) + slots))
+
+
+def _add(a: List[int], b: List[int]) -> List[int]:
+    return [x + y for x, y in zip(a, b)]
+
+
+def _sub(a: List[int], b: List[int]) -> List[int]:
+    return [x - y for x, y in zip(a, b)]
+
+
+class TrendStore:
+    def __init__(self, path: Optional[str] = None, output_dir: Optional[str] = None):
+        self.path = path or get_settings().trend_stats_path(output_dir)
+        self.log_path = os.path.splitext(self.path)[0] + '.cum'
+        self.first: Optional[int] = None  # 累計ログ先頭の序数日
+        self.cities: List[str] = []  # 市町村名 → 列（追加のみ）
+        self.slots = _MIN_SLOTS
+        self._slot: Dict[str, int] = {}
+        self._rec = _record_struct(self.slots)
+        self._n = 0  # 累計ログの日数（先頭日から最終日まで、掲載の無い日も1件）
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as rf:
+                    data = json.load(rf)
+                if 'days' in data:
+                    self._migrate(data['days'])
+                    return
+                self.first = date.fromisoformat(data['first']).toordinal() if data.get('first') else None
+                self.cities = [str(c) for c in data.get('cities', [])]
+                self.slots = max(int(data.get('slots', _MIN_SLOTS)), len(self.cities))
+            except (OSError, ValueError, TypeError, AttributeError, KeyError) as e:
+                print(f'推移集計の読込失敗(空として継続): {e}')
+                self.first, self.cities, self.slots = None, [], _MIN_SLOTS
+        self._slot = {c: i for i, c in enumerate(self.cities)}
+        self._rec = _record_struct(self.slots)
+        if self.first is not None and os.path.exists(self.log_path):
+            self._n = os.path.getsize(self.log_path) // self._rec.size
+
+    def __len__(self) -> int:
+        """集計のある日数"""
+        return self._read(self._n - 1)[0] if self._n else 0
+
+    @property
+    def last(self) -> Optional[date]:
+        return date.fromordinal(self.first + self._n - 1) if self.first is not None and self._n else None
+
+    @staticmethod
+    def _stat(records: Iterable[Dict[str, Any]]) -> dict:
+        total = age_sum = age_n = 0
+        cities: Counter = Counter()
+        bands: Counter = Counter()
+        for rec in records:
+            if is_duplicate(rec):
+                continue
+            total += 1
+            cities[_city(rec.get('市町村'))] += 1
+            age = _age(rec.get('年齢'))
+            if age is not None:
+                age_sum += age
+                age_n += 1
+                bands[age_band(age)] += 1
+        return {'total': total, 'age_sum': age_sum, 'age_n': age_n, 'cities': dict(cities), 'bands': dict(bands)}
+
+    # --- 累計ログ (固定長レコード、添字 i = first + i 日までの累計) ---
+
+    def _zeros(self) -> List[int]:
+        return [0] * (4 + len(AGE_BANDS) + self.slots)
+
+    def _read_range(self, i0: int, i1: int) -> List[List[int]]:
+        """添字 i0..i1 の累計（i0 < 0 は 0、i1 は最終日で打ち切り）"""
+        head = [self._zeros() for _ in range(min(i1 + 1, 0) - i0)] if i0 < 0 else []
+        i0, i1 = max(i0, 0), min(i1, self._n - 1)
+        if i1 < i0:
+            return head
+        with open(self.log_path, 'rb') as rf:
+            rf.seek(i0 * self._rec.size)
+            buf = rf.read((i1 - i0 + 1) * self._rec.size)
+        return head + [list(t) for t in self._rec.iter_unpack(buf)]
+
+    def _read(self, i: int) -> List[int]:
+        """添字 i の累計（負なら 0、最終日より後は最終日の累計）"""
+        if i < 0 or not self._n:
+            return self._zeros()
+        return self._read_range(min(i, self._n - 1), min(i, self._n - 1))[0]
+
+    def _write(self, i: int, rows: List[List[int]]) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.log_path)), exist_ok=True)
+        with open(self.log_path, 'r+b' if os.path.exists(self.log_path) else 'w+b') as wf:
+            wf.seek(i * self._rec.size)
+            wf.write(b''.join(self._rec.pack(*r) for r in rows))
+        self._n = max(self._n, i + len(rows))
+
+    def _rewrite(self, rows: List[List[int]]) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.log_path)), exist_ok=True)
+        tmp = f'{self.log_path}.tmp'
+        with open(tmp, 'wb') as wf:
+            wf.write(b''.join(self._rec.pack(*r) for r in rows))
+        os.replace(tmp, self.log_path)
+        self._n = len(rows)
+
+    def _save_header(self) -> None:
+        data = {'version': _VERSION, 'first': date.fromordinal(self.first).isoformat() if self.first else None,
+                'slots': self.slots, 'cities': self.cities, 'log': os.path.basename(self.log_path)}
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as wf:
+            json.dump(data, wf, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp, self.path)
+
+    def _city_slots(self, names: Iterable[str]) -> bool:
+        """未登録の市町村に列を割り当てる。列が足りなければ倍に広げてログを書き直す（まれ）"""
+        added = False
+        for name in names:
+            if name not in self._slot:
+                self._slot[name] = len(self.cities)
+                self.cities.append(name)
+                added = True
+        if len(self.cities) > self.slots:
+            rows = self._read_range(0, self._n - 1)
+            grow = max(self.slots * 2, len(self.cities)) - self.slots
+            self.slots += grow
+            self._rec = _record_struct(self.slots)
+            self._rewrite([r + [0] * grow for r in rows])
+        return added
+
+    def _vector(self, stat: dict) -> List[int]:
+        v = [1, int(stat.get('total', 0)), int(stat.get('age_sum', 0)), int(stat.get('age_n', 0))]
+        bands = stat.get('bands', {})
+        v += [int(bands.get(name, 0)) for name, _ in AGE_BANDS]
+        cities = [0] * self.slots
+        for name, cnt in stat.get('cities', {}).items():
+            cities[self._slot[name]] += int(cnt)
+        return v + cities
+
+    def update_day(self, day: date, records: Iterable[Dict[str, Any]]) -> dict:
+        """その日の集計を置き換える（休刊日は空の records で0件として記録）。
+        最終日以降の追加・最終日の置き換えは2〜3件の読み書き、過去日の差し替えはそれ以降の累計を書き直す"""
+        stat = self._stat(records)
+        dirty = self._city_slots(stat['cities'])
+        vec = self._vector(stat)
+        ordinal = day.toordinal()
+        if self.first is None or not self._n:
+            self.first = ordinal
+            dirty = True
+            self._rewrite([vec])
+        elif ordinal < self.first:
+            # 先頭より前の日: 間の日はその日の累計のまま、以降の累計に加えて全体を書き直す
+            gap = [vec] * (self.first - ordinal - 1)
+            self._rewrite([vec, *gap, *(_add(r, vec) for r in self._read_range(0, self._n - 1))])
+            self.first = ordinal
+            dirty = True
+        else:
+            i = ordinal - self.first
+            last = self._read(self._n - 1)
+            if i >= self._n:
+                # 間の日は前日の累計のまま（集計日数も増やさない）
+                self._write(self._n, [last] * (i - self._n) + [_add(last, vec)])
+            else:
+                delta = _sub(_add(self._read(i - 1), vec), self._read(i))
+                if any(delta):
+                    self._write(i, [_add(r, delta) for r in self._read_range(i, self._n - 1)])
+        if dirty:
+            self._save_header()
+        return stat
+
+    def _migrate(self, days: Dict[str, dict]) -> None:
+        """version 1 (日別集計の JSON) から累計ログへ変換"""
+        stats = {date.fromisoformat(k).toordinal(): v for k, v in days.items()}
+        if stats:
+            self._city_slots(name for s in stats.values() for name in s.get('cities', {}))
+            self.first = min(stats)
+            rows: List[List[int]] = []
+            cur = self._zeros()
+            for ordinal in range(self.first, max(stats) + 1):
+                if ordinal in stats:
+                    cur = _add(cur, self._vector(stats[ordinal]))
+                rows.append(cur)
+            self._rewrite(rows)
+        self._save_header()
+        print(f'推移集計を累計ログ形式へ変換: {len(stats)}日分 ({self.log_path})')
+
+    def reset(self) -> None:
+        """集計を空にする（作り直し用）"""
+        for p in (self.log_path, self.path):
+            if os.path.exists(p):
+                os.remove(p)
+        self.first, self.cities, self.slots, self._slot, self._n = None, [], _MIN_SLOTS, {}, 0
+        self._rec = _record_struct(self.slots)
+
+    # --- 照会 ---
+
+    def _window(self, end: date, days: int, d: List[int]) -> Window:
+        nb = len(AGE_BANDS)
+        return Window(
+            end, days, d[0], d[1], d[2], d[3],
+            Counter({c: v for c, v in zip(self.cities, d[4 + nb:]) if v}),
+            Counter({name: v for (name, _), v in zip(AGE_BANDS, d[4:4 + nb]) if v}),
+        )
+
+    def window(self, end: date, days: int) -> Window:
+        """end を含む直近 days 日の合計（累計ログの2件の差）"""
+        if self.first is None or not self._n or end.toordinal() < self.first:
+            return Window(end, days, 0, 0, 0, 0, Counter(), Counter())
+        i = end.toordinal() - self.first
+        return self._window(end, days, _sub(self._read(i), self._read(i - days)))
+
+    def daily_totals(self, since: date, until: date) -> Dict[date, int]:
+        """since..until で集計のある日の人数（連続する days+1 件を1回で読む）"""
+        if self.first is None or not self._n:
+            return {}
+        i0, i1 = since.toordinal() - self.first, min(until.toordinal() - self.first, self._n - 1)
+        if i1 < max(i0, 0):
+            return {}
+        i0 = max(i0, 0)
+        rows = self._read_range(i0 - 1, i1)
+        return {date.fromordinal(self.first + i0 + k): cur[1] - prev[1]
+                for k, (prev, cur) in enumerate(zip(rows, rows[1:])) if cur[0] > prev[0]}
+
+    def year_over_year(self, end: date, days: int) -> Tuple[Window, Window]:
+        try:
+            prev_end = end.replace(year=end.year - 1)
+        except ValueError:  # 2/29
+            prev_end = end - timedelta(days=365)
+        return self.window(end, days), self.window(prev_end, days)
+
+    # --- 作り直し ---
+
+    def backfill_history(self) -> int:
+        from history_store import HistoryStore
+        store = HistoryStore()
+        if not store.available():
+            print('pyarrow が無いため --backfill-csv を使ってください')
+            return 0
+        by_day: Dict[date, List[dict]] = {}
+        for r in store.read_table(['publish_date', 'city', 'age', 'dup_kind']).to_pylist():
+            by_day.setdefault(r['publish_date'], []).append({'市町村': r['city'], '年齢': r['age'], '重複': r['dup_kind']})
+        for day in store.days():
+            self.update_day(day, by_day.get(day, []))
+        return len(by_day)
+
+    def backfill_csv(self, paths: Iterable[str]) -> int:
+        latest: Dict[str, Tuple[str, str]] = {}
+        for path in paths:
+            m = _CSV_NAME.search(os.path.basename(path))
+            if m and (m.group(1) not in latest or m.group(2) > latest[m.group(1)][0]):
+                latest[m.group(1)] = (m.group(2), path)
+        for day_s, (_, path) in sorted(latest.items()):
+            with open(path, 'r', encoding='utf-8-sig', newline='') as rf:
+                self.update_day(datetime.strptime(day_s, '%Y%m%d').date(), csv.DictReader(rf))
+        return len(latest)
+
+
+def update_trends(day: Optional[str], records: Iterable[Dict[str, Any]],
+                  output_dir: Optional[str] = None) -> Optional[dict]:
+    """日次解析の後に呼ぶ。日付不明なら何もしない（例外も投げない）"""
+    if not day:
+        return None
+    try:
+        store = TrendStore(output_dir=output_dir)
+        return store.update_day(datetime.strptime(day, '%Y-%m-%d').date(), records)
+    except Exception as e:
+        print(f'推移集計の更新に失敗(無視): {e}')
+        return None
+
+
+def _change(cur: int, prev: int) -> str:
+    if not prev:
+        return ''
+    return f', {(cur - prev) / prev * 100:+.1f}%'
+
+
+def trend_lines(end: date, store: Optional[TrendStore] = None) -> List[str]:
+    """『推移』の行。前年同期は集計日数が揃っている場合だけ表示"""
+    if store is None:  # 空の集計は偽になるため None で判定
+        store = TrendStore()
+    if not len(store):
+        return []
+    lines = ['推移（前年同期）']
+    for days in TREND_WINDOWS:
+        cur, prev = store.year_over_year(end, days)
+        if not cur.covered:
+            continue
+        text = f'- {days}日: {cur.total}名'
+        if cur.mean_age is not None:
+            text += f' (平均{cur.mean_age:.1f}歳)'
+        if prev.covered >= cur.covered * 0.8:
+            text += f' / 前年 {prev.total}名{_change(cur.total, prev.total)}'
+        lines.append(text)
+    return lines if len(lines) > 1 else []
+
+
+def build_stats_message(df: 'pd.DataFrame', target_dt: datetime, post_url: str,
+                        trends: Optional[List[str]] = None) -> str:
+    """統計情報の通知文面（再掲・訂正は総人数に含めない）"""
+    if df.empty:
+        return ''
+    repeats = 0
+    if DUP_COLUMN in df.columns:
+        dup_mask = df[DUP_COLUMN].fillna('').astype(str).isin([REPEAT, CORRECTION])
+        repeats = int(dup_mask.sum())
+        df = df[~dup_mask]
+    # 安全に数値化
+    ages_series = df['年齢'] if '年齢' in df.columns else pd.Series(dtype='float64')
+    ages = pd.to_numeric(ages_series, errors='coerce')
+    total = len(df)
+    mean_age = ages.mean()
+    max_age = ages.max()
+    min_age = ages.min()
+    city_counts = df['市町村'].value_counts().sort_index() if '市町村' in df.columns else {}
+    lines = [
+        post_url,
+        '',
+        f'【お悔やみ情報 {target_dt.strftime("%Y-%m-%d")}】',
+        '統計情報',
+        f'- 総人数: {total}名',
+        f'- 平均年齢: {mean_age:.1f}歳' if pd.notna(mean_age) else '- 平均年齢: -',
+        f'- 最高年齢: {int(max_age)}歳' if pd.notna(max_age) else '- 最高年齢: -',
+        f'- 最低年齢: {int(min_age)}歳' if pd.notna(min_age) else '- 最低年齢: -',
+    ]
+    if repeats:
+        lines.insert(5, f'- 再掲・訂正: {repeats}名（総人数に含めず）')
+    if trends:
+        lines += [''] + trends
+    lines += ['', '市町村別人数']
+    for city, count in city_counts.items():
+        lines.append(f'- {city}: {count}名')
+    msg = '\n'.join(lines)
+    # LINE の上限対策（1000文字程度）
+    return msg[:950]
+
+
+if __name__ == '__main__':
+    import argparse
+    ap = argparse.ArgumentParser(description='掲載人数の推移集計')
+    ap.add_argument('--backfill', action='store_true', help='履歴ストア (history_store) から作り直す')
+    ap.add_argument('--backfill-csv', metavar='GLOB', help='解析済みCSVから作り直す')
+    ap.add_argument('--show', action='store_true', help='推移を表示')
+    ap.add_argument('--date', help='基準日 YYYY-MM-DD (既定: 集計の最終日)')
+    ap.add_argument('--path', help='保存先 (既定: settings)')
+    cli = ap.parse_args()
+    store = TrendStore(cli.path)
+    if cli.backfill or cli.backfill_csv:
+        store.reset()
+        n = store.backfill_csv(sorted(glob.glob(cli.backfill_csv))) if cli.backfill_csv else store.backfill_history()
+        print(f'作り直し: {n}日分 ({store.path})')
+    if cli.show:
+        if not len(store):
+            print('集計がありません')
+            raise SystemExit(1)
+        end = datetime.strptime(cli.date, '%Y-%m-%d').date() if cli.date else store.last
+        print(f'基準日 {end}')
+        print('\n'.join(trend_lines(end, store)))
+        w = store.window(end, 365)
+        print('年代別 (365日): ' + ', '.join(f'{name} {w.bands.get(name, 0)}' for name, _ in AGE_BANDS))
+        print('市町村別 (365日): ' + ', '.join(f'{c or "(不明)"} {n}' for c, n in w.cities.most_common()))
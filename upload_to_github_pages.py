@@ -3,23 +3,43 @@
 """GitHub Pages アップロードスクリプト
 お悔やみ情報Markdownファイルを Jekyll _posts へ配置して GitHub へプッシュ
 バックフィル用に --date (YYYY-MM-DD) で投稿日付を上書き可能
+--batch DIR で複数日分をまとめて配置し、1回のコミット/プッシュ（Pagesビルド1回）で公開
+--git-backend plumbing (OKUYAMI_GIT_BACKEND) で git_publisher (fast-import) 経由のコミットに切替
+月別・市町村別アーカイブと投稿マニフェスト (site_archive) を該当分のみ差分更新（--no-archives で無効）
+共通スタイルシート assets/css/okuyami.css (compact 出力用) を変更時のみ配置
 """
 
 import os
 import sys
 import glob
 import subprocess
+import hashlib
+import json
+import re
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 from common_utils import build_front_matter, get_jp_date
+from publish_check import MARKER_FILE_NAME, MARKER_FILE_CONTENT
+from git_publisher import PlumbingPublisher
+from site_archive import ArchiveIndex, read_city_counts
+from settings import get_settings
 import argparse
 
+_STYLESHEET_REL = os.path.join('assets', 'css', 'okuyami.css')
+
 
 class GitHubPagesUploader:
-    def __init__(self, repo_path: str, branch: str = "main"):
+    def __init__(self, repo_path: str, branch: str = "main", git_backend: Optional[str] = None,
+                 archives: bool = True):
         self.repo_path = repo_path
         self.branch = branch
+        # porcelain: git add/diff/commit/push, plumbing: fast-import + update-index + push
+        self.git_backend = (git_backend or get_settings().git_backend).strip().lower()
         self.posts_dir = os.path.join(repo_path, "_posts")
+        # 正規化比較で変更なしと判定され、公開済みのポスト（git 操作不要）
+        self.unchanged_paths = set()
+        self.archives_enabled = archives
+        self._archive: Optional[ArchiveIndex] = None
 
     # 表示用パス短縮
     def _display_path(self, path: str) -> str:
@@ -66,40 +86,169 @@ class GitHubPagesUploader:
             print(f"検索エラー: {e}")
             return None
 
-    def prepare_jekyll_post(self, source_file: str, dt: datetime) -> Optional[str]:
-        """既存Markdownを Jekyll post 形式に変換"""
+    def _post_path(self, dt: datetime) -> str:
+        return os.path.join(self.posts_dir, f"{dt.strftime('%Y-%m-%d')}-okuyami-info.md")
+
+    # 実行ごとに変わる行（front matter の date: と本文末尾の『最終更新』）
+    _VOLATILE_LINE = re.compile(r'^(?:date:\s.*|\*最終更新:.*\*)$', re.MULTILINE)
+
+    @classmethod
+    def _content_digest(cls, text: str) -> str:
+        """揮発行を除いた正規化内容のハッシュ"""
+        normalized = cls._VOLATILE_LINE.sub('', text.replace('\r\n', '\n')).strip()
+        return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+    def _read_digest(self, path: str) -> Optional[str]:
         try:
-            date_str = dt.strftime('%Y-%m-%d')
-            dest_path = os.path.join(self.posts_dir, f"{date_str}-okuyami-info.md")
+            if not os.path.exists(path):
+                return None
+            with open(path, 'r', encoding='utf-8') as rf:
+                return self._content_digest(rf.read())
+        except Exception:
+            return None
 
-            with open(source_file, 'r', encoding='utf-8') as rf:
-                content = rf.read()
+    # 公開（プッシュ成功）済みダイジェストの記録。.git 配下に置き追跡対象外とする
+    def _published_state_path(self) -> str:
+        return os.path.join(self.repo_path, '.git', 'okuyami-published.json')
 
-            # 既存 front matter 除去
-            if content.startswith('---'):
-                end_pos = content.find('\n---', 3)
-                if end_pos != -1:
-                    content_rest = content[end_pos + 4:].lstrip('\n')
-                else:
-                    content_rest = content
+    def _load_published(self) -> Dict[str, str]:
+        try:
+            with open(self._published_state_path(), 'r', encoding='utf-8') as rf:
+                data = json.load(rf)
+            return data if isinstance(data, dict) else {}
+        except Exception:
+            return {}
+
+    def _record_published(self, paths: List[str]) -> None:
+        try:
+            state = self._load_published()
+            for p in paths:
+                digest = self._read_digest(p)
+                if digest:
+                    state[os.path.relpath(p, self.repo_path).replace('\\', '/')] = digest
+            with open(self._published_state_path(), 'w', encoding='utf-8') as wf:
+                json.dump(state, wf, ensure_ascii=False, indent=1, sort_keys=True)
+        except Exception as e:
+            print(f"公開状態の記録失敗(継続): {e}")
+
+    def _is_published(self, dest_path: str, digest: str) -> bool:
+        rel = os.path.relpath(dest_path, self.repo_path).replace('\\', '/')
+        return self._load_published().get(rel) == digest
+
+    def write_post_if_changed(self, dest_path: str, content: str) -> Tuple[bool, bool]:
+        """(書き込んだか, 公開が必要か) を返す。
+        正規化内容が既存と同じなら書き込まず、さらに公開済みなら git 操作も不要。
+        """
+        digest = self._content_digest(content)
+        if self._read_digest(dest_path) == digest:
+            return False, not self._is_published(dest_path, digest)
+        with open(dest_path, 'w', encoding='utf-8') as wf:
+            wf.write(content)
+        return True, True
+
+    def render_jekyll_post(self, source_file: str, dt: datetime) -> str:
+        """既存Markdownを Jekyll post 形式の文字列に変換"""
+        with open(source_file, 'r', encoding='utf-8') as rf:
+            content = rf.read()
+
+        # 既存 front matter 除去
+        if content.startswith('---'):
+            end_pos = content.find('\n---', 3)
+            if end_pos != -1:
+                content_rest = content[end_pos + 4:].lstrip('\n')
             else:
                 content_rest = content
+        else:
+            content_rest = content
 
-            # 見出し日付置換（1回のみ）
-            jp_date = dt.strftime('%Y年%m月%d日')
-            import re as _re
-            content_rest = _re.sub(r'^#\s*お悔やみ情報 \([^)]*\)', f'# お悔やみ情報 ({jp_date})', content_rest, count=1, flags=_re.MULTILINE)
+        # 見出し日付置換（1回のみ）
+        jp_date = dt.strftime('%Y年%m月%d日')
+        content_rest = re.sub(r'^#\s*お悔やみ情報 \([^)]*\)', f'# お悔やみ情報 ({jp_date})', content_rest, count=1, flags=re.MULTILINE)
 
-            front = build_front_matter(f'お悔やみ情報 ({get_jp_date(dt)})', dt)
+        front = build_front_matter(f'お悔やみ情報 ({get_jp_date(dt)})', dt)
+        return front + content_rest
 
-            with open(dest_path, 'w', encoding='utf-8') as wf:
-                wf.write(front + content_rest)
-            print(f"Jekyll投稿ファイル生成: {self._display_path(dest_path)}")
+    def prepare_jekyll_post(self, source_file: str, dt: datetime) -> Optional[str]:
+        """既存Markdownを Jekyll post 形式に変換（内容に変化が無ければ書き込まない）"""
+        try:
+            dest_path = self._post_path(dt)
+            content = self.render_jekyll_post(source_file, dt)
+            written, needs_publish = self.write_post_if_changed(dest_path, content)
+            if not needs_publish:
+                self.unchanged_paths.add(dest_path)
+                print(f"Jekyll投稿ファイル変更なし: {self._display_path(dest_path)}")
+            elif written:
+                print(f"Jekyll投稿ファイル生成: {self._display_path(dest_path)}")
+            else:
+                print(f"Jekyll投稿ファイル未公開分あり: {self._display_path(dest_path)}")
             return dest_path
         except Exception as e:
             print(f"Jekyll準備エラー: {e}")
             return None
 
+    def record_archive(self, dt: datetime, source_file: Optional[str], note: str = '') -> None:
+        """アーカイブ/マニフェストへ1日分を登録（人数は同名CSVから）"""
+        if not self.archives_enabled:
+            return
+        try:
+            if self._archive is None:
+                self._archive = ArchiveIndex(self.repo_path)
+            counts = read_city_counts(os.path.splitext(source_file)[0] + '.csv') if source_file else None
+            self._archive.record(dt, f'お悔やみ情報 ({get_jp_date(dt)})', counts, note)
+        except Exception as e:
+            print(f"アーカイブ登録エラー(継続): {e}")
+
+    def flush_archives(self) -> List[str]:
+        """影響を受けた月・市町村ページとマニフェストを書き出し、変更ファイルを返す"""
+        if self._archive is None:
+            return []
+        try:
+            paths = self._archive.flush()
+        except Exception as e:
+            print(f"アーカイブ更新エラー(継続): {e}")
+            return []
+        if paths:
+            print(f"アーカイブ更新: {len(paths)}ファイル")
+        return paths
+
+    def ensure_publish_marker(self) -> Optional[str]:
+        """公開確認用マーカー (publish-status.json) を配置。新規/内容変更時のみパスを返す"""
+        try:
+            marker_path = os.path.join(self.repo_path, MARKER_FILE_NAME)
+            if os.path.exists(marker_path):
+                with open(marker_path, 'r', encoding='utf-8') as rf:
+                    if rf.read() == MARKER_FILE_CONTENT:
+                        return None
+            with open(marker_path, 'w', encoding='utf-8', newline='\n') as wf:
+                wf.write(MARKER_FILE_CONTENT)
+            print(f"公開確認マーカー配置: {self._display_path(marker_path)}")
+            return marker_path
+        except Exception as e:
+            print(f"マーカー配置エラー(継続): {e}")
+            return None
+
+    def ensure_stylesheet(self) -> Optional[str]:
+        """共通スタイルシートを Pages リポジトリへ複製。新規/内容変更時のみパスを返す"""
+        src = os.path.join(os.path.dirname(os.path.abspath(__file__)), _STYLESHEET_REL)
+        dest = os.path.join(self.repo_path, _STYLESHEET_REL)
+        try:
+            if not os.path.exists(src):
+                return None
+            with open(src, 'rb') as rf:
+                data = rf.read()
+            if os.path.exists(dest):
+                with open(dest, 'rb') as rf:
+                    if rf.read() == data:
+                        return None
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            with open(dest, 'wb') as wf:
+                wf.write(data)
+            print(f"スタイルシート配置: {self._display_path(dest)}")
+            return dest
+        except Exception as e:
+            print(f"スタイルシート配置エラー(継続): {e}")
+            return None
+
     def run_git_command(self, cmd: list) -> bool:
         try:
             result = subprocess.run(cmd, cwd=self.repo_path, capture_output=True, text=True, encoding='utf-8')
@@ -117,39 +266,84 @@ class GitHubPagesUploader:
             print(f"Git実行例外: {e}")
             return False
 
-    def commit_and_push(self, file_path: str, commit_message: Optional[str]) -> bool:
+    def _unpushed_commits(self) -> int:
+        """origin/<branch> より先行しているコミット数。判定不能時は -1"""
+        try:
+            res = subprocess.run(['git', 'rev-list', '--count', f'origin/{self.branch}..HEAD'],
+                                 cwd=self.repo_path, capture_output=True, text=True)
+            if res.returncode == 0:
+                return int(res.stdout.strip() or 0)
+        except Exception:
+            pass
+        return -1
+
+    def commit_paths(self, paths: List[str], commit_message: Optional[str]) -> bool:
+        """複数ファイルを1回の add/commit/push で反映"""
         if commit_message is None:
             commit_message = f"お悔やみ情報を更新 ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')})"
-        rel = os.path.relpath(file_path, self.repo_path)
-        print("git add/commit/push 開始")
+        rels = [os.path.relpath(p, self.repo_path) for p in paths if p]
+        if not rels:
+            print("変更なし: コミット/プッシュをスキップします")
+            return True
+        if self.git_backend == 'plumbing':
+            publisher = PlumbingPublisher(self.repo_path, self.branch)
+            if publisher.supported():
+                return self._commit_paths_plumbing(publisher, [p for p in paths if p], commit_message)
+            print("情報: plumbing バックエンド非対応のリポジトリ状態のため通常の git コマンドで処理します")
+        print(f"git add/commit/push 開始 ({len(rels)}ファイル)")
         # git add
-        if not self.run_git_command(['git', 'add', rel]):
+        if not self.run_git_command(['git', 'add', '--', *rels]):
             return False
         # 差分有無チェック (ステージ済み比較)。差分なければコミット/プッシュをスキップ
         try:
-            diff_check = subprocess.run(['git', 'diff', '--cached', '--quiet', '--', rel], cwd=self.repo_path)
+            diff_check = subprocess.run(['git', 'diff', '--cached', '--quiet', '--', *rels], cwd=self.repo_path)
             if diff_check.returncode == 0:
-                print("変更なし: コミット/プッシュをスキップします")
-                return True
+                if self._unpushed_commits() == 0:
+                    print("変更なし: コミット/プッシュをスキップします")
+                    self._record_published(paths)
+                    return True
+                print("未プッシュのコミットがあるためプッシュのみ実行します")
+                commit_message = None
         except Exception as e:
             print(f"差分チェック失敗(継続): {e}")
         # commit
-        if not self.run_git_command(['git', 'commit', '-m', commit_message]):
+        if commit_message is not None and not self.run_git_command(['git', 'commit', '-m', commit_message, '--', *rels]):
             print("コミット失敗 (内容なしの可能性)")
             return False
         # push
         if not self.run_git_command(['git', 'push', 'origin', self.branch]):
             return False
         print("GitHub Pages へプッシュ完了")
+        self._record_published(paths)
         return True
 
+    def _commit_paths_plumbing(self, publisher: PlumbingPublisher, paths: List[str], commit_message: str) -> bool:
+        """commit_paths の plumbing 版。変更判定はプロセス起動なし、コミットは fast-import 1回"""
+        changed = publisher.changed_paths(paths)
+        if not changed:
+            if publisher.has_unpushed() is False:
+                print("変更なし: コミット/プッシュをスキップします")
+                self._record_published(paths)
+                return True
+            print("未プッシュのコミットがあるためプッシュのみ実行します")
+        else:
+            print(f"git fast-import/push 開始 ({len(changed)}ファイル)")
+            if not publisher.commit(changed, commit_message):
+                return False
+        if not publisher.push():
+            return False
+        print(f"GitHub Pages へプッシュ完了 (git起動 {publisher.process_count}回)")
+        self._record_published(paths)
+        return True
+
+    def commit_and_push(self, file_path: str, commit_message: Optional[str], extra_paths: Optional[list] = None) -> bool:
+        return self.commit_paths([file_path, *(extra_paths or [])], commit_message)
+
     def prepare_empty_post(self, dt: datetime, reason: str) -> Optional[str]:
         """休刊日/データ無し用の簡易ポスト生成"""
         try:
             date_str = dt.strftime('%Y-%m-%d')
             dest_path = os.path.join(self.posts_dir, f"{date_str}-okuyami-info.md")
-            if os.path.exists(dest_path):
-                print(f"警告: 既にポストが存在します: {dest_path} 上書きします")
             jp_date = dt.strftime('%Y年%m月%d日')
             if reason == 'holiday':
                 body_msg = '本日は新聞休刊日のため掲載はありません。'
@@ -164,9 +358,12 @@ class GitHubPagesUploader:
                 f'> {body_msg}\n\n'
                 '*自動生成: 休刊日/掲載なし判定*\n'
             )
-            with open(dest_path, 'w', encoding='utf-8') as wf:
-                wf.write(front + content)
-            print(f"空ポスト生成: {self._display_path(dest_path)}")
+            written, needs_publish = self.write_post_if_changed(dest_path, front + content)
+            if not needs_publish:
+                self.unchanged_paths.add(dest_path)
+                print(f"空ポスト変更なし: {self._display_path(dest_path)}")
+            elif written:
+                print(f"空ポスト生成: {self._display_path(dest_path)}")
             return dest_path
         except Exception as e:
             print(f"空ポスト生成エラー: {e}")
@@ -178,6 +375,7 @@ class GitHubPagesUploader:
                 return False
             if generate_empty:
                 jekyll_file = self.prepare_empty_post(dt, reason)
+                self.record_archive(dt, None, '休刊日' if reason == 'holiday' else '掲載なし')
             else:
                 if source_file is None:
                     source_file = self.find_latest_markdown_file()
@@ -187,9 +385,17 @@ class GitHubPagesUploader:
                     print(f"エラー: ファイル未存在: {source_file}")
                     return False
                 jekyll_file = self.prepare_jekyll_post(source_file, dt)
+                self.record_archive(dt, source_file)
             if not jekyll_file:
                 return False
-            if self.commit_and_push(jekyll_file, commit_message):
+            marker_file = self.ensure_publish_marker()
+            archive_files = self.flush_archives()
+            stylesheet = self.ensure_stylesheet()
+            if jekyll_file in self.unchanged_paths and not marker_file and not archive_files and not stylesheet:
+                # git add/diff/commit/push と Pages 再ビルドを丸ごと省略
+                print("変更なし（正規化比較）: git操作・プッシュをスキップします")
+                return True
+            if self.commit_and_push(jekyll_file, commit_message, extra_paths=[marker_file, stylesheet, *archive_files]):
                 print("\n" + "=" * 50)
                 print("アップロード完了")
                 print(f"投稿: {os.path.basename(jekyll_file)}")
@@ -201,18 +407,121 @@ class GitHubPagesUploader:
             print(f"アップロードエラー: {e}")
             return False
 
+    def collect_batch_sources(self, source_dir: str, since: Optional[datetime] = None,
+                              until: Optional[datetime] = None) -> List[Tuple[datetime, str]]:
+        """ディレクトリ内のMarkdownをファイル名(okuyami_YYYYMMDD_)の日付ごとにまとめ、各日の最新を返す"""
+        latest: Dict[str, Tuple[float, str]] = {}
+        for path in glob.glob(os.path.join(source_dir, '*.md')):
+            m = re.search(r'(20\d{6})', os.path.basename(path))
+            if not m:
+                print(f"警告: 日付を推定できないためスキップ: {os.path.basename(path)}")
+                continue
+            key = m.group(1)
+            ctime = os.path.getctime(path)
+            if key not in latest or ctime > latest[key][0]:
+                latest[key] = (ctime, path)
+        result: List[Tuple[datetime, str]] = []
+        for key in sorted(latest):
+            try:
+                dt = datetime.strptime(key, '%Y%m%d')
+            except ValueError:
+                print(f"警告: 不正な日付のためスキップ: {key}")
+                continue
+            if (since and dt < since) or (until and dt > until):
+                continue
+            result.append((dt, latest[key][1]))
+        return result
+
+    def upload_batch(self, source_dir: str, commit_message: Optional[str],
+                     since: Optional[datetime] = None, until: Optional[datetime] = None) -> bool:
+        """複数日分の投稿を準備し、変更分のみ1回のコミット/プッシュで公開"""
+        try:
+            if not self.setup_repository():
+                return False
+            sources = self.collect_batch_sources(source_dir, since, until)
+            if not sources:
+                print(f"対象Markdownが見つかりません: {source_dir}")
+                return False
+            changed: List[str] = []
+            changed_dates: List[datetime] = []
+            skipped = 0
+            for dt, source_file in sources:
+                self.record_archive(dt, source_file)
+                dest_path = self._post_path(dt)
+                try:
+                    content = self.render_jekyll_post(source_file, dt)
+                except Exception as e:
+                    print(f"Jekyll準備エラー ({os.path.basename(source_file)}): {e}")
+                    return False
+                written, needs_publish = self.write_post_if_changed(dest_path, content)
+                if not needs_publish:
+                    skipped += 1
+                    continue
+                if written:
+                    print(f"Jekyll投稿ファイル生成: {self._display_path(dest_path)}")
+                changed.append(dest_path)
+                changed_dates.append(dt)
+            print(f"一括準備: 対象 {len(sources)}日, 変更 {len(changed)}件, 変更なし {skipped}件")
+            archive_files = self.flush_archives()
+            stylesheet = self.ensure_stylesheet()
+            if not changed and not archive_files and not stylesheet:
+                print("変更なし: コミット/プッシュをスキップします")
+                return True
+            marker_file = self.ensure_publish_marker()
+            if commit_message is None:
+                if changed_dates:
+                    first, last = changed_dates[0], changed_dates[-1]
+                    commit_message = f"お悔やみ情報を一括更新 ({len(changed)}件: {first:%Y-%m-%d}〜{last:%Y-%m-%d})"
+                else:
+                    commit_message = "お悔やみ情報アーカイブを更新"
+            if self.commit_paths([*changed, *archive_files, marker_file, stylesheet], commit_message):
+                print("\n" + "=" * 50)
+                print(f"一括アップロード完了: {len(changed)}件")
+                print("数分後にサイトへ反映されます")
+                print("=" * 50)
+                return True
+            return False
+        except Exception as e:
+            print(f"一括アップロードエラー: {e}")
+            return False
+
 
 def main():
     parser = argparse.ArgumentParser(description="お悔やみ情報 GitHub Pages アップローダー")
-    parser.add_argument('--repo', required=True, help='GitHub Pages リポジトリ (例: ./okuyami-info)')
+    parser.add_argument('--repo', help='GitHub Pages リポジトリ (例: ./okuyami-info。既定: OKUYAMI_PAGES_REPO / config.ini [github] repo_path)')
     parser.add_argument('--file', help='アップロードするMarkdown (未指定で最新)')
-    parser.add_argument('--branch', default='main', help='ブランチ (default: main)')
+    parser.add_argument('--branch', help='ブランチ (既定: config.ini [github] branch または main)')
     parser.add_argument('--message', help='コミットメッセージ')
     parser.add_argument('--date', help='投稿日付 YYYY-MM-DD (バックフィル用)')
     parser.add_argument('--infer-date', action='store_true', help='ファイル名(okuyami_YYYYMMDD_)から日付推定')
     parser.add_argument('--generate-empty', action='store_true', help='休刊日/掲載なしの空ポストを生成')
     parser.add_argument('--reason', choices=['holiday', 'nodata'], default='holiday', help='空ポスト理由')
+    parser.add_argument('--batch', metavar='DIR', help='ディレクトリ内の解析済みMarkdownを日付ごとに一括公開 (1コミット/1プッシュ)')
+    parser.add_argument('--since', help='--batch の対象開始日 YYYY-MM-DD')
+    parser.add_argument('--until', help='--batch の対象終了日 YYYY-MM-DD')
+    parser.add_argument('--no-archives', action='store_true', help='月別・市町村別アーカイブとマニフェストを更新しない')
+    parser.add_argument('--git-backend', choices=['porcelain', 'plumbing'],
+                        help='コミット方式 (既定: OKUYAMI_GIT_BACKEND または porcelain)')
     args = parser.parse_args()
+    settings = get_settings()
+    args.repo = args.repo or settings.pages_repo
+    args.branch = args.branch or settings.branch
+
+    if args.batch:
+        try:
+            since = datetime.strptime(args.since, '%Y-%m-%d') if args.since else None
+            until = datetime.strptime(args.until, '%Y-%m-%d') if args.until else None
+        except ValueError:
+            print('エラー: --since/--until は YYYY-MM-DD 形式')
+            sys.exit(1)
+        if not args.infer_date:
+            print('情報: --batch ではファイル名(okuyami_YYYYMMDD_)から日付を推定します')
+        os.environ.setdefault('LANG', 'ja_JP.UTF-8')
+        os.environ.setdefault('LC_ALL', 'ja_JP.UTF-8')
+        uploader = GitHubPagesUploader(args.repo, args.branch, args.git_backend, not args.no_archives)
+        if not uploader.upload_batch(args.batch, args.message, since, until):
+            sys.exit(1)
+        return
 
     # 日付決定ロジック
     dt: datetime
@@ -223,8 +532,7 @@ def main():
             print('エラー: --date は YYYY-MM-DD 形式')
             sys.exit(1)
     elif args.infer_date and args.file:
-        import re as _re
-        m = _re.search(r'(20\d{6})', os.path.basename(args.file))
+        m = re.search(r'(20\d{6})', os.path.basename(args.file))
         if m:
             try:
                 dt = datetime.strptime(m.group(1), '%Y%m%d')
@@ -237,7 +545,7 @@ def main():
     else:
         dt = datetime.now()
 
-    uploader = GitHubPagesUploader(args.repo, args.branch)
+    uploader = GitHubPagesUploader(args.repo, args.branch, args.git_backend, not args.no_archives)
     # Force UTF-8 environment to reduce mojibake risk on Windows git
     try:
         os.environ.setdefault('LANG', 'ja_JP.UTF-8')
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""斎場（会場）の座標辞書
+紙面HTMLの『斎場の地図はこちら』リンク (class="saijyo", maps?ll=緯度,経度) から会場名と座標を集め、
+JSON に保存して投稿の会場リンクを正確な座標で出す（住所の曖昧検索の代わり）。
+
+- キーは施設名（『塩部４の甲府シティホール』→『甲府シティホール』）。全角英数字は半角に寄せて照合
+- 照合は既知の施設名を長い順に並べた1本のコンパイル済み正規表現で行い、辞書を引く
+- 保存先: OKUYAMI_VENUES / config.ini [venues] file（既定は出力先の venue_gazetteer.json）
+- リポジトリの venue_gazetteer.json は読み取り専用の初期辞書。保存先の内容を上に重ねて照合し、書き込みは保存先のみ
+- スクレイパーは記事取得時に自動で追記する。既存の raw_html からは --harvest で取り込む
+  （初期辞書自体を更新する場合は --path venue_gazetteer.json）
+
+単体実行:
+  python venue_gazetteer.py --harvest "raw_html/*_inner.html"
+  python venue_gazetteer.py --lookup "昭和町西条の昭和シティホール"
+  python venue_gazetteer.py --list
+"""
+from __future__ import annotations
+import glob
+import json
+import os
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from common_utils import fw_alnum_to_hw
+from settings import get_settings
+
+__all__ = ['Venue', 'VenueGazetteer', 'get_gazetteer', 'harvest_html', 'record_venues', 'facility_name']
+
+# 同梱の初期辞書（読み取り専用）
+_SEED = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'venue_gazetteer.json')
+
+
+class Venue(NamedTuple):
+    name: str
+    lat: float
+    lng: float
+    address: str = ''
+
+    @property
+    def map_url(self) -> str:
+        return f'https://www.google.com/maps/search/?api=1&query={self.lat:.6f},{self.lng:.6f}'
+
+
+# 『会場名(<a href=".../maps?ll=35.67,138.55&..." class="saijyo">斎場の地図はこちら</a>)』
+_SAIJYO = re.compile(
+    r'(?:^|[、。>])([^、。<>]*?)\(\s*<a\s+href="[^"]*?[?&](?:amp;)?ll=(-?\d+\.\d+),(-?\d+\.\d+)[^"]*"[^>]*class="saijyo"',
+)
+_CITY = re.compile(r'◇\s*([^\s<　]+?[市町村])')
+_KOFU = re.compile(r'■[\s　]*甲[\s　]*府[\s　]*■')
+# 『の』の前が施設名の一部かどうか（所在地なら施設語を含まない）
+_FACILITY_WORDS = re.compile(r'ホール|会館|セレモニー|斎場|聖苑|プラザ|メモリアル')
+# 県内市町村（所在地が市町村名で始まっていれば見出しの市町村を補わない）
+_MUNICIPALITIES = re.compile(
+    r'^(?:甲府市|富士吉田市|都留市|山梨市|大月市|韮崎市|南アルプス市|北杜市|甲斐市|笛吹市|上野原市|甲州市|中央市'
+    r'|市川三郷町|早川町|身延町|南部町|富士川町|昭和町|道志村|西桂町|忍野村|山中湖村|鳴沢村|富士河口湖町|小菅村|丹波山村)'
+)
+
+
+def _norm(s: str) -> str:
+    return re.sub(r'\s+', '', fw_alnum_to_hw(s))
+
+
+def facility_name(venue: str) -> Tuple[str, str]:
+    """『所在地の施設名』を (施設名, 所在地) に分ける"""
+    text = venue.strip()
+    pos = text.find('の')
+    while pos != -1:
+        prefix = text[:pos]
+        if prefix and not _FACILITY_WORDS.search(prefix) and pos + 1 < len(text):
+            return text[pos + 1:], prefix
+        pos = text.find('の', pos + 1)
+    return text, ''
+
+
+def harvest_html(html: str) -> List[Tuple[str, str, float, float]]:
+    """innerHTML から (施設名, 所在地, 緯度, 経度) を出現順に"""
+    # 市町村見出しの位置（所在地に市町村名が無い場合に補う）
+    marks = [(m.start(), m.group(1)) for m in _CITY.finditer(html)]
+    marks += [(m.start(), '甲府市') for m in _KOFU.finditer(html)]
+    marks.sort()
+    found = []
+    for m in _SAIJYO.finditer(html):
+        name, place = facility_name(m.group(1))
+        if not name:
+            continue
+        city = ''
+        for pos, c in marks:
+            if pos > m.start():
+                break
+            city = c
+        if place and city and not _MUNICIPALITIES.match(place):
+            place = city + place
+        found.append((name, place, float(m.group(2)), float(m.group(3))))
+    return found
+
+
+class VenueGazetteer:
+    """初期辞書 (seed) の上に保存先 (path) の内容を重ねた辞書。save() は path にのみ書く"""
+
+    def __init__(self, path: Optional[str] = None, seed: Optional[str] = _SEED):
+        self.path = path or get_settings().venue_gazetteer_path()
+        self.venues: Dict[str, Venue] = {}
+        self._pattern: Optional[re.Pattern] = None
+        self._index: Dict[str, Venue] = {}
+        self.dirty = False
+        if seed and os.path.abspath(seed) != os.path.abspath(self.path):
+            self._load(seed)
+        self._load(self.path)
+
+    def _load(self, path: str) -> None:
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, 'r', encoding='utf-8') as rf:
+                data = json.load(rf)
+            for name, v in data.get('venues', {}).items():
+                self.venues[name] = Venue(name, float(v['lat']), float(v['lng']), v.get('address', ''))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f'警告: 会場辞書を読み込めません ({path}): {e}')
+
+    def __len__(self) -> int:
+        return len(self.venues)
+
+    def add(self, name: str, lat: float, lng: float, address: str = '') -> bool:
+        """追加・更新。変更があれば True"""
+        cur = self.venues.get(name)
+        new = Venue(name, lat, lng, address or (cur.address if cur else ''))
+        if cur == new:
+            return False
+        self.venues[name] = new
+        self._pattern = None
+        self.dirty = True
+        return True
+
+    def _compile(self) -> None:
+        self._index = {_norm(name): v for name, v in self.venues.items()}
+        keys = sorted(self._index, key=len, reverse=True)
+        self._pattern = re.compile('|'.join(map(re.escape, keys))) if keys else None
+
+    def lookup(self, venue_text: str) -> Optional[Venue]:
+        """会場文字列に含まれる既知の施設（最長一致）"""
+        if not venue_text:
+            return None
+        if self._pattern is None:
+            self._compile()
+            if self._pattern is None:
+                return None
+        m = self._pattern.search(_norm(venue_text))
+        return self._index[m.group()] if m else None
+
+    def harvest(self, paths: Iterable[str]) -> int:
+        changed = 0
+        for path in paths:
+            with open(path, 'r', encoding='utf-8') as rf:
+                for name, place, lat, lng in harvest_html(rf.read()):
+                    changed += self.add(name, lat, lng, place)
+        return changed
+
+    def save(self) -> None:
+        if not self.dirty:
+            return
+        data = {'version': 1, 'venues': {
+            name: {'lat': v.lat, 'lng': v.lng, 'address': v.address}
+            for name, v in sorted(self.venues.items())
+        }}
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as wf:
+            json.dump(data, wf, ensure_ascii=False, indent=1)
+            wf.write('\n')
+        os.replace(tmp, self.path)
+        self.dirty = False
+
+
+_CACHE: Dict[Tuple[str, float, float], VenueGazetteer] = {}
+
+
+def _mtime(path: str) -> float:
+    return os.path.getmtime(path) if os.path.exists(path) else 0.0
+
+
+def get_gazetteer(output_dir: Optional[str] = None) -> VenueGazetteer:
+    """設定の辞書ファイル（未設定なら output_dir の下）を初期辞書と合わせ、更新時刻つきでキャッシュして返す"""
+    path = get_settings().venue_gazetteer_path(output_dir)
+    key = (path, _mtime(path), _mtime(_SEED))
+    gz = _CACHE.get(key)
+    if gz is None:
+        _CACHE.clear()
+        gz = _CACHE[key] = VenueGazetteer(path)
+    return gz
+
+
+def record_venues(html: str, output_dir: Optional[str] = None) -> int:
+    """取得した記事の innerHTML から辞書へ追記（スクレイパーから呼ぶ。失敗しても例外を投げない）"""
+    try:
+        gz = VenueGazetteer(get_settings().venue_gazetteer_path(output_dir))
+        changed = sum(gz.add(name, lat, lng, place) for name, place, lat, lng in harvest_html(html))
+        gz.save()
+        if changed:
+            print(f'会場辞書を更新しました: {changed}件 ({gz.path})')
+        return changed
+    except Exception as e:
+        print(f'会場辞書の更新に失敗(無視): {e}')
+        return 0
+
+
+if __name__ == '__main__':
+    import argparse
+    ap = argparse.ArgumentParser(description='斎場の座標辞書（raw_html からの取り込み・照合）')
+    ap.add_argument('--harvest', metavar='GLOB', help='innerHTML から取り込む (例: "raw_html/*_inner.html")')
+    ap.add_argument('--lookup', help='会場文字列を照合')
+    ap.add_argument('--list', action='store_true', help='登録済みの会場を表示')
+    ap.add_argument('--path', help='辞書ファイル (既定: settings。初期辞書の更新は venue_gazetteer.json)')
+    cli = ap.parse_args()
+    gz = VenueGazetteer(cli.path)
+    if cli.harvest:
+        n = gz.harvest(sorted(glob.glob(cli.harvest)))
+        gz.save()
+        print(f'取り込み: {n}件更新 / 登録 {len(gz)}件 ({gz.path})')
+    if cli.lookup:
+        v = gz.lookup(cli.lookup)
+        print(f'{v.name} ({v.lat:.6f}, {v.lng:.6f}) {v.address} {v.map_url}' if v else '該当なし')
+    if cli.list:
+        for v in sorted(gz.venues.values(), key=lambda v: v.address):
+            print(f'{v.name}\t{v.address}\t{v.lat:.6f},{v.lng:.6f}')
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""ウォッチリスト照合
+会社名・地区名・姓など多数の語を Aho-Corasick オートマトン1個にまとめ、
+解析済みレコードを1回走査するだけで全語を照合する（照合コストは語数に依存しない）。
+語・本文とも fw_alnum_to_hw で全角英数字を半角化し、英字は大文字に揃えてから照合する
+（ＮＥＣ / NEC / nec はいずれも一致）。
+該当があれば notifications 経由でダイジェストを送信する (send_line_stats.py から呼び出し)。
+
+ウォッチリスト: OKUYAMI_WATCHLIST / config.ini [watchlist] file (既定 ./watchlist.txt)
+  書式: 1行1語。「カテゴリ: 語」でカテゴリ指定（省略時は その他）。# 以降はコメント
+  例は watchlist_sample.txt
+
+単体実行:
+  python watchlist.py --csv okuyami_output/okuyami_20250801_parsed_*.csv
+"""
+from __future__ import annotations
+import os
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from common_utils import fw_alnum_to_hw
+from settings import get_settings
+
+__all__ = ['AhoCorasick', 'Watchlist', 'WatchHit', 'load_watchlist', 'build_digest', 'SCAN_FIELDS']
+
+_DEF_WATCHLIST = os.path.join('.', 'watchlist.txt')
+# 照合対象の列（レコード内の順に区切り文字で連結して1回で走査）
+SCAN_FIELDS: Tuple[str, ...] = ('氏名', 'ふりがな', '市町村', '住所', '職歴・属性', '喪主', '関係者', '会場')
+_SEP = '\x00'
+_DIGEST_MAX = 950
+
+
+def normalize(text: str) -> str:
+    return fw_alnum_to_hw(text).upper() if text else ''
+
+
+class AhoCorasick:
+    """純Python の Aho-Corasick。add() で語を登録し build() 後に iter_matches() で走査"""
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+        self._built = False
+
+    def add(self, word: str, payload_id: int) -> None:
+        node = 0
+        for ch in word:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append(payload_id)
+        self._built = False
+
+    def build(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                cand = self._goto[f].get(ch, 0)
+                self._fail[nxt] = cand if cand != nxt else 0
+                # 失敗遷移先の出力を継承（走査時に fail を辿らずに済む）
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+        self._built = True
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int]]:
+        """(終端位置, payload_id) を返す"""
+        if not self._built:
+            self.build()
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for pos, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                for pid in out[node]:
+                    yield pos, pid
+
+    @property
+    def size(self) -> int:
+        return len(self._goto)
+
+
+class WatchHit:
+    def __init__(self, index: int, record: Dict[str, Any], term: str, category: str, field: str):
+        self.index = index
+        self.name = str(record.get('氏名') or '')
+        self.city = str(record.get('市町村') or '')
+        self.term = term
+        self.category = category
+        self.field = field
+
+    def __repr__(self) -> str:
+        return f'WatchHit({self.name!r}, {self.term!r}, {self.field!r})'
+
+
+class Watchlist:
+    def __init__(self, entries: Iterable[Tuple[str, str]]):
+        self.terms: List[Tuple[str, str]] = []  # (語, カテゴリ)
+        self._automaton = AhoCorasick()
+        seen = set()
+        for term, category in entries:
+            key = normalize(term.strip())
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            self._automaton.add(key, len(self.terms))
+            self.terms.append((term.strip(), category))
+        self._automaton.build()
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def scan_text(self, text: str) -> List[int]:
+        return sorted({pid for _, pid in self._automaton.iter_matches(normalize(text))})
+
+    def scan_records(self, records: Iterable[Dict[str, Any]], fields: Tuple[str, ...] = SCAN_FIELDS) -> List[WatchHit]:
+        """各レコードの対象列を連結して1回だけ走査し、(レコード, 語) ごとに1件返す"""
+        hits: List[WatchHit] = []
+        if not self.terms:
+            return hits
+        for idx, rec in enumerate(records):
+            values = []
+            for f in fields:
+                v = rec.get(f)
+                values.append(v if isinstance(v, str) else '')
+            text = _SEP.join(normalize(v) for v in values)
+            # 区切り位置から列を逆引き
+            bounds = []
+            pos = 0
+            for v in values:
+                pos += len(v)
+                bounds.append(pos)
+                pos += 1
+            seen = set()
+            for end, pid in self._automaton.iter_matches(text):
+                if pid in seen:
+                    continue
+                seen.add(pid)
+                fi = next(i for i, b in enumerate(bounds) if end < b)
+                term, category = self.terms[pid]
+                hits.append(WatchHit(idx, rec, term, category, fields[fi]))
+        return hits
+
+
+def _parse_lines(lines: Iterable[str]) -> List[Tuple[str, str]]:
+    entries: List[Tuple[str, str]] = []
+    for line in lines:
+        line = line.split('#', 1)[0].strip()
+        if not line:
+            continue
+        category, sep, term = line.replace('：', ':').partition(':')
+        if sep:
+            entries.append((term.strip(), category.strip() or 'その他'))
+        else:
+            entries.append((line, 'その他'))
+    return entries
+
+
+def watchlist_path() -> str:
+    return get_settings().watchlist_file or _DEF_WATCHLIST
+
+
+_CACHE: Dict[Tuple[str, float], Watchlist] = {}
+
+
+def load_watchlist(path: Optional[str] = None) -> Optional[Watchlist]:
+    """ウォッチリストを読み込みオートマトンを構築（ファイル更新時のみ再構築）。無ければ None"""
+    path = path or watchlist_path()
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    key = (os.path.abspath(path), mtime)
+    wl = _CACHE.get(key)
+    if wl is None:
+        try:
+            with open(path, 'r', encoding='utf-8-sig') as rf:
+                wl = Watchlist(_parse_lines(rf))
+        except Exception as e:
+            print(f"ウォッチリスト読込失敗: {e}")
+            return None
+        _CACHE.clear()
+        _CACHE[key] = wl
+    return wl
+
+
+def build_digest(hits: List[WatchHit], date_str: str, post_url: str = '') -> str:
+    """通知用ダイジェスト（該当なしは空文字）"""
+    if not hits:
+        return ''
+    lines = [post_url, ''] if post_url else []
+    lines.append(f'【ウォッチリスト該当 {date_str}】 {len({h.index for h in hits})}名')
+    by_person: Dict[int, List[WatchHit]] = {}
+    for h in hits:
+        by_person.setdefault(h.index, []).append(h)
+    for idx in sorted(by_person):
+        hs = by_person[idx]
+        terms = '、'.join(f'{h.term}[{h.category}/{h.field}]' for h in hs)
+        lines.append(f'- {hs[0].name} ({hs[0].city}): {terms}')
+    msg = '\n'.join(lines)
+    if len(msg) > _DIGEST_MAX:
+        msg = msg[:_DIGEST_MAX - 3] + '...'
+    return msg
+
+
+if __name__ == '__main__':
+    import argparse
+    import csv
+    ap = argparse.ArgumentParser(description='解析済みCSVをウォッチリストで照合')
+    ap.add_argument('--csv', required=True, help='解析済みCSV')
+    ap.add_argument('--watchlist', help='ウォッチリストファイル (既定: OKUYAMI_WATCHLIST / config.ini / ./watchlist.txt)')
+    cli = ap.parse_args()
+    wl = load_watchlist(cli.watchlist)
+    if wl is None:
+        print('ウォッチリストが見つかりません')
+        raise SystemExit(1)
+    with open(cli.csv, 'r', encoding='utf-8-sig', newline='') as rf:
+        rows = list(csv.DictReader(rf))
+    found = wl.scan_records(rows)
+    print(f'語数: {len(wl)}, レコード: {len(rows)}, 該当: {len(found)}')
+    print(build_digest(found, os.path.basename(cli.csv)) or '該当なし')